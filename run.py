@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 
@@ -9,11 +10,68 @@ sys.path.insert(0, project_root)
 from src.api.app import app
 from src.database import db_connector # 導入 db_connector 以便調用其初始化函數
 
+
+def _post_fork(server, worker):
+    """每個 worker fork 完成後，在背景預熱資料庫連線池與 Chrome driver 池"""
+    from src.api.app import warm_up
+    warm_up()
+
+
+def run_production(bind: str, workers: int, threads: int, timeout: int):
+    """
+    以 gunicorn 多 worker 模式啟動 (僅支援 Linux / macOS)。
+    應用在 master 行程中預先載入 (preload_app)，fork 出的 worker 共用已載入的模組。
+    """
+    from gunicorn.app.base import BaseApplication
+    from src.scraper import driver_pool
+
+    # chromedriver 路徑只在 master 中解析一次並寫入磁碟快取，worker 直接沿用
+    try:
+        driver_pool.resolve_chromedriver_path()
+    except Exception as e:
+        print(f"無法預先解析 chromedriver 路徑，將在第一次爬取時重試: {e}")
+
+    class SmartCompareServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gthread', # 每個 worker 以多執行緒處理請求，長時間的爬取不會卡住整個 worker
+        'threads': threads,
+        'preload_app': True,
+        'timeout': timeout,
+        'post_fork': _post_fork,
+    }
+    SmartCompareServer(app, options).run()
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SmartCompare server")
+    parser.add_argument('--prod', action='store_true', help="使用 gunicorn 多 worker 模式啟動 (production)")
+    parser.add_argument('--bind', default='0.0.0.0:8000', help="production 模式的監聽位址")
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1, help="production 模式的 worker 數量")
+    parser.add_argument('--threads', type=int, default=4, help="每個 worker 的執行緒數量")
+    parser.add_argument('--timeout', type=int, default=180, help="worker 逾時秒數 (需大於一次爬取所需時間)")
+    args = parser.parse_args()
+
     # 確保在 Flask 應用運行之前，資料庫被初始化
     print("正在初始化資料庫...")
     db_connector.initialize_database()
     print("資料庫初始化檢查完成。")
 
-    # 運行 Flask 應用
-    app.run(debug=True)
\ No newline at end of file
+    if args.prod:
+        run_production(args.bind, args.workers, args.threads, args.timeout)
+    else:
+        # 運行 Flask 應用 (開發模式)
+        app.run(debug=True)
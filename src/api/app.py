@@ -1,13 +1,28 @@
 # src/api/app.py
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, send_file, stream_with_context
+import concurrent.futures
 import os
-from src.scraper.momo_scraper import MomoScraper
-from src.scraper.pchome_scraper import PChomeScraper
-from src.scraper.coupang_scraper import CoupangScraper
+import re
+from src import tracing
 from src.database import db_connector # 確保這裡導入了 db_connector
+from src.database.ingest import get_ingest_writer
+from src.database import export as price_export
+from src.database.attributes import FACET_NAMES
+from src.api.response_cache import ResponseCache, dumps
+from src.api import image_proxy
+from src.api.suggest import bootstrap as bootstrap_suggestions, current_index as current_suggest_index, get_suggest_index
+from src.api.warm_cache import get_cache_snapshotter
+from src.api.freshness import get_freshness_policy
+from src.api.orchestrator import get_orchestrator, client_disconnected
+from src.scraper import driver_pool
+from src.scraper.governor import governor_status
 import threading
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from src.logger import dropped_log_records, get_logger
+
+log = get_logger(__name__)
 
 # 獲取當前文件 (app.py) 的絕對路徑
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,64 +38,457 @@ app = Flask(
 )
 
 # 配置：定義資料過期時間 (例如：1小時)
+# 實際門檻依各關鍵字的價格變動頻率調整 (見 freshness.py)，此值用於沒有足夠價格歷史的關鍵字
 DATA_FRESHNESS_HOURS = 1
 
+# 批次搜尋一次最多接受的關鍵字數量
+MAX_BATCH_KEYWORDS = 200
+
+# 客戶端 / 反向代理帶入的請求 ID (X-Request-ID) 格式，符合時沿用為 trace ID
+_REQUEST_ID_PATTERN = re.compile(r'^[0-9A-Za-z._\-]{1,64}$')
+
+# 已序列化 / 壓縮的搜尋結果快取，重複搜尋時直接返回 (存活時間不超過資料新鮮度門檻)
+response_cache = ResponseCache()
+
+
+def _suggest_terms():
+    index = current_suggest_index()
+    return index.export_terms() if index is not None else None
+
+
+# 回應快取與搜尋建議詞定期寫入磁碟快照；重新啟動時先讀回，部署後的第一批請求也能命中快取
+cache_snapshotter = get_cache_snapshotter(response_cache, _suggest_terms)
+if cache_snapshotter is not None:
+    cache_snapshotter.restore()
+    bootstrap_suggestions(cache_snapshotter.read_terms)
+
+
+def _scraper_classes() -> list:
+    """延遲載入爬蟲模組 (Selenium 等)，只有第一次需要爬取時才 import"""
+    from src.scraper.momo_scraper import MomoScraper
+    from src.scraper.pchome_scraper import PChomeScraper
+    from src.scraper.coupang_scraper import CoupangScraper
+    return [MomoScraper, PChomeScraper, CoupangScraper]
+
+
+def _platform_names() -> dict:
+    """小寫平台名稱 -> 爬蟲使用的平台名稱 (寫入價格時的 platform 值)"""
+    return {scraper_class.platform_name.lower(): scraper_class.platform_name for scraper_class in _scraper_classes()}
+
+
+def warm_up(background: bool = True):
+    """
+    預熱資料庫連線池與 Chrome driver 池。
+    由 production server 在每個 worker fork 後呼叫，預設在背景執行緒中進行。
+    """
+    def _warm():
+        try:
+            db_connector.warm_pool()
+        except Exception as e:
+            log.error(f"資料庫連線池預熱失敗: {e}")
+        get_suggest_index() # 在背景從資料庫建立搜尋建議索引
+        try:
+            _scraper_classes()
+            driver_pool.warm_pool()
+        except Exception as e:
+            log.error(f"Chrome driver 池預熱失敗: {e}")
+
+    if background:
+        threading.Thread(target=_warm, name="warm-up", daemon=True).start()
+    else:
+        _warm()
+
+
+def _index_products(batch: list):
+    """新寫入資料庫的商品名稱加入搜尋建議索引 (IngestWriter listener)"""
+    get_suggest_index().add_products(batch)
+
+
+def _ingest_writer():
+    writer = get_ingest_writer()
+    writer.add_listener(_index_products)
+    return writer
+
+
+def _record_search(keyword: str, result_count: int):
+    """記錄一次有結果的搜尋，供搜尋建議依熱門程度排序"""
+    get_suggest_index().record_search(keyword)
+    try:
+        db_connector.record_search_keyword(keyword, result_count)
+    except Exception as e:
+        log.error(f"記錄搜尋關鍵字失敗: {e}")
+
+
+def _search_response(keyword: str, cached):
+    """返回快取的搜尋結果；有結果時在回應送出後記錄這次搜尋"""
+    response = cached.to_response(request)
+    if cached.item_count:
+        response.call_on_close(lambda: _record_search(keyword, cached.item_count))
+    return response
+
+
+def _freshness_policy():
+    return get_freshness_policy(default_hours=DATA_FRESHNESS_HOURS)
+
+
+def _cached_json_response(keyword: str, payload: dict, freshness_hours: float = DATA_FRESHNESS_HOURS, cache_key: str = None):
+    """將結果放入快取並依照請求的條件標頭 / 壓縮格式返回"""
+    with tracing.span('serialize'):
+        image_proxy.rewrite_payload(payload) # 商品圖片改由 /img 代理提供縮圖
+        cached = response_cache.put(cache_key or keyword, payload, ttl_seconds=freshness_hours * 3600)
+    return _search_response(keyword, cached)
+
+
+def _facet_filters(args) -> dict:
+    """從查詢參數取出屬性篩選條件，例如 ?brand=Sony&color=黑色"""
+    return {name: args[name].strip() for name in FACET_NAMES if args.get(name, '').strip()}
+
+
+def _cache_key(keyword: str, filters: dict) -> str:
+    """有篩選條件時，快取 key 包含篩選條件"""
+    return keyword if not filters else f"{keyword}?{urlencode(sorted(filters.items()))}"
+
+@app.before_request
+def _begin_trace():
+    """每個請求一個 trace；沿用客戶端的 X-Request-ID，沒有時產生新的請求 ID"""
+    if request.endpoint in (None, 'static'):
+        return
+    request_id = request.headers.get('X-Request-ID', '')
+    g.trace_root, g.trace_token = tracing.begin_trace(
+        f"{request.method} {request.path}",
+        trace_id=request_id if _REQUEST_ID_PATTERN.match(request_id) else None,
+        query=request.query_string.decode('utf-8', errors='replace')[:200])
+
+@app.before_request
+def _start_cache_snapshots():
+    # 在實際處理請求的行程 (fork 後的 worker) 中啟動定期寫入
+    if cache_snapshotter is not None:
+        cache_snapshotter.start()
+
+@app.after_request
+def _add_request_id(response):
+    root = g.get('trace_root')
+    if root is not None:
+        response.headers['X-Request-ID'] = root.trace.trace_id
+        root.set(status=response.status_code)
+    return response
+
+@app.teardown_request
+def _end_trace(error=None):
+    root = g.pop('trace_root', None)
+    if root is not None:
+        tracing.end_trace(root, g.pop('trace_token'), **({"error": type(error).__name__} if error else {}))
+
 # 根路由：處理根路徑 '/' 的請求，渲染 index.html
 @app.route('/', methods=['GET'])
 def index():
     return render_template('index.html')
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness 檢查：資料庫連線池預熱完成後返回 200。
+    Chrome driver 池尚未預熱 (或 Chrome 無法啟動) 時快取與資料庫的搜尋仍可使用，只在回應中標示為 degraded。
+    """
+    db_pool = db_connector.pool_status()
+    chrome_pool = driver_pool.pool_status()
+    is_ready = db_pool['warm']
+    degraded = [] if chrome_pool['warm'] else ["driver_pool"]
+    return jsonify({"ready": is_ready, "degraded": degraded, "db_pool": db_pool, "driver_pool": chrome_pool}), \
+        (200 if is_ready else 503)
+
+@app.route('/status', methods=['GET'])
+def status():
+    """監控用：連線池狀態與各平台的速率限制 / 斷路器狀態"""
+    return jsonify({
+        "db_pool": db_connector.pool_status(),
+        "driver_pool": driver_pool.pool_status(),
+        "platforms": governor_status(),
+        "warm_cache": cache_snapshotter.status() if cache_snapshotter is not None else None,
+        "tracing": dict(tracing.get_trace_writer().status(), dropped_log_records=dropped_log_records()),
+    })
+
+@app.route('/img', methods=['GET'])
+def image():
+    """商品圖片代理：返回縮小並重新編碼的縮圖 (WebP / JPEG)，以 ETag 與長期快取標頭提供"""
+    url = request.args.get('url', '')
+    cache = image_proxy.get_thumbnail_cache()
+    if cache is None or not cache.is_allowed(url):
+        return jsonify({"error": "Unsupported image url"}), 400
+
+    fmt = image_proxy.negotiate_format(request.headers.get('Accept'))
+    try:
+        path, _ = cache.get(url, fmt)
+        etag = cache.content_etag(path)
+    except image_proxy.ImageProxyError as e:
+        log.warning(e)
+        return jsonify({"error": "Image unavailable"}), 502
+    except OSError as e: # 讀取前剛好被淘汰
+        log.warning(f"Thumbnail disappeared: {e}")
+        return jsonify({"error": "Image unavailable"}), 503
+
+    response = send_file(path, mimetype=image_proxy.content_type(fmt), etag=etag,
+                         max_age=image_proxy.CACHE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    """搜尋建議：依前綴返回歷史關鍵字與商品名稱中的詞，已快取的關鍵字優先"""
+    prefix = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    suggestions = get_suggest_index().suggest(prefix, limit, is_cached=response_cache.contains) if prefix else []
+    response = jsonify({"query": prefix, "suggestions": suggestions})
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """關鍵字的價格統計：價格百分位數、各平台拿到最低價的比例與價差分布 (?keyword=...&days=30)"""
+    keyword = request.args.get('keyword', '').strip()
+    if not keyword:
+        return jsonify({"error": "Keyword is required"}), 400
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    try:
+        result = db_connector.get_price_stats(keyword, days)
+    except Exception as e:
+        log.error(f"Error computing price stats for '{keyword}': {e}")
+        return jsonify({"error": "Database error"}), 500
+    result.update(keyword=keyword, days=days)
+    return jsonify(result)
+
+@app.route('/alerts', methods=['POST'])
+def create_alert():
+    """訂閱降價通知：{"product_id", "target_price", "contact", "platform" (可選)}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        product_id = int(data['product_id'])
+        target_price = float(data['target_price'])
+        contact = str(data['contact']).strip()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "product_id, target_price and contact are required"}), 400
+    if not contact or target_price <= 0:
+        return jsonify({"error": "product_id, target_price and contact are required"}), 400
+    platform = data.get('platform') or None
+    if platform is not None:
+        platforms = _platform_names()
+        platform = platforms.get(str(platform).strip().lower())
+        if platform is None:
+            return jsonify({"error": f"platform must be one of: {', '.join(sorted(platforms.values()))}"}), 400
+
+    alert_id = db_connector.create_price_alert(product_id, target_price, contact, platform)
+    if alert_id is None:
+        return jsonify({"error": "Product not found"}), 404
+    return jsonify({"id": alert_id}), 201
+
+@app.route('/alerts', methods=['GET'])
+def list_alerts():
+    contact = request.args.get('contact', '').strip()
+    if not contact:
+        return jsonify({"error": "contact is required"}), 400
+    alerts = db_connector.get_price_alerts(contact)
+    for alert in alerts:
+        for key in ('target_price', 'last_notified_price'):
+            if alert[key] is not None:
+                alert[key] = float(alert[key])
+        for key in ('last_notified_at', 'created_at'):
+            if alert[key] is not None:
+                alert[key] = alert[key].isoformat()
+    return jsonify({"alerts": alerts})
+
+@app.route('/alerts/<int:alert_id>', methods=['DELETE'])
+def delete_alert(alert_id):
+    contact = request.args.get('contact', '').strip()
+    if not db_connector.delete_price_alert(alert_id, contact):
+        return jsonify({"error": "Alert not found"}), 404
+    return Response(status=204)
+
+def _fresh_db_results(keyword: str, freshness_hours: float, filters: dict, read_primary: bool = False):
+    """資料庫中關鍵字的新鮮結果；需要重新爬取時返回 None"""
+    db_results = db_connector.get_products_with_prices_by_keyword(keyword, freshness_hours, filters, read_primary=read_primary)
+    # 有篩選條件但沒有符合的商品時，只要關鍵字本身有新鮮資料就不需要重新爬取
+    if db_results and (db_results['grouped_products'] or (
+            filters and not db_results.get('errors')
+            and db_connector.has_fresh_prices(keyword, freshness_hours, read_primary=read_primary))):
+        return db_results
+    return None
+
 @app.route('/search', methods=['GET'])
 def search():
     keyword = request.args.get('keyword', '').strip()
     if not keyword:
         return jsonify({"error": "Keyword is required"}), 400
+    # 屬性篩選 (brand / model / capacity / color) 由資料庫的屬性索引處理，結果附上各屬性值的數量
+    filters = _facet_filters(request.args)
+    cache_key = _cache_key(keyword, filters)
 
-    db_results = db_connector.get_products_with_prices_by_keyword(keyword, DATA_FRESHNESS_HOURS)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        log.info(f"Serving cached response for '{cache_key}'.")
+        tracing.annotate(source="cache")
+        return _search_response(keyword, cached)
 
-    if db_results and db_results['grouped_products']: # 檢查 'grouped_products' 是否有內容
-        print(f"Found fresh results for '{keyword}' in database. Returning from DB.")
-        return jsonify(db_results)
+    # 價格常變動的關鍵字門檻較短，穩定的關鍵字較長，減少不必要的爬取
+    freshness_hours = _freshness_policy().ttl_hours(keyword)
+    read_primary = False
+    db_results = _fresh_db_results(keyword, freshness_hours, filters)
+    if db_results is None and db_connector.get_replica_set() is not None:
+        # 唯讀副本可能還沒複寫到其他 worker 剛爬取的價格，爬取前先以主庫確認，避免重複爬取
+        read_primary = True
+        db_results = _fresh_db_results(keyword, freshness_hours, filters, read_primary=True)
+
+    if db_results is not None:
+        log.info(f"Found fresh results for '{keyword}' in database (freshness {freshness_hours}h). Returning from DB.")
+        tracing.annotate(source="database")
+        db_results['facets'] = db_connector.get_facet_counts(keyword, filters, freshness_hours, read_primary=read_primary)
+        return _cached_json_response(keyword, db_results, freshness_hours, cache_key)
     else:
-        print(f"No fresh results for '{keyword}' in database or no results found. Starting scraping...")
-        all_scraped_results = []
-        errors = []
-
-        def run_scraper(scraper_class, results_list, errors_list):
-            scraper_instance = None
-            try:
-                scraper_instance = scraper_class()
-                platform_results = scraper_instance.search_product(keyword)
-                results_list.extend(platform_results)
-            except Exception as e:
-                errors_list.append(f"Error scraping {scraper_class.__name__}: {e}")
-                print(f"Error scraping {scraper_class.__name__}: {e}")
-            finally:
-                if scraper_instance:
-                    scraper_instance.close_driver()
-
-        threads = []
-        scrapers_to_run = [MomoScraper, PChomeScraper, CoupangScraper]
-
-        for scraper_class in scrapers_to_run:
-            thread = threading.Thread(target=run_scraper, args=(scraper_class, all_scraped_results, errors))
-            threads.append(thread)
-            thread.start()
-
-        for thread in threads:
-            thread.join()
-
-        if all_scraped_results:
-            print(f"Scraped {len(all_scraped_results)} items. Saving to database...")
-            db_connector.save_product_data(all_scraped_results)
-
-            final_results = db_connector.get_comparison_data(keyword)
-            print("Returning latest data from database after scraping.")
-            return jsonify(final_results)
+        log.info(f"No fresh results for '{keyword}' in database or no results found. Starting scraping...")
+        tracing.annotate(source="scraped")
+        orchestrator = get_orchestrator()
+        # 爬到的商品逐筆串流進寫入佇列並分批寫入資料庫；相同關鍵字的並行請求共用同一次爬取 (與其寫入 session)
+        future = orchestrator.submit(keyword, _scraper_classes(), sink=_ingest_writer().session())
+        ingest_session = future.sink
+        try:
+            with tracing.span('scrape.wait'):
+                scraped_count, errors = orchestrator.wait(
+                    keyword, future, is_disconnected=lambda environ=request.environ: client_disconnected(environ))
+        except concurrent.futures.CancelledError:
+            log.warning(f"Client disconnected, scraping for '{keyword}' cancelled.")
+            return Response(status=499)
+        # 等待佇列中剩餘的紀錄提交後再查詢
+        with tracing.span('ingest.flush'):
+            errors = errors + ingest_session.flush()
+
+        if scraped_count:
+            log.info(f"Scraped {scraped_count} items and saved them to database.")
+            final_results = db_connector.get_comparison_data(keyword, read_primary=True, filters=filters) # 剛寫入的資料以主庫為準
+            final_results['facets'] = db_connector.get_facet_counts(keyword, filters, read_primary=True)
+            log.info("Returning latest data from database after scraping.")
+            return _cached_json_response(keyword, final_results, freshness_hours, cache_key)
         else:
-            print(f"No results scraped for '{keyword}'. Returning existing DB results or empty list.")
+            log.info(f"No results scraped for '{keyword}'. Returning existing DB results or empty list.")
             # 如果爬蟲也沒有結果，但資料庫有舊資料，仍然返回舊資料 (因為 get_comparison_data 總是返回所有)
-            return jsonify(db_connector.get_comparison_data(keyword) if db_connector.get_comparison_data(keyword)['grouped_products'] else {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}, "errors": errors})
+            existing_results = db_connector.get_comparison_data(keyword, read_primary=True, filters=filters)
+            if existing_results['grouped_products']:
+                existing_results['facets'] = db_connector.get_facet_counts(keyword, filters, read_primary=True)
+                return _cached_json_response(keyword, existing_results, freshness_hours, cache_key)
+            return _cached_json_response(keyword, {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}, "facets": {}, "errors": errors}, cache_key=cache_key)
+
+
+def _batch_line(keyword: str, source: str, cached) -> bytes:
+    """批次搜尋的一行 NDJSON，直接沿用快取項目中已序列化的結果"""
+    return b'{"keyword":' + dumps(keyword) + b',"source":' + dumps(source) + b',"result":' + cached.body + b'}\n'
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """
+    批次搜尋：請求本文為 {"keywords": [...]}，以 NDJSON 串流逐行返回每個關鍵字的結果。
+    - 回應快取中的關鍵字立即返回
+    - 其餘關鍵字以單一查詢從資料庫取得仍新鮮的結果
+    - 剩下的關鍵字交給爬蟲，每個平台以同一個 Chrome 依序搜尋，完成一個返回一個
+    """
+    data = request.get_json(silent=True) or {}
+    keywords = data.get('keywords')
+    if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+        return jsonify({"error": "keywords must be a list of strings"}), 400
+
+    # 去除空白與重複 (不分大小寫)，保留原始順序
+    unique_keywords, seen = [], set()
+    for keyword in keywords:
+        keyword = keyword.strip()
+        if keyword and keyword.lower() not in seen:
+            seen.add(keyword.lower())
+            unique_keywords.append(keyword)
+    if not unique_keywords:
+        return jsonify({"error": "Keyword is required"}), 400
+    if len(unique_keywords) > MAX_BATCH_KEYWORDS:
+        return jsonify({"error": f"At most {MAX_BATCH_KEYWORDS} keywords per batch"}), 400
+
+    def generate():
+        pending = []
+        for keyword in unique_keywords:
+            cached = response_cache.get(keyword)
+            if cached is not None:
+                yield _batch_line(keyword, "cache", cached)
+            else:
+                pending.append(keyword)
+        if not pending:
+            return
+
+        freshness = _freshness_policy().ttl_hours_many(pending)
+        fresh = db_connector.get_products_with_prices_by_keywords(pending, freshness)
+        missing = [keyword for keyword in pending if not (fresh.get(keyword) or {}).get('grouped_products')]
+        if missing and db_connector.get_replica_set() is not None:
+            # 唯讀副本落後時，其他 worker 剛爬取的關鍵字以主庫確認，避免重複爬取
+            fresh.update(db_connector.get_products_with_prices_by_keywords(missing, freshness, read_primary=True))
+        stale = []
+        for keyword in pending:
+            payload = fresh.get(keyword)
+            if payload and payload['grouped_products']:
+                image_proxy.rewrite_payload(payload)
+                yield _batch_line(keyword, "database", response_cache.put(keyword, payload, ttl_seconds=freshness[keyword] * 3600))
+            else:
+                stale.append(keyword)
+        if not stale:
+            return
+
+        log.info(f"Batch search: scraping {len(stale)} of {len(unique_keywords)} keywords.")
+        ingest_session = _ingest_writer().session()
+        future, events = get_orchestrator().submit_batch(stale, _scraper_classes(), sink=ingest_session)
+        reported_errors = 0 # 已回報過的寫入錯誤數 (session 的錯誤只會附加)
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                keyword, scraped_count, errors = event
+                write_errors = ingest_session.flush()
+                errors = errors + write_errors[reported_errors:]
+                reported_errors = len(write_errors)
+                payload = db_connector.get_comparison_data(keyword, read_primary=True)
+                if errors and not payload['grouped_products']:
+                    payload['errors'] = errors
+                image_proxy.rewrite_payload(payload)
+                yield _batch_line(keyword, "scraped", response_cache.put(keyword, payload, ttl_seconds=freshness[keyword] * 3600))
+        finally:
+            # 客戶端中途斷線時 generator 會被關閉，停止剩下的爬取
+            if not future.done():
+                future.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/export', methods=['GET'])
+def export_prices():
+    """
+    串流匯出價格資料：/export?since=YYYY-MM-DD&until=YYYY-MM-DD&format=csv|ndjson|arrow&after_id=0&compress=gzip|none
+    以伺服器端游標逐批讀取，回應大小不影響記憶體用量；中斷後可用最後收到的 price_id 作為 after_id 續傳。
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in price_export.available_formats():
+        return jsonify({"error": f"format must be one of {', '.join(price_export.available_formats())}"}), 400
+    compress = request.args.get('compress', 'gzip').lower()
+    if compress not in ('gzip', 'none'):
+        return jsonify({"error": "compress must be gzip or none"}), 400
+    try:
+        since = price_export.parse_date(request.args['since']) if request.args.get('since') else None
+        until = price_export.parse_date(request.args['until']) if request.args.get('until') else None
+        after_id = int(request.args.get('after_id', 0))
+    except ValueError:
+        return jsonify({"error": "since/until must be YYYY-MM-DD and after_id an integer"}), 400
+
+    mimetype, extension = price_export.FORMATS[fmt]
+    filename = f"prices.{extension}"
+    if compress == 'gzip':
+        mimetype, filename = 'application/gzip', filename + '.gz'
+    chunks = price_export.export_chunks(fmt, since=since, until=until, after_id=after_id, compress=compress == 'gzip')
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 if __name__ == '__main__':
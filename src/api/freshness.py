@@ -0,0 +1,123 @@
+# src/api/freshness.py
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from src import config as app_config
+from src.database import db_connector
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_HOURS = 1 # 沒有足夠價格歷史時的新鮮度門檻
+DEFAULT_MIN_HOURS = 0.25
+DEFAULT_MAX_HOURS = 24
+DEFAULT_STALE_PROBABILITY = 0.05 # 允許顯示的價格在新鮮度門檻內已經變動的機率
+DEFAULT_HISTORY_DAYS = 30
+DEFAULT_MIN_OBSERVED_DAYS = 5 # 價格歷史少於這麼多天時不估計，使用預設門檻
+DEFAULT_REFRESH_HOURS = 6 # 每個關鍵字的門檻重新估計的間隔
+DEFAULT_MAX_ENTRIES = 10000
+MAX_DAILY_CHANGE_RATE = 0.99
+
+
+class FreshnessPolicy:
+    """
+    依價格變動頻率決定每個關鍵字的資料新鮮度門檻 (小時)。
+
+    由 prices 的每日紀錄估計「一天內價格變動」的比例 f，假設每天是否變價互相獨立 (每日 Bernoulli 試驗，
+    不足一天的時間以 (1 - f) 的分數次方內插)，門檻 t 取使 t 小時內價格變動機率不超過 stale_probability 的最長時間：
+        1 - (1 - f) ** (t / 24) <= stale_probability
+    估計結果每 refresh_hours 重新計算 (一次爬取最多只多一天的紀錄，不需要在爬取後立即重算)。
+    價格穩定的關鍵字 (書籍、家電) 門檻較長，促銷商品等常變價的關鍵字門檻較短，
+    結果限制在 [min_hours, max_hours] 之間。
+    """
+
+    def __init__(self, default_hours: float = DEFAULT_HOURS, min_hours: float = DEFAULT_MIN_HOURS,
+                 max_hours: float = DEFAULT_MAX_HOURS, stale_probability: float = DEFAULT_STALE_PROBABILITY,
+                 history_days: int = DEFAULT_HISTORY_DAYS, min_observed_days: int = DEFAULT_MIN_OBSERVED_DAYS,
+                 refresh_hours: float = DEFAULT_REFRESH_HOURS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.default_hours = default_hours
+        self.min_hours = min_hours
+        self.max_hours = max_hours
+        self.stale_probability = stale_probability
+        self.history_days = history_days
+        self.min_observed_days = min_observed_days
+        self.refresh_seconds = refresh_hours * 3600
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # 小寫關鍵字 -> (門檻小時數, 估計時間)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(keyword: str) -> str:
+        return keyword.strip().lower()
+
+    def hours_from_stats(self, observed_days: int, changes: int) -> float:
+        """由價格歷史 (相鄰紀錄間隔天數總和、變動次數) 計算新鮮度門檻"""
+        if observed_days < self.min_observed_days:
+            return self.default_hours
+        daily_rate = min(changes / observed_days, MAX_DAILY_CHANGE_RATE)
+        if daily_rate <= 0:
+            return self.max_hours
+        hours = 24 * math.log(1 - self.stale_probability) / math.log(1 - daily_rate)
+        return round(min(self.max_hours, max(self.min_hours, hours)), 2)
+
+    def ttl_hours(self, keyword: str) -> float:
+        return self.ttl_hours_many([keyword])[keyword]
+
+    def ttl_hours_many(self, keywords: list[str]) -> dict:
+        """返回 {關鍵字: 新鮮度門檻小時數}；過期或未估計的關鍵字以單一查詢重新估計"""
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for keyword in keywords:
+                entry = self._entries.get(self._key(keyword))
+                if entry is not None and now - entry[1] < self.refresh_seconds:
+                    self._entries.move_to_end(self._key(keyword))
+                    result[keyword] = entry[0]
+                else:
+                    missing.append(keyword)
+        if not missing:
+            return result
+
+        try:
+            stats = db_connector.get_price_change_stats(missing, self.history_days)
+        except Exception as e:
+            log.error(f"Error estimating price volatility, using default freshness: {e}")
+            result.update(dict.fromkeys(missing, self.default_hours))
+            return result
+
+        with self._lock:
+            for keyword in missing:
+                keyword_stats = stats.get(keyword) or {"observed_days": 0, "changes": 0}
+                hours = self.hours_from_stats(keyword_stats['observed_days'], keyword_stats['changes'])
+                self._entries[self._key(keyword)] = (hours, now)
+                self._entries.move_to_end(self._key(keyword))
+                result[keyword] = hours
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_freshness_policy(default_hours: float = DEFAULT_HOURS) -> FreshnessPolicy:
+    """取得以 config.ini [FRESHNESS] 區段設定的新鮮度策略"""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                option = app_config.get_option
+                _policy = FreshnessPolicy(
+                    default_hours=option('FRESHNESS', 'DEFAULT_HOURS', fallback=default_hours, cast=float),
+                    min_hours=option('FRESHNESS', 'MIN_HOURS', fallback=DEFAULT_MIN_HOURS, cast=float),
+                    max_hours=option('FRESHNESS', 'MAX_HOURS', fallback=DEFAULT_MAX_HOURS, cast=float),
+                    stale_probability=option('FRESHNESS', 'STALE_PROBABILITY', fallback=DEFAULT_STALE_PROBABILITY, cast=float),
+                    history_days=option('FRESHNESS', 'HISTORY_DAYS', fallback=DEFAULT_HISTORY_DAYS, cast=int),
+                    min_observed_days=option('FRESHNESS', 'MIN_OBSERVED_DAYS', fallback=DEFAULT_MIN_OBSERVED_DAYS, cast=int),
+                    refresh_hours=option('FRESHNESS', 'REFRESH_HOURS', fallback=DEFAULT_REFRESH_HOURS, cast=float),
+                )
+    return _policy
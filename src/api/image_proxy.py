@@ -0,0 +1,264 @@
+# src/api/image_proxy.py
+
+import hashlib
+import io
+import os
+import threading
+import urllib.request
+from urllib.parse import quote, urlparse
+
+from src import config as app_config
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+# Pillow 為選用套件，沒有安裝時 /search 直接返回電商原始圖片網址
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - 視部署環境而定
+    Image = None
+
+DEFAULT_CACHE_DIR = os.path.join(app_config.project_root_dir, '.cache', 'thumbnails')
+DEFAULT_MAX_MB = 256
+DEFAULT_SIZE = 320 # 縮圖最長邊 (px)，對應商品卡片的寬度
+DEFAULT_QUALITY = 80
+DEFAULT_ALLOWED_HOSTS = 'momoshop.com.tw,momo.dm,pchome.com.tw,coupangcdn.com,coupang.com'
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10 # 秒
+CACHE_MAX_AGE = 365 * 24 * 3600 # 縮圖內容由網址決定，可以長期快取
+
+_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+class ImageProxyError(Exception):
+    """無法取得或轉換來源圖片"""
+
+
+class _AllowlistRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """每一次轉址都重新檢查目標網址，避免允許的主機轉址到內部網路 (SSRF)"""
+
+    def __init__(self, is_allowed):
+        super().__init__()
+        self.is_allowed = is_allowed
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not self.is_allowed(newurl):
+            raise ImageProxyError(f"Redirect to disallowed host: {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+class ThumbnailCache:
+    """
+    商品圖片縮圖的磁碟快取。
+
+    - 來源圖片只下載一次，縮小後重新編碼為 WebP (瀏覽器支援時) 或 JPEG
+    - 檔案以 (網址, 尺寸, 格式) 的雜湊命名；ETag 為縮圖內容的雜湊
+    - 讀取時更新檔案的修改時間；總大小超過 max_bytes 時淘汰最久未使用的縮圖
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 size: int = DEFAULT_SIZE, quality: int = DEFAULT_QUALITY, allowed_hosts=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+        self.allowed_hosts = tuple(allowed_hosts or DEFAULT_ALLOWED_HOSTS.split(','))
+        self._lock = threading.Lock()
+        self._fetch_locks = {} # 快取 key -> Lock，同一張圖片同時只下載一次
+        self._total_bytes = None
+        self._opener = urllib.request.build_opener(_AllowlistRedirectHandler(self.is_allowed))
+
+    def is_allowed(self, url: str) -> bool:
+        """只代理電商平台的圖片網址，避免成為任意網址的開放代理"""
+        parsed = urlparse(url or '')
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            return False
+        host = parsed.hostname.lower()
+        return any(host == allowed or host.endswith('.' + allowed) for allowed in self.allowed_hosts)
+
+    def cache_key(self, url: str, fmt: str) -> str:
+        return hashlib.sha256(f"{url}|{self.size}|{fmt}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    @staticmethod
+    def content_etag(path: str) -> str:
+        """縮圖內容的雜湊 (縮圖寫入後不再修改，重新產生時以 os.replace 換成新檔)"""
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+    def get(self, url: str, fmt: str = 'jpeg') -> tuple[str, str]:
+        """返回 (縮圖檔案路徑, 快取 key)；快取中沒有時下載並產生縮圖"""
+        if not self.is_allowed(url):
+            raise ImageProxyError(f"Image host not allowed: {url}")
+        key = self.cache_key(url, fmt)
+        path = self._path(key, fmt)
+        if self._touch(path):
+            return path, key
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        try:
+            with fetch_lock:
+                if self._touch(path): # 等待期間其他執行緒已經產生
+                    return path, key
+                data = self._render(self._fetch(url), fmt)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        finally:
+            with self._lock:
+                self._fetch_locks.pop(key, None)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._current_size() # 第一次統計時已包含剛寫入的檔案
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return path, key
+
+    def _touch(self, path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _fetch(self, url: str) -> bytes:
+        parsed = urlparse(url)
+        request = urllib.request.Request(url, headers={
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+            "Referer": f"{parsed.scheme}://{parsed.hostname}/",
+            "Accept": "image/*",
+        })
+        try:
+            with self._opener.open(request, timeout=FETCH_TIMEOUT) as response:
+                data = response.read(MAX_SOURCE_BYTES + 1)
+        except ImageProxyError:
+            raise
+        except Exception as e:
+            raise ImageProxyError(f"Error fetching image {url}: {e}") from e
+        if len(data) > MAX_SOURCE_BYTES:
+            raise ImageProxyError(f"Image too large: {url}")
+        return data
+
+    def _render(self, data: bytes, fmt: str) -> bytes:
+        """縮小並重新編碼圖片"""
+        pil_format, _ = _FORMATS[fmt]
+        try:
+            img = Image.open(io.BytesIO(data))
+            img.draft('RGB', (self.size, self.size)) # JPEG 解碼時直接縮小，省去大部分解碼工作
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.size, self.size))
+            if pil_format == 'JPEG' or img.mode not in ('RGB', 'RGBA'):
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    img = img.convert('RGBA')
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    background.paste(img, mask=img.getchannel('A'))
+                    img = background
+                else:
+                    img = img.convert('RGB')
+            output = io.BytesIO()
+            if pil_format == 'JPEG':
+                img.save(output, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+            else:
+                img.save(output, 'WEBP', quality=self.quality, method=4)
+            return output.getvalue()
+        except Exception as e:
+            raise ImageProxyError(f"Error converting image: {e}") from e
+
+    def _current_size(self) -> int:
+        if self._total_bytes is None:
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    try:
+                        total += os.path.getsize(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+            self._total_bytes = total
+        return self._total_bytes
+
+    def _evict(self):
+        """淘汰最久未使用的縮圖，直到總大小降到 max_bytes 的 90% 以下"""
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+                evicted += 1
+            except OSError:
+                pass
+        if evicted:
+            log.info(f"縮圖快取超過上限，已淘汰 {evicted} 張縮圖。")
+
+
+def negotiate_format(accept_header: str) -> str:
+    """瀏覽器接受 WebP 時使用 WebP，否則使用 JPEG"""
+    return 'webp' if 'image/webp' in (accept_header or '') else 'jpeg'
+
+
+def content_type(fmt: str) -> str:
+    return _FORMATS[fmt][1]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    """
+    取得設定中的縮圖快取；Pillow 未安裝或 [IMAGES] ENABLED=false 時返回 None。
+    """
+    global _cache
+    if Image is None or not app_config.get_option('IMAGES', 'ENABLED', fallback=True, cast=bool):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                hosts = app_config.get_option('IMAGES', 'ALLOWED_HOSTS', fallback=DEFAULT_ALLOWED_HOSTS)
+                _cache = ThumbnailCache(
+                    root=app_config.get_option('IMAGES', 'PATH', fallback=DEFAULT_CACHE_DIR),
+                    max_bytes=app_config.get_option('IMAGES', 'MAX_MB', fallback=DEFAULT_MAX_MB, cast=int) * 1024 * 1024,
+                    size=app_config.get_option('IMAGES', 'SIZE', fallback=DEFAULT_SIZE, cast=int),
+                    quality=app_config.get_option('IMAGES', 'QUALITY', fallback=DEFAULT_QUALITY, cast=int),
+                    allowed_hosts=[host.strip().lower() for host in hosts.split(',') if host.strip()],
+                )
+    return _cache
+
+
+def proxy_url(image_url: str) -> str:
+    """將電商圖片網址改寫為 /img 代理網址；不支援的網址原樣返回"""
+    cache = get_thumbnail_cache()
+    if cache is None or not cache.is_allowed(image_url):
+        return image_url
+    return f"/img?url={quote(image_url, safe='')}"
+
+
+def rewrite_payload(payload: dict) -> dict:
+    """將比價結果中每個商品的 image 改為代理網址 (就地修改並返回)"""
+    for product in payload.get('grouped_products') or []:
+        if product.get('image'):
+            product['image'] = proxy_url(product['image'])
+    return payload
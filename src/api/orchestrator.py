@@ -0,0 +1,336 @@
+# src/api/orchestrator.py
+
+import asyncio
+import concurrent.futures
+import os
+import queue
+import select
+import socket
+import threading
+
+from src import config as app_config
+from src import tracing
+from src.scraper.governor import PlatformUnavailable, get_governor
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENT_SCRAPES = 6
+DEFAULT_SCRAPE_TIMEOUT = 150 # 秒，需小於 production server 的 worker 逾時
+DEFAULT_MAX_BATCH_SCRAPES = 3 # 批次爬取專用的執行緒數 (一個批次每個平台佔用一個)
+DEFAULT_BATCH_TIMEOUT = 900 # 秒，一個批次的總時間上限
+
+
+class ScrapeOrchestrator:
+    """
+    以 asyncio 協調各平台爬取。
+
+    每個 worker 行程共用一個背景 event loop 執行緒與一個爬蟲執行緒池：
+    - 每個平台的爬取是一個可取消的 task，阻塞的 Selenium 呼叫在執行緒池中執行
+    - 爬到的每筆紀錄立即交給 sink (例如串流寫入資料庫)，以 asyncio.wait(FIRST_COMPLETED) 收集各平台的完成狀態
+    - 相同關鍵字的並行請求共用同一次爬取；所有等待者都離開時才取消
+    請求執行緒只需等待 concurrent.futures.Future，因此單一 worker 可同時進行多個搜尋。
+    提交時的 trace span 會傳到爬蟲執行緒，各平台的爬取記錄在同一個 trace 中。
+    批次爬取的每個平台 task 會佔用執行緒直到整個批次結束，因此使用另一個較小的執行緒池，
+    同時進行的批次再多也不會佔滿單一關鍵字搜尋的執行緒 (超過的批次排隊等待)。
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_CONCURRENT_SCRAPES, timeout: float = DEFAULT_SCRAPE_TIMEOUT,
+                 max_batch_workers: int = DEFAULT_MAX_BATCH_SCRAPES, batch_timeout: float = DEFAULT_BATCH_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_batch_workers = max_batch_workers
+        self.batch_timeout = batch_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._executor = None
+        self._batch_executor = None
+        self._inflight = {} # keyword -> [future, 等待者數量]
+
+    def _ensure_loop(self):
+        # gunicorn fork 後，子行程需要自己的 event loop 執行緒
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="scrape-orchestrator", daemon=True).start()
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="scraper")
+                self._batch_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_batch_workers, thread_name_prefix="batch-scraper")
+                self._inflight = {}
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+
+    @staticmethod
+    def _scrape_keyword(scraper, governor, keyword: str, sink=None) -> int:
+        """以 scraper 目前的 driver 搜尋一個關鍵字 (在爬蟲執行緒中執行)，返回紀錄數量"""
+        with tracing.span(f"scrape.{scraper.platform_name}", keyword=keyword) as span:
+            with tracing.span('governor.admit'):
+                governor.admit()
+            scraper.failures = 0
+            count = 0
+            recorded = False
+            try:
+                for record in scraper.iter_products(keyword):
+                    if sink is not None:
+                        sink(record)
+                    count += 1
+                if not scraper.aborted:
+                    # 沒有結果且發生過等候逾時，視為被限流 / 封鎖；
+                    # 單純查無商品 (爬蟲辨識出「查無商品」頁面，見 BaseScraper._wait_for_results) 仍算成功
+                    governor.record(count > 0 or scraper.failures == 0)
+                    recorded = True
+                return count
+            except Exception:
+                if not scraper.aborted:
+                    governor.record(False)
+                    recorded = True
+                raise
+            finally:
+                span.set(items=count)
+                if not recorded: # 被中止 (逾時取消、客戶端斷線)：釋放 half_open 的試探名額
+                    governor.cancel()
+
+    async def _scrape_platform(self, scraper_class, keyword: str, sink=None, parent=None) -> int:
+        """
+        在執行緒池中逐筆執行單一平台的 iter_products，每筆紀錄立即交給 sink (例如 IngestSession)；
+        返回紀錄數量。被取消時中止該平台的 Chrome。
+        爬取前先經過平台管制器 (速率限制 / 斷路器)，被略過時拋出 PlatformUnavailable。
+        """
+        scraper = scraper_class()
+        governor = get_governor(scraper.platform_name)
+
+        def _run():
+            with tracing.attach(parent):
+                try:
+                    return self._scrape_keyword(scraper, governor, keyword, sink)
+                finally:
+                    scraper.close_driver()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, _run)
+        except asyncio.CancelledError:
+            scraper.abort()
+            raise
+
+    async def _run(self, keyword: str, scraper_classes: list, sink=None, parent=None):
+        """同時爬取所有平台，依完成順序收集結果；返回 (紀錄總數, 錯誤列表)"""
+        loop = asyncio.get_running_loop()
+        tasks = {
+            asyncio.create_task(self._scrape_platform(scraper_class, keyword, sink, parent)): scraper_class
+            for scraper_class in scraper_classes
+        }
+        pending = set(tasks)
+        total, errors = 0, []
+        deadline = loop.time() + self.timeout
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    for task in pending:
+                        errors.append(f"Error scraping {tasks[task].__name__}: timed out after {self.timeout}s")
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    pending = set()
+                    break
+
+                for task in done:
+                    scraper_class = tasks[task]
+                    try:
+                        total += task.result()
+                    except PlatformUnavailable as e:
+                        # 平台暫停爬取，資料庫中既有的資料仍會隨比價結果返回
+                        errors.append(f"Skipped {scraper_class.__name__}: {e}")
+                        log.warning(f"Skipped {scraper_class.__name__}: {e}")
+                    except Exception as e:
+                        errors.append(f"Error scraping {scraper_class.__name__}: {e}")
+                        log.error(f"Error scraping {scraper_class.__name__}: {e}")
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+        return total, errors
+
+    async def _scrape_platform_batch(self, scraper_class, keywords: list, sink, report, parent=None):
+        """
+        以同一個 scraper (同一個 Chrome) 依序搜尋所有關鍵字；
+        每個關鍵字完成時呼叫 report(keyword, 紀錄數量, 錯誤訊息或 None)。
+        """
+        scraper = scraper_class()
+        governor = get_governor(scraper.platform_name)
+
+        def _run():
+            scraper.hold_driver = True
+            try:
+                with tracing.attach(parent):
+                    for keyword in keywords:
+                        if scraper.aborted:
+                            break
+                        try:
+                            count = self._scrape_keyword(scraper, governor, keyword, sink)
+                        except PlatformUnavailable as e:
+                            report(keyword, 0, f"Skipped {scraper_class.__name__}: {e}")
+                        except Exception as e:
+                            log.error(f"Error scraping {scraper_class.__name__} for '{keyword}': {e}")
+                            report(keyword, 0, f"Error scraping {scraper_class.__name__}: {e}")
+                            scraper.discard_driver() # 出錯後 Chrome 狀態不明，下一個關鍵字換一個
+                        else:
+                            report(keyword, count, None)
+            finally:
+                scraper.hold_driver = False
+                scraper.close_driver()
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._batch_executor, _run)
+        except asyncio.CancelledError:
+            scraper.abort()
+            raise
+
+    async def _run_batch(self, keywords: list, scraper_classes: list, sink, events: queue.Queue, parent=None):
+        """
+        批次爬取：每個平台一個 task，依序處理所有關鍵字。
+        某個關鍵字在所有平台都完成時，將 (關鍵字, 紀錄總數, 錯誤列表) 放入 events；全部結束後放入 None。
+        總時間為每個關鍵字 timeout 秒，但不超過 batch_timeout (包含在批次執行緒池中排隊的時間)。
+        """
+        lock = threading.Lock()
+        progress = {keyword: [len(scraper_classes), 0, []] for keyword in keywords} # 剩餘平台數, 紀錄數, 錯誤
+
+        def report(keyword, count, error):
+            with lock:
+                entry = progress.get(keyword)
+                if entry is None: # 已經逾時回報過
+                    return
+                entry[0] -= 1
+                entry[1] += count
+                if error:
+                    entry[2].append(error)
+                if entry[0] == 0:
+                    del progress[keyword]
+                    events.put((keyword, entry[1], entry[2]))
+
+        tasks = [asyncio.create_task(self._scrape_platform_batch(scraper_class, keywords, sink, report, parent))
+                 for scraper_class in scraper_classes]
+        timeout = min(self.timeout * max(1, len(keywords)), self.batch_timeout)
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Batch scrape of {len(keywords)} keywords timed out after {timeout}s")
+        finally:
+            with lock:
+                for keyword, (_, count, errors) in list(progress.items()):
+                    events.put((keyword, count, errors + ["Scraping did not finish for all platforms"]))
+                progress.clear()
+            events.put(None)
+
+    def submit_batch(self, keywords: list, scraper_classes: list, sink=None):
+        """
+        排程批次爬取，返回 (Future, events)。
+        events 是 queue.Queue，依完成順序放入 (關鍵字, 紀錄總數, 錯誤列表)，結束時放入 None；
+        取消 Future 會中止所有平台的爬取。
+        """
+        loop = self._ensure_loop()
+        events = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_batch(keywords, scraper_classes, sink, events, tracing.current_span()), loop)
+        return future, events
+
+    def submit(self, keyword: str, scraper_classes: list, sink=None) -> concurrent.futures.Future:
+        """
+        排程一次爬取並返回 Future。
+        相同關鍵字已經在爬取中時，直接共用進行中的 Future；future.sink 為實際接收紀錄的 sink
+        (第一個請求傳入的)，後來的請求以它取得同一批紀錄的寫入結果。
+        """
+        loop = self._ensure_loop()
+        key = keyword.strip().lower()
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and not entry[0].done():
+                entry[1] += 1
+                return entry[0]
+
+            future = asyncio.run_coroutine_threadsafe(
+                self._run(keyword, scraper_classes, sink, tracing.current_span()), loop)
+            future.sink = sink
+            self._inflight[key] = [future, 1]
+
+        def _forget(done_future):
+            with self._lock:
+                entry = self._inflight.get(key)
+                if entry is not None and entry[0] is done_future:
+                    del self._inflight[key]
+
+        future.add_done_callback(_forget)
+        return future
+
+    def release(self, keyword: str, future: concurrent.futures.Future):
+        """等待者離開；最後一個等待者離開時取消仍在進行的爬取"""
+        key = keyword.strip().lower()
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is None or entry[0] is not future:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+        future.cancel()
+
+    def wait(self, keyword: str, future: concurrent.futures.Future, is_disconnected=None, poll_interval: float = 0.5):
+        """
+        等待爬取完成並返回 (紀錄總數, 錯誤列表)。
+        is_disconnected 返回 True (客戶端已斷線) 時放棄等待並拋出 concurrent.futures.CancelledError。
+        """
+        try:
+            while True:
+                try:
+                    return future.result(timeout=poll_interval)
+                except concurrent.futures.TimeoutError:
+                    if is_disconnected is not None and is_disconnected():
+                        raise concurrent.futures.CancelledError(f"Client disconnected while scraping '{keyword}'")
+        finally:
+            self.release(keyword, future)
+
+
+def client_disconnected(environ) -> bool:
+    """
+    檢查 WSGI 請求的客戶端是否已經關閉連線。
+    支援 gunicorn (gunicorn.socket) 與 werkzeug 開發伺服器 (werkzeug.socket)；無法判斷時返回 False。
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return False
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator() -> ScrapeOrchestrator:
+    """取得 (必要時建立) 目前行程共用的 ScrapeOrchestrator"""
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = ScrapeOrchestrator(
+                    max_workers=app_config.get_option(
+                        'SCRAPER', 'MAX_CONCURRENT_SCRAPES', fallback=DEFAULT_MAX_CONCURRENT_SCRAPES, cast=int),
+                    timeout=app_config.get_option('SCRAPER', 'SCRAPE_TIMEOUT', fallback=DEFAULT_SCRAPE_TIMEOUT, cast=float),
+                    max_batch_workers=app_config.get_option(
+                        'SCRAPER', 'MAX_BATCH_SCRAPES', fallback=DEFAULT_MAX_BATCH_SCRAPES, cast=int),
+                    batch_timeout=app_config.get_option('SCRAPER', 'BATCH_TIMEOUT', fallback=DEFAULT_BATCH_TIMEOUT, cast=float),
+                )
+    return _orchestrator
@@ -0,0 +1,234 @@
+# src/api/response_cache.py
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import Response
+
+# 優先使用較快的 JSON 編碼器 (orjson)，沒有安裝時退回標準庫 json
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 視部署環境而定
+    orjson = None
+
+# brotli 為選用套件，有安裝才提供 br 壓縮
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 視部署環境而定
+    brotli = None
+
+# 快取項目的最長存活秒數 (實際存活時間不會超過資料新鮮度門檻)
+DEFAULT_TTL_SECONDS = 600
+# 最多保留的關鍵字數量，超過時淘汰最久未使用的項目
+DEFAULT_MAX_ENTRIES = 512
+
+
+def dumps(payload) -> bytes:
+    """將結果序列化為 UTF-8 JSON bytes。"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _encoding_quality(accept_encoding: str, coding: str) -> float:
+    """
+    依 Accept-Encoding 的 q 值取得 coding 的權重 (0 表示不接受)。
+    例如 "gzip;q=0, br" 中 gzip 為 0；沒有列出時以 "*" 的權重為準。
+    """
+    wildcard = 0.0
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        name = name.strip()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == coding:
+            return quality
+        if name == '*':
+            wildcard = quality
+    return wildcard
+
+
+class CachedResponse:
+    """
+    一筆已序列化的搜尋結果。
+    同時保存原始 JSON、gzip/brotli 壓縮後的內容與內容雜湊 (ETag)，
+    重複請求時不需要再序列化或壓縮。
+    """
+
+    __slots__ = ('body', 'gzip_body', 'br_body', 'etag', 'created_at', 'expires_at', 'item_count')
+
+    def __init__(self, payload, ttl_seconds: float, created_at: float = None):
+        self.body = dumps(payload)
+        self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        self.br_body = brotli.compress(self.body) if brotli is not None else None
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.created_at = created_at if created_at is not None else time.time()
+        self.expires_at = self.created_at + ttl_seconds
+        self.item_count = len(payload.get('grouped_products') or []) if isinstance(payload, dict) else 0
+
+    @classmethod
+    def from_parts(cls, body: bytes, gzip_body: bytes, br_body, etag: str, created_at: float, expires_at: float,
+                   item_count: int):
+        """以已序列化 / 壓縮的內容重建項目 (例如從磁碟快照還原)，不重新壓縮"""
+        entry = cls.__new__(cls)
+        entry.body = body
+        entry.gzip_body = gzip_body
+        entry.br_body = br_body
+        entry.etag = etag
+        entry.created_at = created_at
+        entry.expires_at = expires_at
+        entry.item_count = item_count
+        return entry
+
+    def is_fresh(self, now: float = None) -> bool:
+        return (now if now is not None else time.time()) < self.expires_at
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.created_at, usegmt=True)
+
+    def _not_modified(self, req) -> bool:
+        """依據 If-None-Match / If-Modified-Since 判斷客戶端快取是否仍有效"""
+        if_none_match = req.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or self.etag in tags or f'W/{self.etag}' in tags
+
+        if_modified_since = req.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(self.created_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def to_response(self, req) -> Response:
+        """根據請求標頭產生 200 / 304 回應，並挑選客戶端接受的壓縮格式"""
+        max_age = max(0, int(self.expires_at - time.time()))
+        headers = {
+            'ETag': self.etag,
+            'Last-Modified': self.last_modified,
+            'Cache-Control': f'private, max-age={max_age}',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if self._not_modified(req):
+            return Response(status=304, headers=headers)
+
+        accept_encoding = req.headers.get('Accept-Encoding', '')
+        br_quality = _encoding_quality(accept_encoding, 'br') if self.br_body is not None else 0.0
+        gzip_quality = _encoding_quality(accept_encoding, 'gzip')
+        body = self.body
+        if br_quality > 0 and br_quality >= gzip_quality:
+            body = self.br_body
+            headers['Content-Encoding'] = 'br'
+        elif gzip_quality > 0:
+            body = self.gzip_body
+            headers['Content-Encoding'] = 'gzip'
+
+        return Response(body, status=200, headers=headers, mimetype='application/json')
+
+
+class ResponseCache:
+    """以關鍵字為鍵、具 TTL 與 LRU 淘汰機制的執行緒安全快取"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._restored = {} # key -> 從快照還原、尚未被請求過的項目 (見 warm_cache.py)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(keyword: str) -> str:
+        return keyword.strip().lower()
+
+    def get(self, keyword: str):
+        """取得仍在有效期限內的快取項目，過期或不存在時返回 None"""
+        key = self._key(keyword)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                restored = self._restored.pop(key, None)
+            elif not entry.is_fresh():
+                del self._entries[key]
+                return None
+            else:
+                self._entries.move_to_end(key)
+                return entry
+        if restored is None or restored.expires_at <= time.time():
+            return None
+        return self._insert(key, restored.load(), replace=False) # 在鎖外解壓縮
+
+    def _insert(self, key: str, entry: CachedResponse, replace: bool = True) -> CachedResponse:
+        with self._lock:
+            self._restored.pop(key, None)
+            if not replace and key in self._entries: # 解壓縮期間已有較新的結果
+                return self._entries[key]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def contains(self, keyword: str) -> bool:
+        """是否有仍在有效期限內的快取項目 (不影響 LRU 順序)"""
+        key = self._key(keyword)
+        with self._lock:
+            entry = self._entries.get(key) or self._restored.get(key)
+            return entry is not None and entry.expires_at > time.time()
+
+    def put(self, keyword: str, payload, ttl_seconds: float = None) -> CachedResponse:
+        """序列化並壓縮 payload 後存入快取，返回建立好的 CachedResponse"""
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        entry = CachedResponse(payload, ttl)
+        # 空結果或帶有錯誤訊息的結果不放進快取，讓下一次請求有機會重新取得完整資料
+        if not isinstance(payload, dict) or payload.get('errors') or not payload.get('grouped_products'):
+            return entry
+
+        return self._insert(self._key(keyword), entry)
+
+    def restore(self, entries) -> int:
+        """
+        放入重新啟動前的快照項目 (有 key / created_at / expires_at 與 load() 的物件)，返回放入的數量。
+        項目在第一次被請求時才載入，並保留原本的建立與到期時間。
+        """
+        now = time.time()
+        count = 0
+        with self._lock:
+            for entry in entries:
+                if count >= self.max_entries:
+                    break
+                if entry.expires_at > now and entry.key not in self._entries:
+                    self._restored[entry.key] = entry
+                    count += 1
+        return count
+
+    def snapshot_entries(self) -> list:
+        """仍新鮮的項目 [(key, 項目)]，包含尚未被請求過的還原項目，供寫入快照"""
+        now = time.time()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._restored.items() if entry.expires_at > now]
+            entries += [(key, entry) for key, entry in self._entries.items() if entry.expires_at > now]
+        return entries
+
+    def invalidate(self, keyword: str):
+        with self._lock:
+            self._entries.pop(self._key(keyword), None)
+            self._restored.pop(self._key(keyword), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._restored.clear()
@@ -0,0 +1,250 @@
+# src/api/suggest.py
+
+import bisect
+import heapq
+import os
+import re
+import threading
+
+from src.database import db_connector
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+# 商品名稱中可作為建議詞的 token (英數字詞或連續的中日韓文字)
+_TOKEN_PATTERN = re.compile(r'[0-9A-Za-z][0-9A-Za-z\-+.]*[0-9A-Za-z+]|[\u3400-\u9fff\uf900-\ufaff]{2,}')
+KEYWORD_WEIGHT = 10 # 一次實際搜尋相當於多少個商品名稱中出現的次數
+TOP_PREFIX_LENGTH = 3 # 長度不超過此值的前綴預先保存分數最高的詞 (很短的前綴符合的詞太多，不能逐一比較)
+TOP_K = 64 # 每個短前綴保存的詞數 (再依是否已快取重新排序)
+DEFAULT_LIMIT = 8
+
+
+def tokenize(name: str) -> set[str]:
+    """從商品名稱取出建議用的 token (去除純數字與單一字元)"""
+    return {token for token in _TOKEN_PATTERN.findall(name or '') if not token.isdigit()}
+
+
+class PrefixIndex:
+    """
+    搜尋建議的前綴索引：以排序陣列 + bisect 查找前綴範圍。
+
+    每個詞記錄兩種熱門程度：被搜尋的次數 (歷史關鍵字) 與出現在多少個不同的商品名稱中，
+    排序時已在回應快取中的關鍵字優先，其次依加權分數排序。
+    1 ~ TOP_PREFIX_LENGTH 個字的前綴另外保存分數最高的 TOP_K 個詞 (分數只會增加，可以逐筆更新)，
+    輸入第一、二個字時也是從最熱門的詞中挑選，而不是排序在前面的詞。
+    """
+
+    def __init__(self):
+        self._terms = {} # 小寫詞 -> [顯示文字, 搜尋次數, 商品名稱出現次數]
+        self._keys = [] # 排序後的小寫詞
+        self._top = {} # 短前綴 -> 分數最高的小寫詞 (依分數由高到低)
+        self._names = set() # 已計入出現次數的商品名稱，重新爬到相同商品時不重複計算
+        self._pending = None # 從資料庫重新載入期間的更新，換上新索引時重播
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    @staticmethod
+    def _key(term: str) -> str:
+        return ' '.join(term.lower().split())
+
+    def _score(self, key: str) -> int:
+        _, searches, mentions = self._terms[key]
+        return searches * KEYWORD_WEIGHT + mentions
+
+    def _add(self, term: str, searches: int = 0, mentions: int = 0, incremental: bool = True):
+        key = self._key(term)
+        if not key:
+            return
+        entry = self._terms.get(key)
+        if entry is None:
+            self._terms[key] = [term.strip(), searches, mentions]
+            if incremental:
+                bisect.insort(self._keys, key)
+        else:
+            entry[1] += searches
+            entry[2] += mentions
+            if searches:
+                entry[0] = term.strip() # 以使用者實際輸入的寫法顯示
+        if incremental:
+            self._update_top(key)
+
+    def _update_top(self, key: str):
+        score = self._score(key)
+        for length in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1):
+            top = self._top.setdefault(key[:length], [])
+            if key not in top:
+                if len(top) >= TOP_K and self._score(top[-1]) >= score:
+                    continue
+                top.append(key)
+            top.sort(key=self._score, reverse=True)
+            del top[TOP_K:]
+
+    def _rebuild(self):
+        """大量加入詞之後重建排序陣列與短前綴的熱門詞"""
+        self._keys = sorted(self._terms)
+        by_prefix = {}
+        for key in self._keys:
+            for length in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1):
+                by_prefix.setdefault(key[:length], []).append(key)
+        self._top = {prefix: heapq.nlargest(TOP_K, keys, key=self._score) for prefix, keys in by_prefix.items()}
+
+    def _add_names(self, names):
+        """只計算尚未計入的商品名稱"""
+        tokens = []
+        for name in names:
+            if name and name not in self._names:
+                self._names.add(name)
+                tokens.extend(tokenize(name))
+        return tokens
+
+    def _replace(self, index):
+        self._terms, self._keys, self._top, self._names = index._terms, index._keys, index._top, index._names
+        self.loaded = True
+
+    def begin_load(self):
+        """開始從資料庫重新載入：之後的 record_search / add_products 會在 load 時重播到新索引"""
+        with self._lock:
+            self._pending = []
+
+    def cancel_load(self):
+        with self._lock:
+            self._pending = None
+
+    def load(self, keywords: list[dict], product_names: list[str]):
+        """以資料庫中的歷史關鍵字與商品名稱重建索引 (包含 begin_load 之後記錄的更新)"""
+        index = PrefixIndex()
+        for row in keywords:
+            index._add(row['keyword'], searches=row['search_count'], incremental=False)
+        for token in index._add_names(product_names):
+            index._add(token, mentions=1, incremental=False)
+        index._rebuild()
+        with self._lock:
+            for kind, value in self._pending or ():
+                if kind == 'search':
+                    index._add(value, searches=1)
+                else:
+                    for token in index._add_names(value):
+                        index._add(token, mentions=1)
+            self._pending = None
+            self._replace(index)
+
+    def load_terms(self, terms):
+        """
+        以 [(顯示文字, 搜尋次數, 出現次數)] 建立索引 (例如重新啟動前的快照)。
+        已經從資料庫載入時不做事，資料庫仍是最終的來源。
+        """
+        index = PrefixIndex()
+        for display, searches, mentions in terms:
+            index._add(display, searches=searches, mentions=mentions, incremental=False)
+        index._rebuild()
+        with self._lock:
+            if self.loaded:
+                return
+            self._replace(index)
+
+    def export_terms(self):
+        """返回 [(顯示文字, 搜尋次數, 出現次數)]，尚未載入時返回 None"""
+        with self._lock:
+            if not self.loaded:
+                return None
+            return [tuple(entry) for entry in self._terms.values()]
+
+    def record_search(self, keyword: str):
+        """記錄一次有結果的搜尋"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('search', keyword))
+            self._add(keyword, searches=1)
+
+    def add_products(self, records):
+        """寫入資料庫的商品 (ProductRecord) 加入索引；同一個商品名稱只計算一次"""
+        names = [record.name for record in records]
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('products', names))
+            for token in self._add_names(names): # 每個 token 計算出現在幾個新的商品名稱中
+                self._add(token, mentions=1)
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT, is_cached=None) -> list[dict]:
+        """
+        返回以 prefix 開頭的建議詞，依 (是否已快取, 分數) 排序。
+        is_cached(keyword) 用來判斷關鍵字是否已有快取的搜尋結果。
+        """
+        key = self._key(prefix)
+        if not key:
+            return []
+        with self._lock:
+            if len(key) <= TOP_PREFIX_LENGTH:
+                term_keys = self._top.get(key, [])
+            else:
+                start = bisect.bisect_left(self._keys, key)
+                end = bisect.bisect_left(self._keys, key + '\U0010ffff')
+                term_keys = self._keys[start:end]
+            candidates = []
+            for term_key in term_keys:
+                display, searches, mentions = self._terms[term_key]
+                candidates.append((display, searches, searches * KEYWORD_WEIGHT + mentions))
+
+        def rank(candidate):
+            display, searches, score = candidate
+            cached = bool(searches) and is_cached is not None and is_cached(display)
+            return (cached, score)
+
+        top = heapq.nlargest(limit, candidates, key=rank)
+        return [
+            {"keyword": display, "searches": searches,
+             "cached": bool(searches) and is_cached is not None and is_cached(display)}
+            for display, searches, _ in top
+        ]
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"loaded": self.loaded, "terms": len(self._keys)}
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+_bootstrap = None # 返回建議詞的函數，在從資料庫載入完成前先使用
+
+
+def bootstrap(load_terms):
+    """
+    設定 load_terms() -> [(顯示文字, 搜尋次數, 出現次數)]，例如讀取重新啟動前的快照。
+    在每個行程的索引載入執行緒中呼叫，從資料庫載入完成前先以這些詞提供建議。
+    """
+    global _bootstrap
+    _bootstrap = load_terms
+
+
+def get_suggest_index() -> PrefixIndex:
+    """取得目前行程的建議索引；第一次使用時在背景執行緒中從資料庫載入"""
+    global _index, _index_pid
+    if _index is not None and _index_pid == os.getpid():
+        return _index
+    with _index_lock:
+        if _index is None or _index_pid != os.getpid():
+            _index = PrefixIndex()
+            _index_pid = os.getpid()
+            threading.Thread(target=load_index, args=(_index,), name="suggest-index", daemon=True).start()
+    return _index
+
+
+def current_index():
+    """目前行程已建立的建議索引 (不觸發載入)，沒有時返回 None"""
+    return _index if _index_pid == os.getpid() else None
+
+
+def load_index(index: PrefixIndex):
+    if _bootstrap is not None:
+        try:
+            index.load_terms(_bootstrap())
+        except Exception as e:
+            log.warning(f"無法以快照預先建立搜尋建議索引: {e}")
+    index.begin_load() # 查詢資料庫期間的搜尋與新商品不會因為換上新索引而遺失
+    try:
+        index.load(db_connector.get_search_keywords(), db_connector.get_product_names())
+        log.info(f"搜尋建議索引已載入 {index.status()['terms']} 個詞。")
+    except Exception as e:
+        index.cancel_load()
+        log.error(f"搜尋建議索引載入失敗: {e}")
@@ -0,0 +1,249 @@
+# src/api/warm_cache.py
+"""
+回應快取與搜尋建議詞 (關鍵字熱門程度) 的磁碟快照，讓重新啟動 / 部署後的第一批請求也能命中快取。
+
+檔案格式 (little-endian)：
+    標頭       : 'SCWC'、版本 (u16)、寫入時間 (f64)、快取項目數 (u32)、建議詞數 (u32)
+    快取項目   : created_at、expires_at (f64)、item_count (u32)、key / etag 長度 (u16)、gzip / br 長度 (u32)，
+                 接著依序是 key、etag、gzip 壓縮的 JSON、brotli 壓縮的 JSON
+    建議詞     : 顯示文字長度 (u16)、搜尋次數、商品名稱出現次數 (u32)，接著是顯示文字
+
+讀取時以 mmap 只解析各項目的標頭；回應內容在第一次被請求時才解壓縮 (SnapshotEntry.load)。
+項目保留原本的建立與到期時間，過了新鮮度門檻的項目不會因為重新啟動而延長壽命。
+"""
+
+import atexit
+import gzip
+import mmap
+import os
+import struct
+import threading
+import time
+
+from src import config as app_config
+from src.api.response_cache import CachedResponse
+from src.filelock import file_lock
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_SNAPSHOT_FILE = os.path.join(app_config.project_root_dir, '.cache', 'warm_cache.bin')
+DEFAULT_INTERVAL = 120 # 秒
+DEFAULT_MAX_TERMS = 200000
+
+MAGIC = b'SCWC'
+VERSION = 1
+_HEADER = struct.Struct('<4sHdII')
+_ENTRY = struct.Struct('<ddIHHII')
+_TERM = struct.Struct('<HII')
+_MAX_U16 = 0xFFFF
+_MAX_U32 = 0xFFFFFFFF
+
+
+class SnapshotEntry:
+    """快照中的一筆回應快取項目；內容為 mmap 的切片，load() 時才建立 CachedResponse"""
+
+    __slots__ = ('key', 'created_at', 'expires_at', 'item_count', 'etag', 'gzip_body', 'br_body')
+
+    def __init__(self, key, created_at, expires_at, item_count, etag, gzip_body, br_body):
+        self.key = key
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.item_count = item_count
+        self.etag = etag
+        self.gzip_body = gzip_body
+        self.br_body = br_body
+
+    def load(self) -> CachedResponse:
+        return CachedResponse.from_parts(
+            body=gzip.decompress(self.gzip_body), gzip_body=bytes(self.gzip_body),
+            br_body=bytes(self.br_body) if self.br_body else None, etag=self.etag,
+            created_at=self.created_at, expires_at=self.expires_at, item_count=self.item_count)
+
+
+def read_snapshot(path: str):
+    """讀取快照檔，返回 (快取項目列表, [(顯示文字, 搜尋次數, 出現次數)], 寫入時間)；檔案不存在或損壞時返回空結果"""
+    try:
+        with open(path, 'rb') as f:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except (OSError, ValueError): # 檔案不存在或是空檔案
+        return [], [], None
+
+    try:
+        magic, version, saved_at, entry_count, term_count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            log.warning(f"忽略格式不符的快取快照 {path}")
+            return [], [], None
+        offset = _HEADER.size
+        entries = []
+        for _ in range(entry_count):
+            created_at, expires_at, item_count, key_len, etag_len, gzip_len, br_len = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            key = bytes(data[offset:offset + key_len]).decode('utf-8')
+            offset += key_len
+            etag = bytes(data[offset:offset + etag_len]).decode('ascii')
+            offset += etag_len
+            gzip_body = data[offset:offset + gzip_len]
+            offset += gzip_len
+            br_body = data[offset:offset + br_len] if br_len else None
+            offset += br_len
+            entries.append(SnapshotEntry(key, created_at, expires_at, item_count, etag, gzip_body, br_body))
+        terms = []
+        for _ in range(term_count):
+            display_len, searches, mentions = _TERM.unpack_from(data, offset)
+            offset += _TERM.size
+            terms.append((bytes(data[offset:offset + display_len]).decode('utf-8'), searches, mentions))
+            offset += display_len
+        if offset > len(data):
+            raise ValueError("truncated snapshot")
+    except (struct.error, ValueError) as e:
+        log.warning(f"快取快照 {path} 損壞，略過: {e}")
+        return [], [], None
+    return entries, terms, saved_at
+
+
+def write_snapshot(path: str, entries: list, terms: list):
+    """
+    寫入快照檔 (先寫暫存檔再原子替換)。
+    entries 為 [(key, 項目)]，項目為 CachedResponse 或 SnapshotEntry；terms 為 [(顯示文字, 搜尋次數, 出現次數)]。
+    """
+    records = []
+    for key, entry in entries:
+        key_bytes, etag_bytes = key.encode('utf-8'), entry.etag.encode('ascii')
+        if len(key_bytes) > _MAX_U16 or len(entry.gzip_body) > _MAX_U32:
+            continue
+        records.append((key_bytes, etag_bytes, entry))
+    term_records = [(display.encode('utf-8'), searches, mentions) for display, searches, mentions in terms]
+    term_records = [record for record in term_records if len(record[0]) <= _MAX_U16]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, time.time(), len(records), len(term_records)))
+        for key_bytes, etag_bytes, entry in records:
+            br_body = entry.br_body or b''
+            f.write(_ENTRY.pack(entry.created_at, entry.expires_at, entry.item_count, len(key_bytes),
+                                len(etag_bytes), len(entry.gzip_body), len(br_body)))
+            f.write(key_bytes)
+            f.write(etag_bytes)
+            f.write(entry.gzip_body)
+            f.write(br_body)
+        for display_bytes, searches, mentions in term_records:
+            f.write(_TERM.pack(len(display_bytes), min(searches, _MAX_U32), min(mentions, _MAX_U32)))
+            f.write(display_bytes)
+    os.replace(tmp_path, path)
+
+
+class CacheSnapshotter:
+    """
+    定期把回應快取與搜尋建議詞寫入快照檔，啟動時再讀回。
+
+    各 worker 的快取內容不同，寫入時與檔案中現有的內容合併：相同關鍵字保留較新的快取項目，
+    建議詞的次數取較大值，因此重新啟動後每個 worker 都拿到所有 worker 的熱門關鍵字。
+    """
+
+    def __init__(self, response_cache, suggest_terms, path: str = DEFAULT_SNAPSHOT_FILE,
+                 interval: float = DEFAULT_INTERVAL, max_terms: int = DEFAULT_MAX_TERMS):
+        """suggest_terms() 返回目前行程的 [(顯示文字, 搜尋次數, 出現次數)]，索引尚未載入時返回 None"""
+        self.response_cache = response_cache
+        self.suggest_terms = suggest_terms
+        self.path = path
+        self.interval = interval
+        self.max_terms = max_terms
+        self.restored_entries = 0
+        self.last_saved = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def restore(self) -> int:
+        """將快照中仍新鮮的項目交給回應快取 (第一次被請求時才解壓縮)，返回還原的數量"""
+        entries, _, saved_at = read_snapshot(self.path)
+        if saved_at is None:
+            return 0
+        self.restored_entries = self.response_cache.restore(entries)
+        log.info(f"已從快照還原 {self.restored_entries} 筆搜尋結果快取 "
+                 f"(快照時間 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(saved_at))})。")
+        return self.restored_entries
+
+    def read_terms(self) -> list:
+        """快照中的建議詞 [(顯示文字, 搜尋次數, 出現次數)]"""
+        return read_snapshot(self.path)[1]
+
+    def _merge_terms(self, own_terms, file_terms) -> list:
+        merged = {}
+        for display, searches, mentions in list(file_terms) + list(own_terms or []):
+            key = ' '.join(display.lower().split())
+            current = merged.get(key)
+            if current is None:
+                merged[key] = [display, searches, mentions]
+            else:
+                if searches > current[1]:
+                    current[0] = display # 以搜尋次數較多的寫法顯示
+                current[1] = max(current[1], searches)
+                current[2] = max(current[2], mentions)
+        terms = [tuple(value) for value in merged.values()]
+        if len(terms) > self.max_terms:
+            terms.sort(key=lambda term: (term[1], term[2]), reverse=True)
+            terms = terms[:self.max_terms]
+        return terms
+
+    def save(self):
+        """與現有的快照合併後寫入"""
+        now = time.time()
+        own_entries = self.response_cache.snapshot_entries()
+        own_terms = self.suggest_terms()
+        with file_lock(self.path): # 多個 worker 共用同一個快照檔，讀取 -> 合併 -> 寫入的過程互斥
+            file_entries, file_terms, _ = read_snapshot(self.path)
+            merged = {}
+            for key, entry in [(entry.key, entry) for entry in file_entries] + own_entries:
+                if entry.expires_at <= now:
+                    continue
+                current = merged.get(key)
+                if current is None or entry.created_at >= current.created_at:
+                    merged[key] = entry
+            entries = sorted(merged.items(), key=lambda item: item[1].created_at, reverse=True)
+            write_snapshot(self.path, entries[:self.response_cache.max_entries], self._merge_terms(own_terms, file_terms))
+        self.last_saved = now
+
+    def _save_quietly(self):
+        try:
+            self.save()
+        except Exception as e:
+            log.error(f"寫入快取快照失敗: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._save_quietly()
+
+    def _save_at_exit(self, pid: int):
+        # fork 出的子行程會繼承 atexit，只由註冊的行程寫入
+        if os.getpid() == pid:
+            self._save_quietly()
+
+    def start(self):
+        """在目前行程啟動定期寫入的背景執行緒，並在行程結束時再寫入一次 (fork 後的子行程各自啟動)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="cache-snapshot", daemon=True)
+                self._thread.start()
+                atexit.register(self._save_at_exit, self._pid)
+
+    def status(self) -> dict:
+        return {"path": self.path, "restored_entries": self.restored_entries, "last_saved": self.last_saved}
+
+
+def get_cache_snapshotter(response_cache, suggest_terms):
+    """依 config.ini [WARM_CACHE] 建立 CacheSnapshotter；ENABLED=false 時返回 None"""
+    if not app_config.get_option('WARM_CACHE', 'ENABLED', fallback=True, cast=bool):
+        return None
+    return CacheSnapshotter(
+        response_cache, suggest_terms,
+        path=app_config.get_option('WARM_CACHE', 'FILE', fallback=DEFAULT_SNAPSHOT_FILE),
+        interval=app_config.get_option('WARM_CACHE', 'INTERVAL', fallback=DEFAULT_INTERVAL, cast=float),
+        max_terms=app_config.get_option('WARM_CACHE', 'MAX_TERMS', fallback=DEFAULT_MAX_TERMS, cast=int),
+    )
@@ -0,0 +1,47 @@
+# src/config.py
+
+from configparser import ConfigParser
+import os
+import threading
+
+# --- config.ini 的位置 (專案根目錄) ---
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+config_path = os.path.join(project_root_dir, 'config.ini')
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def load_config() -> ConfigParser:
+    """
+    延遲讀取 config.ini，只在第一次需要設定時才解析檔案。
+    找不到檔案時拋出 FileNotFoundError。
+    """
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                if not os.path.exists(config_path):
+                    print(f"Error: config.ini not found at {config_path}. Cannot proceed without database configuration.")
+                    raise FileNotFoundError(f"Missing config.ini at {config_path}. Please place it in the project root directory.")
+                parser = ConfigParser()
+                parser.read(config_path, encoding='utf-8')
+                _config = parser
+    return _config
+
+
+def get_option(section: str, key: str, fallback=None, cast=str):
+    """
+    讀取選用設定值，區段或選項不存在 (或 config.ini 不存在) 時返回 fallback。
+    cast 可為 str / int / float / bool。
+    """
+    try:
+        parser = load_config()
+    except FileNotFoundError:
+        return fallback
+    if not parser.has_option(section, key):
+        return fallback
+    if cast is bool:
+        return parser.getboolean(section, key)
+    return cast(parser.get(section, key))
@@ -0,0 +1,293 @@
+# src/database/analytics.py
+"""
+以 NumPy 陣列計算比價統計 (總結、價格百分位數、各平台最低價比例、價差分布)。
+
+每筆價格為 (商品, 平台) 的一列，商品與平台都轉成整數代碼；
+依 (商品, 價格, 平台) 排序後，每個商品的最低 / 最高價就是各群組的第一 / 最後一列，
+不需要在 Python 中逐一走訪商品。
+
+基準測試 (在專案根目錄執行)：
+    python -m src.database.analytics
+"""
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+DEFAULT_HISTOGRAM_BINS = 10
+
+
+class PriceTable:
+    """一個關鍵字的價格資料：每列為一個商品在一個平台的一筆價格"""
+
+    __slots__ = ('product', 'platform', 'price', 'available', 'record_day', 'platforms', 'product_count')
+
+    def __init__(self, product, platform, price, available, platforms: list, product_count: int, record_day=None):
+        self.product = product # 商品代碼 (依商品第一次出現的順序編號)
+        self.platform = platform # 平台代碼，對應 platforms 的索引 (依名稱排序)
+        self.price = price
+        self.available = available
+        self.record_day = record_day # 紀錄日期 (TO_DAYS)，只有從歷史價格建立時才有
+        self.platforms = platforms
+        self.product_count = product_count
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @staticmethod
+    def _codes_in_order(values):
+        """依第一次出現的順序編號 (與原本以 dict 分組時的商品順序一致)"""
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64), 0
+        uniques, first_index, inverse = np.unique(values, return_index=True, return_inverse=True)
+        rank = np.empty(len(uniques), dtype=np.int64)
+        rank[np.argsort(first_index, kind='stable')] = np.arange(len(uniques))
+        return rank[inverse.ravel()], len(uniques)
+
+    @staticmethod
+    def _platform_codes(names):
+        """平台名稱 -> 代碼 (依名稱排序)；平台只有少數幾個，逐一比較比排序字串陣列快"""
+        values = np.asarray(names, dtype=object)
+        platforms = sorted(set(values.tolist()))
+        codes = np.zeros(len(values), dtype=np.int64)
+        for code, name in enumerate(platforms[1:], start=1):
+            codes[values == name] = code
+        return codes, platforms
+
+    @classmethod
+    def from_columns(cls, product: list, platform_names: list, price: list, available: list,
+                     product_count: int, record_day: list = None) -> 'PriceTable':
+        """由已分好的欄位建立；product 為從 0 開始的商品代碼"""
+        platform, platforms = cls._platform_codes(platform_names)
+        return cls(
+            product=np.asarray(product, dtype=np.int64),
+            platform=platform,
+            price=np.asarray(price, dtype=np.float64),
+            available=np.asarray(available, dtype=bool),
+            platforms=platforms,
+            product_count=product_count,
+            record_day=None if record_day is None else np.asarray(record_day, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_rows(cls, rows) -> 'PriceTable':
+        """由 (product_id, platform, price, is_available, record_day) 資料列建立"""
+        columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+        product, product_count = cls._codes_in_order(np.asarray(columns[0], dtype=np.int64))
+        return cls.from_columns(product, columns[1], np.asarray(columns[2], dtype=object).astype(np.float64),
+                                columns[3], product_count, record_day=columns[4])
+
+    @classmethod
+    def from_grouped(cls, grouped_products: list) -> 'PriceTable':
+        """由 _group_price_rows 分組後的商品列表建立 (商品代碼即列表中的位置)"""
+        counts = [len(group['prices']) for group in grouped_products]
+        entries = [entry for group in grouped_products for entry in group['prices']]
+        return cls.from_columns(np.repeat(np.arange(len(grouped_products)), counts),
+                                [entry['platform'] for entry in entries],
+                                [entry['price'] for entry in entries],
+                                [entry['is_available'] for entry in entries],
+                                len(grouped_products))
+
+    def latest(self) -> 'PriceTable':
+        """每個 (商品, 平台) 只保留最新一天的價格"""
+        if self.record_day is None or len(self) == 0:
+            return self
+        order = np.lexsort((self.record_day, self.platform, self.product))
+        product, platform = self.product[order], self.platform[order]
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = (product[1:] != product[:-1]) | (platform[1:] != platform[:-1])
+        keep = order[is_last]
+        return PriceTable(self.product[keep], self.platform[keep], self.price[keep], self.available[keep],
+                          self.platforms, self.product_count, self.record_day[keep])
+
+
+class _ProductGroups:
+    """有庫存價格依商品分組後的結果 (每列價格屬於一個群組，群組陣列每個元素對應一個商品)"""
+
+    def __init__(self, table: PriceTable):
+        mask = table.available
+        product, price, platform = table.product[mask], table.price[mask], table.platform[mask]
+        # 查詢結果通常已依商品排列，只有不連續時才需要排序
+        if len(product) > 1 and (product[1:] < product[:-1]).any():
+            order = np.argsort(product, kind='stable')
+            product, price, platform = product[order], price[order], platform[order]
+        self.price, self.platform = price, platform
+
+        boundary = np.ones(len(product), dtype=bool)
+        boundary[1:] = product[1:] != product[:-1]
+        self.starts = np.flatnonzero(boundary)
+        self.ids = product[self.starts]
+        self.counts = np.diff(np.append(self.starts, len(product)))
+        self.row_group = np.repeat(np.arange(len(self.starts)), self.counts)
+        if len(product) == 0:
+            self.min_price = self.max_price = self.spread = price
+            self.best_platform = platform
+            return
+        self.min_price = np.minimum.reduceat(price, self.starts)
+        self.max_price = np.maximum.reduceat(price, self.starts)
+        self.spread = self.max_price - self.min_price
+        # 同價時取原本順序中第一筆最低價，與逐列以 < 比較的結果相同
+        is_lowest = price == self.min_price[self.row_group]
+        rows = np.arange(len(price))
+        first_lowest = np.minimum.reduceat(np.where(is_lowest, rows, len(price)), self.starts)
+        self.best_platform = platform[first_lowest]
+
+
+def _best_platform(groups: _ProductGroups, platforms: list) -> str:
+    """最低價次數最多的平台；同票時取較早 (依商品順序) 拿到最低價的平台"""
+    if len(groups.ids) == 0:
+        return "N/A"
+    wins = np.bincount(groups.best_platform, minlength=len(platforms))
+    first_win = np.full(len(platforms), np.iinfo(np.int64).max)
+    np.minimum.at(first_win, groups.best_platform, groups.ids)
+    candidates = np.flatnonzero(wins == wins.max())
+    return platforms[candidates[np.argmin(first_win[candidates])]]
+
+
+def price_ranges(table: PriceTable):
+    """
+    每個有庫存價格的商品的 (商品代碼, 最低價, 最高價, 最低價平台名稱) 陣列。
+    沒有任何有庫存價格的商品不會出現在結果中。
+    """
+    groups = _ProductGroups(table)
+    return groups.ids, groups.min_price, groups.max_price, np.asarray(table.platforms, dtype=object)[groups.best_platform]
+
+
+def summarize(table: PriceTable) -> dict:
+    """搜尋結果的總結：商品數、平均價差 (有兩個以上有庫存價格的商品)、最常是最低價的平台"""
+    groups = _ProductGroups(table)
+    comparable = groups.counts > 1
+    avg_savings = float(groups.spread[comparable].mean()) if comparable.any() else 0.0
+    return {
+        "total_products": table.product_count,
+        "avg_savings": float(f"{avg_savings:.2f}"), # 四捨五入到小數點後兩位
+        "best_platform": _best_platform(groups, table.platforms),
+    }
+
+
+def _round(values) -> list:
+    return [round(float(value), 2) for value in values]
+
+
+def price_stats(table: PriceTable, percentiles=DEFAULT_PERCENTILES, bins: int = DEFAULT_HISTOGRAM_BINS) -> dict:
+    """
+    詳細統計 (只計算有庫存的價格)：
+    - prices：價格的百分位數與平均
+    - platforms：各平台的報價數、拿到最低價的次數、在有比價的商品中的最低價比例、平均比最低價貴多少 (%)
+    - spread：有兩個以上平台報價的商品，最高與最低價差 (金額與百分比) 的百分位數與分布
+    """
+    table = table.latest()
+    groups = _ProductGroups(table)
+    percentiles = list(percentiles)
+    labels = [f"p{int(p) if float(p).is_integer() else p}" for p in percentiles]
+
+    stats = {
+        "products": table.product_count,
+        "offers": int(table.available.sum()),
+        "prices": {},
+        "platforms": {},
+        "spread": {"products": 0},
+    }
+    if len(groups.price) == 0:
+        return stats
+
+    stats["prices"] = dict(zip(labels, _round(np.percentile(groups.price, percentiles))),
+                           mean=round(float(groups.price.mean()), 2),
+                           min=round(float(groups.price.min()), 2), max=round(float(groups.price.max()), 2))
+
+    # 每筆報價所屬商品的最低價，用來計算各平台比最低價貴多少
+    group_of_row = groups.row_group
+    comparable_row = groups.counts[group_of_row] > 1
+    lowest = groups.min_price[group_of_row]
+    premium = np.divide(groups.price - lowest, lowest, out=np.zeros(len(lowest)), where=lowest > 0)
+
+    platform_count = len(table.platforms)
+    offers = np.bincount(groups.platform, minlength=platform_count)
+    compared = np.bincount(groups.platform[comparable_row], minlength=platform_count)
+    wins = np.bincount(groups.best_platform, minlength=platform_count)
+    compared_wins = np.bincount(groups.best_platform[groups.counts > 1], minlength=platform_count)
+    premium_sum = np.bincount(groups.platform[comparable_row], weights=premium[comparable_row], minlength=platform_count)
+    for index, name in enumerate(table.platforms):
+        if not offers[index]:
+            continue
+        stats["platforms"][name] = {
+            "offers": int(offers[index]),
+            "lowest_count": int(wins[index]),
+            "compared": int(compared[index]),
+            "win_rate": round(float(compared_wins[index] / compared[index]), 4) if compared[index] else None,
+            "avg_premium_pct": round(float(premium_sum[index] / compared[index] * 100), 2) if compared[index] else None,
+        }
+
+    comparable = groups.counts > 1
+    if comparable.any():
+        spread = groups.spread[comparable]
+        spread_pct = np.divide(spread, groups.min_price[comparable], out=np.zeros(len(spread)),
+                               where=groups.min_price[comparable] > 0) * 100
+        counts, edges = np.histogram(spread, bins=bins)
+        stats["spread"] = {
+            "products": int(comparable.sum()),
+            "mean": round(float(spread.mean()), 2),
+            "amount": dict(zip(labels, _round(np.percentile(spread, percentiles)))),
+            "percent": dict(zip(labels, _round(np.percentile(spread_pct, percentiles)))),
+            "histogram": {"edges": _round(edges), "counts": counts.tolist()},
+        }
+    return stats
+
+
+# --- 基準測試 ---
+if __name__ == '__main__':
+    import time
+
+    def _summary_by_loop(grouped_products: list) -> dict:
+        """比較用：原本逐一走訪商品的寫法"""
+        total_difference, items, lowest_count = 0, 0, {}
+        for group in grouped_products:
+            available_prices = [p['price'] for p in group['prices'] if p['is_available']]
+            if len(available_prices) > 1:
+                total_difference += max(available_prices) - min(available_prices)
+                items += 1
+            if group['min_price_platform']:
+                lowest_count[group['min_price_platform']] = lowest_count.get(group['min_price_platform'], 0) + 1
+        return {
+            "total_products": len(grouped_products),
+            "avg_savings": float(f"{(total_difference / items if items else 0.0):.2f}"),
+            "best_platform": max(lowest_count, key=lowest_count.get) if lowest_count else "N/A",
+        }
+
+    rng = np.random.default_rng(42)
+    platform_names = ['PChome', 'coupang', 'momo']
+    product_total, days = 30000, 2
+    rows = []
+    for product_id in range(1, product_total + 1):
+        base = float(rng.integers(100, 50000))
+        for name in platform_names[:rng.integers(1, 4)]:
+            for day in range(days):
+                rows.append((product_id, name, round(base * rng.uniform(0.85, 1.15), 2), bool(rng.random() > 0.05), 739000 + day))
+    print(f"{len(rows)} 筆價格 ({product_total} 個商品)")
+
+    grouped = {}
+    for product_id, name, price, available, _ in rows:
+        group = grouped.setdefault(product_id, {"prices": [], "lowest_price": float('inf'), "min_price_platform": None})
+        group["prices"].append({"platform": name, "price": price, "is_available": available})
+        if available and price < group["lowest_price"]:
+            group["lowest_price"], group["min_price_platform"] = price, name
+    grouped = list(grouped.values())
+    for group in grouped:
+        group["prices"].sort(key=lambda entry: (not entry["is_available"], entry["price"]))
+
+    def timed(label, func, repeat=5):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:<40} {best * 1000:8.1f} ms")
+        return result
+
+    loop_summary = timed("summary (逐一走訪)", lambda: _summary_by_loop(grouped))
+    grouped_table = timed("PriceTable.from_grouped (轉換為陣列)", lambda: PriceTable.from_grouped(grouped))
+    vector_summary = timed("summarize", lambda: summarize(grouped_table))
+    timed("price_ranges", lambda: price_ranges(grouped_table))
+    table = timed("PriceTable.from_rows", lambda: PriceTable.from_rows(rows))
+    timed("price_stats (含每日最新價格篩選)", lambda: price_stats(table))
+    print("逐一走訪:", loop_summary)
+    print("NumPy:   ", vector_summary)
@@ -0,0 +1,258 @@
+# src/database/attributes.py
+"""
+由商品名稱擷取結構化屬性 (品牌、型號、容量 / 尺寸、顏色)，寫入 product_attributes 供搜尋篩選與 facet 統計。
+
+例如 "Sony WH-1000XM5 無線降噪耳機 黑色" -> brand=Sony, model=WH-1000XM5, color=黑色
+
+字典與正規表示式在建立 AttributeExtractor 時編譯一次；同一個商品名稱每天都會被重新爬到，
+擷取結果另以 LRU 快取，寫入大量資料時幾乎不需要重新比對。
+
+補齊既有商品的屬性 (在專案根目錄執行)：
+    python -m src.database.attributes --backfill
+以 EXAMPLES 中的商品名稱檢查擷取規則：
+    python -m src.database.attributes --self-test
+"""
+
+import argparse
+import functools
+import re
+import sys
+import threading
+import zlib
+
+from src import config as app_config
+
+FACET_NAMES = ('brand', 'model', 'capacity', 'color')
+
+# 品牌 -> 別名 (比對時不分大小寫；英數字別名須為獨立的詞)
+BRANDS = {
+    'Apple': ['apple', '蘋果'], 'Samsung': ['samsung', '三星'], 'Sony': ['sony', '索尼'],
+    'ASUS': ['asus', '華碩'], 'Acer': ['acer', '宏碁'], 'MSI': ['msi', '微星'], 'Lenovo': ['lenovo', '聯想'],
+    'HP': ['hp', '惠普'], 'Dell': ['dell', '戴爾'], 'Microsoft': ['microsoft', '微軟'], 'Google': ['google'],
+    'Xiaomi': ['xiaomi', '小米'], 'Huawei': ['huawei', '華為'], 'OPPO': ['oppo'], 'vivo': ['vivo'],
+    'LG': ['lg'], 'Panasonic': ['panasonic', '國際牌'], 'Philips': ['philips', '飛利浦'],
+    'Hitachi': ['hitachi', '日立'], 'Sharp': ['sharp', '夏普'], 'Toshiba': ['toshiba', '東芝'],
+    'Dyson': ['dyson'], 'Tatung': ['tatung', '大同'], 'Sampo': ['sampo', '聲寶'], 'Kolin': ['kolin', '歌林'],
+    'TECO': ['teco', '東元'], 'HERAN': ['heran', '禾聯'], 'Zojirushi': ['zojirushi', '象印'], 'Tiger': ['tiger', '虎牌'],
+    'Tefal': ['tefal', '特福'], 'Logitech': ['logitech', '羅技'], 'Razer': ['razer', '雷蛇'],
+    'Kingston': ['kingston', '金士頓'], 'SanDisk': ['sandisk'], 'Seagate': ['seagate'], 'WD': ['wd', 'western digital'],
+    'Anker': ['anker'], 'Bose': ['bose'], 'JBL': ['jbl'], 'Sennheiser': ['sennheiser', '森海塞爾'],
+    'Audio-Technica': ['audio-technica', '鐵三角'], 'Beats': ['beats'], 'Marshall': ['marshall'],
+    'Nintendo': ['nintendo', '任天堂'], 'Canon': ['canon', '佳能'], 'Nikon': ['nikon'], 'Fujifilm': ['fujifilm', '富士'],
+    'GoPro': ['gopro'], 'Garmin': ['garmin'], 'TP-Link': ['tp-link'], 'D-Link': ['d-link'],
+}
+
+# 顏色 -> 別名；中文單字顏色須帶「色」，避免誤判 (例如「金士頓」)
+COLORS = {
+    '黑色': ['黑色', 'black'], '白色': ['白色', 'white'], '銀色': ['銀色', 'silver'], '金色': ['金色', 'gold'],
+    '灰色': ['灰色', 'gray', 'grey'], '藍色': ['藍色', 'blue'], '紅色': ['紅色', 'red'], '綠色': ['綠色', 'green'],
+    '粉色': ['粉色', '粉紅色', 'pink'], '紫色': ['紫色', 'purple'], '黃色': ['黃色', 'yellow'], '橘色': ['橘色', '橙色', 'orange'],
+    '棕色': ['棕色', '咖啡色', 'brown'], '米色': ['米色', '奶茶色', 'beige'], '玫瑰金': ['玫瑰金', 'rose gold'],
+    '太空灰': ['太空灰', 'space gray', 'space grey'], '午夜藍': ['午夜藍', 'midnight blue'], '星光色': ['星光色', 'starlight'],
+}
+
+# 含有品牌 / 顏色別名但不是指該品牌 / 顏色的詞，比對前先遮蔽
+# (中文沒有詞的邊界，例如「富士山」不是 Fujifilm；英文例如 Red Bull 不是紅色)
+NOT_ATTRIBUTE_PHRASES = [
+    '富士山', '富士蘋果', '蘋果醋', '蘋果汁', '蘋果派', '蘋果泥', '蘋果乾', '三星蔥', '三星級', '小米粥', '小米酒',
+    'red bull', 'red label', 'black friday', 'green tea', 'white noise',
+]
+
+# 容量 / 尺寸單位 -> 正規化後的寫法
+UNITS = {
+    'tb': 'TB', 'gb': 'GB', 'mb': 'MB', 'mah': 'mAh', 'ml': 'mL', 'l': 'L', '公升': 'L',
+    'w': 'W', '吋': '吋', '寸': '吋', 'inch': '吋', '"': '吋', 'cm': 'cm', 'mm': 'mm', 'kg': 'kg', 'g': 'g',
+}
+
+# 只寫 G 時：常見的儲存容量數值視為 GB (例如「64G 隨身碟」)，3G / 4G / 5G 是行動網路世代，其餘視為公克
+STORAGE_SIZES = {8, 16, 32, 64, 128, 256, 512, 1024, 2048}
+NETWORK_GENERATIONS = {3, 4, 5}
+
+_WORD_EDGE = r'(?<![0-9A-Za-z]){}(?![0-9A-Za-z])'
+_CAPACITY_PATTERN = re.compile(
+    r'(?<![0-9A-Za-z.])(\d+(?:\.\d+)?)\s*(' + '|'.join(sorted(map(re.escape, UNITS), key=len, reverse=True)) + r')(?![A-Za-z])',
+    re.IGNORECASE)
+# 型號：同時含英文字母與數字的詞 (可含連字號)，例如 WH-1000XM5、RT-AX58U
+_MODEL_PATTERN = re.compile(r'(?<![0-9A-Za-z\-])(?=[0-9A-Za-z\-]*\d)(?=[0-9A-Za-z\-]*[A-Za-z])[0-9A-Za-z]+(?:-[0-9A-Za-z]+)*(?![0-9A-Za-z\-])')
+_MODEL_MIN_LENGTH = 3 # 排除 4K、5G 之類的規格詞
+EXTRACTOR_REVISION = 2 # 擷取規則 (正規表示式) 改變時遞增，讓既有商品重新擷取
+CACHE_SIZE = 65536
+
+
+def _phrase_pattern(alias: str) -> str:
+    """單一別名的正規表示式：空白可省略，英數字別名須為獨立的詞"""
+    escaped = re.escape(alias).replace(r'\ ', r'\s*')
+    return _WORD_EDGE.format(escaped) if alias.isascii() else escaped
+
+
+def _capacity(match):
+    """將容量比對結果正規化；3G / 4G / 5G 等不是容量時返回 None"""
+    number, unit = match.groups()
+    value = float(number)
+    normalized = UNITS[unit.lower()]
+    if unit.lower() == 'g':
+        if value in NETWORK_GENERATIONS:
+            return None
+        if value in STORAGE_SIZES:
+            normalized = 'GB'
+    return f"{value:g}{normalized}"
+
+
+def _alias_pattern(dictionary: dict):
+    """將 {標準名稱: [別名...]} 編譯成單一正規表示式 (較長的別名優先) 與 別名 -> 標準名稱 的對照表"""
+    lookup = {}
+    for canonical, aliases in dictionary.items():
+        for alias in [canonical, *aliases]:
+            lookup[alias.lower()] = canonical
+    parts = [_phrase_pattern(alias) for alias in sorted(lookup, key=len, reverse=True)]
+    return re.compile('|'.join(parts), re.IGNORECASE), lookup
+
+
+class AttributeExtractor:
+    """以預先編譯的字典與正規表示式從商品名稱擷取屬性"""
+
+    def __init__(self, brands: dict = None, colors: dict = None, excluded_phrases: list = None):
+        brands = dict(BRANDS if brands is None else brands)
+        colors = dict(COLORS if colors is None else colors)
+        excluded_phrases = sorted(set(NOT_ATTRIBUTE_PHRASES if excluded_phrases is None else excluded_phrases), key=len, reverse=True)
+        self._brand_pattern, self._brand_lookup = _alias_pattern(brands)
+        self._color_pattern, self._color_lookup = _alias_pattern(colors)
+        self._excluded_pattern = re.compile('|'.join(map(_phrase_pattern, excluded_phrases)), re.IGNORECASE) if excluded_phrases else None
+        # 字典內容決定版本號；字典改變後，已擷取的商品會在下次寫入時重新擷取
+        signature = repr((EXTRACTOR_REVISION, sorted((k, sorted(v)) for k, v in brands.items()),
+                          sorted((k, sorted(v)) for k, v in colors.items()), excluded_phrases))
+        self.version = zlib.crc32(signature.encode('utf-8')) % 32000 + 1
+        self.extract = functools.lru_cache(maxsize=CACHE_SIZE)(self._extract)
+
+    @staticmethod
+    def _normalize_key(text: str) -> str:
+        return ' '.join(text.lower().split())
+
+    def _extract(self, name: str) -> dict:
+        """返回 {brand, model, capacity, color}，找不到的屬性為 None"""
+        name = name or ''
+        # 遮蔽不是品牌 / 顏色的詞 (以等長的空白取代，不影響其他位置)
+        masked = self._excluded_pattern.sub(lambda m: ' ' * len(m.group()), name) if self._excluded_pattern else name
+        brand_match = self._brand_pattern.search(masked)
+        color_match = self._color_pattern.search(masked)
+
+        capacity = None
+        for capacity_match in _CAPACITY_PATTERN.finditer(name):
+            capacity = _capacity(capacity_match)
+            if capacity is not None:
+                break
+
+        model = None
+        for candidate in _MODEL_PATTERN.findall(name):
+            if len(candidate) < _MODEL_MIN_LENGTH or _CAPACITY_PATTERN.fullmatch(candidate):
+                continue
+            if self._normalize_key(candidate) in self._brand_lookup:
+                continue
+            model = candidate.upper()
+            break
+
+        return {
+            'brand': self._brand_lookup[self._normalize_key(brand_match.group())] if brand_match else None,
+            'model': model,
+            'capacity': capacity,
+            'color': self._color_lookup[self._normalize_key(color_match.group())] if color_match else None,
+        }
+
+    @staticmethod
+    def rows(product_id: int, attributes: dict) -> list[tuple]:
+        """轉成 product_attributes 的 (product_id, name, value) 資料列"""
+        return [(product_id, name, value[:100]) for name, value in attributes.items() if value]
+
+
+# 擷取規則的範例 (商品名稱 -> 應擷取到的屬性，未列出的屬性不檢查)，修改規則後以 --self-test 檢查
+EXAMPLES = [
+    ("Sony WH-1000XM5 無線降噪耳機 黑色", {'brand': 'Sony', 'model': 'WH-1000XM5', 'color': '黑色'}),
+    ("Samsung Galaxy S24 5G 手機", {'brand': 'Samsung', 'model': 'S24', 'capacity': None}),
+    ("OPPO Reno 4G 智慧型手機 128G", {'brand': 'OPPO', 'capacity': '128GB'}),
+    ("金士頓 64G 隨身碟", {'brand': 'Kingston', 'capacity': '64GB'}),
+    ("金士頓 64GB 隨身碟", {'brand': 'Kingston', 'capacity': '64GB'}),
+    ("日本 富士山 造型 馬克杯", {'brand': None}),
+    ("富士蘋果 禮盒", {'brand': None}),
+    ("Fujifilm instax mini 12 拍立得", {'brand': 'Fujifilm'}),
+    ("富士 拍立得底片", {'brand': 'Fujifilm'}),
+    ("Red Bull 能量飲料 250ml", {'color': None, 'capacity': '250mL'}),
+    ("Apple iPhone 15 Pro Red", {'brand': 'Apple', 'color': '紅色'}),
+    ("咖啡豆 500g", {'capacity': '500g'}),
+]
+
+
+def self_test(extractor: AttributeExtractor) -> list[str]:
+    """以 EXAMPLES 檢查擷取結果，返回不符合的說明 (全部符合時為空列表)"""
+    failures = []
+    for name, expected in EXAMPLES:
+        result = extractor.extract(name)
+        for key, value in expected.items():
+            if result[key] != value:
+                failures.append(f"{name!r}: {key}={result[key]!r}, expected {value!r}")
+    return failures
+
+
+def _load_dictionary_file(path: str) -> dict:
+    """讀取自訂字典：每行「標準名稱,別名1,別名2...」，# 開頭為註解"""
+    dictionary = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            canonical, *aliases = [part.strip() for part in line.split(',')]
+            dictionary[canonical] = [alias for alias in aliases if alias]
+    return dictionary
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_attribute_extractor() -> AttributeExtractor:
+    """
+    取得共用的屬性擷取器。
+    config.ini 的 [ATTRIBUTES] BRANDS_FILE / COLORS_FILE 可指定額外的字典檔 (與內建字典合併)。
+    """
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                brands, colors = dict(BRANDS), dict(COLORS)
+                brands_file = app_config.get_option('ATTRIBUTES', 'BRANDS_FILE')
+                colors_file = app_config.get_option('ATTRIBUTES', 'COLORS_FILE')
+                if brands_file:
+                    brands.update(_load_dictionary_file(brands_file))
+                if colors_file:
+                    colors.update(_load_dictionary_file(colors_file))
+                _extractor = AttributeExtractor(brands, colors)
+    return _extractor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="由商品名稱擷取品牌 / 型號 / 容量 / 顏色屬性")
+    parser.add_argument('--backfill', action='store_true', help="補齊 (或依新字典更新) 資料庫中既有商品的屬性")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--self-test', action='store_true', help="以內建的範例商品名稱檢查擷取規則")
+    parser.add_argument('names', nargs='*', help="只顯示這些商品名稱的擷取結果")
+    args = parser.parse_args(argv)
+
+    extractor = get_attribute_extractor()
+    for name in args.names:
+        print(name, '->', extractor.extract(name))
+    if args.self_test:
+        failures = self_test(AttributeExtractor()) # 只檢查內建字典
+        for failure in failures:
+            print("FAIL", failure)
+        print(f"檢查 {len(EXAMPLES)} 個範例，{len(failures)} 項不符合。")
+        if failures:
+            return 1
+    if args.backfill:
+        from src.database import db_connector
+        updated = db_connector.backfill_product_attributes(extractor, batch_size=args.batch_size)
+        print(f"已更新 {updated} 個商品的屬性 (版本 {extractor.version})。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
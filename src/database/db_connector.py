@@ -3,62 +3,441 @@
 import pymysql
 from pymysql.cursors import DictCursor
 from datetime import datetime, timedelta
-from configparser import ConfigParser, NoOptionError
+from configparser import NoOptionError
 import os
+import queue
+import threading
+import time
 import decimal
 
+from src import config as app_config
+from src import tracing
+from src.models import ProductRecord
+from src.database import analytics
+from src.database.attributes import FACET_NAMES, AttributeExtractor, get_attribute_extractor
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
 # --- 配置資料庫連接參數 ---
 current_script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root_dir = os.path.abspath(os.path.join(current_script_dir, '..', '..'))
-config_path = os.path.join(project_root_dir, 'config.ini')
+config_path = app_config.config_path
 
-config = ConfigParser()
 DB_CONFIG = {}
 DB_NAME = '' # 將資料庫名稱獨立出來，方便初始化時使用
+DEFAULT_POOL_SIZE = 5
+DEFAULT_PORT = 3306
+DEFAULT_REPLICA_MAX_LAG = 30 # 秒，複寫延遲超過時暫停使用該唯讀副本
+DEFAULT_REPLICA_CHECK_INTERVAL = 5 # 秒，每個唯讀副本的健康檢查間隔
+DEFAULT_REPLICA_CONNECT_TIMEOUT = 2 # 秒，連線唯讀副本的逾時 (連不上時盡快改用其他副本或主庫)
 
-if not os.path.exists(config_path):
-    print(f"Error: config.ini not found at {config_path}. Cannot proceed without database configuration.")
-    raise FileNotFoundError(f"Missing config.ini at {config_path}. Please place it in the project root directory.")
-else:
-    config.read(config_path)
+def _load_db_config() -> dict:
+    """
+    延遲解析 config.ini 中的 [DB_CONFIG] 區段。
+    只在第一次建立連線時執行，避免模組 import 時就讀取設定檔。
+    """
+    global DB_NAME
+    if DB_CONFIG:
+        return DB_CONFIG
 
+    config = app_config.load_config()
     if not config.has_section("DB_CONFIG"):
         print(
             f"Error: Section [DB_CONFIG] not found in {config_path}. Please ensure it contains database connection details.")
         raise ValueError(f"Missing [DB_CONFIG] section in {config_path}.")
 
+    loaded = {}
     required_db_keys = ['DB_HOST', 'DB_USER', 'DB_PASSWORD', 'DB_NAME']
     for key in required_db_keys:
         try:
-            DB_CONFIG[key.lower()] = config.get("DB_CONFIG", key)
+            loaded[key.lower()] = config.get("DB_CONFIG", key)
         except NoOptionError:
             print(f"Error: Missing option '{key}' in section 'DB_CONFIG' in {config_path}.")
             raise
+    loaded['db_pool_size'] = config.getint("DB_CONFIG", "DB_POOL_SIZE", fallback=DEFAULT_POOL_SIZE)
+    loaded['db_port'] = config.getint("DB_CONFIG", "DB_PORT", fallback=DEFAULT_PORT)
+    loaded['db_replicas'] = _parse_endpoints(config.get("DB_CONFIG", "DB_REPLICAS", fallback=''))
+    loaded['replica_max_lag'] = config.getfloat("DB_CONFIG", "REPLICA_MAX_LAG", fallback=DEFAULT_REPLICA_MAX_LAG)
+    loaded['replica_check_interval'] = config.getfloat("DB_CONFIG", "REPLICA_CHECK_INTERVAL",
+                                                       fallback=DEFAULT_REPLICA_CHECK_INTERVAL)
+    loaded['replica_connect_timeout'] = config.getfloat("DB_CONFIG", "REPLICA_CONNECT_TIMEOUT",
+                                                        fallback=DEFAULT_REPLICA_CONNECT_TIMEOUT)
+
+    DB_CONFIG.update(loaded)
     DB_NAME = DB_CONFIG['db_name'] # 從 config.ini 獲取資料庫名稱
+    return DB_CONFIG
+
+def _parse_endpoints(value: str) -> list[tuple[str, int]]:
+    """解析 DB_REPLICAS 設定，例如 "10.0.0.2, 10.0.0.3:3307" -> [(host, port), ...]"""
+    endpoints = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        endpoints.append((host.strip(), int(port) if port else DEFAULT_PORT))
+    return endpoints
 
 # --- 資料庫連接函數 ---
-def get_db_connection(target_db_name=None):
+def _connect(database, host=None, port=None, connect_timeout=None):
+    """建立一條新的 pymysql 連線 (不經過連線池)；未指定 host 時連線到主庫"""
+    db_config = _load_db_config()
+    return pymysql.connect(
+        host=host or db_config['db_host'],
+        port=port or db_config['db_port'],
+        user=db_config['db_user'],
+        password=db_config['db_password'],
+        database=database, # 將 None 傳遞給 database 參數表示不指定數據庫
+        charset='utf8mb4',
+        cursorclass=DictCursor,
+        connect_timeout=connect_timeout or 10 # pymysql 的預設值
+    )
+
+
+class _PooledConnection:
+    """包裝 pymysql 連線：close() 時把連線歸還連線池，而不是真的關閉。"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+
+class ConnectionPool:
+    """
+    簡單的執行緒安全連線池。
+    閒置連線最多保留 size 條；池中沒有閒置連線時直接建立新連線，
+    超出容量的連線在歸還時關閉。
+    """
+
+    def __init__(self, size: int, host: str = None, port: int = None, connect_timeout: float = None):
+        self.size = size
+        self.host = host # None 表示主庫
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self._idle = queue.LifoQueue()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.warmed = False
+
+    def _check_fork(self):
+        # gunicorn 預先載入應用後 fork 出 worker，子行程不能沿用父行程的 socket
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = queue.LifoQueue()
+                    self.created = 0
+                    self.in_use = 0
+                    self.warmed = False
+                    self._pid = os.getpid()
+
+    def acquire(self):
+        self._check_fork()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.ping(reconnect=True)
+                with self._lock:
+                    self.in_use += 1
+                return conn
+            except pymysql.Error:
+                self._discard(conn)
+        conn = _connect(_load_db_config()['db_name'], self.host, self.port, self.connect_timeout)
+        with self._lock:
+            self.created += 1
+            self.in_use += 1
+        return conn
+
+    def release(self, conn):
+        self._check_fork()
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+        try:
+            # 結束連線上的交易，避免下一個使用者看到舊的 REPEATABLE READ 快照
+            conn.rollback()
+        except pymysql.Error:
+            self._discard(conn)
+            return
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self.created = max(0, self.created - 1)
+        try:
+            conn.close()
+        except pymysql.Error:
+            pass
+
+    def warm(self, count: int = None):
+        """預先建立連線，讓第一批請求不必付出連線成本"""
+        count = self.size if count is None else min(count, self.size)
+        conns = [self.acquire() for _ in range(max(0, count - self._idle.qsize()))]
+        for conn in conns:
+            self.release(conn)
+        self.warmed = True
+
+    def status(self) -> dict:
+        self._check_fork()
+        return {"size": self.size, "idle": self._idle.qsize(), "in_use": self.in_use, "warm": self.warmed}
+
+
+def _replication_lag(conn):
+    """
+    返回副本落後主庫的秒數；複寫已停止時返回 None。
+    伺服器不是副本或帳號沒有 REPLICATION CLIENT 權限時視為沒有延遲 (方便以兩個獨立的本機 MySQL 測試)。
+    """
+    with conn.cursor() as cursor:
+        for query, column in (("SHOW REPLICA STATUS", 'Seconds_Behind_Source'),  # MySQL 8.0.22+
+                              ("SHOW SLAVE STATUS", 'Seconds_Behind_Master')):
+            try:
+                cursor.execute(query)
+            except pymysql.Error as e:
+                if isinstance(e, pymysql.err.InterfaceError) or (e.args and e.args[0] >= 2000):
+                    raise # 用戶端錯誤碼 (2xxx) 表示連線問題
+                continue # 語法不支援或權限不足，改用舊語法
+            row = cursor.fetchone()
+            if not row:
+                return 0.0
+            lag = row.get(column)
+            return None if lag is None else float(lag)
+    return 0.0
+
+
+class _Replica:
+    """單一唯讀副本的連線池與健康狀態"""
+
+    def __init__(self, host: str, port: int, pool_size: int, connect_timeout: float = None):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.pool = ConnectionPool(pool_size, host=host, port=port, connect_timeout=connect_timeout)
+        self.healthy = False # 第一次健康檢查完成前不使用 (讀取改用主庫)
+        self.lag = None
+        self.error = "not checked yet"
+        self.checked_pid = None # 做出 healthy 判斷的行程；fork 後沿用父行程的結果不算數
+
+
+class ReplicaSet:
+    """
+    唯讀副本集合。
+    讀取查詢分散到「使用中連線最少」的健康副本 (相同時輪流)；
+    背景執行緒每 check_interval 秒檢查一次各副本的連線與複寫延遲 (請求執行緒不會等待檢查)，
+    無法連線或落後超過 max_lag 秒的副本暫停使用，直到下一次檢查恢復；
+    每個 worker 在自己的第一次檢查通過前都不使用副本 (讀取改用主庫)。
+    """
+
+    def __init__(self, endpoints: list[tuple[str, int]], pool_size: int, max_lag: float, check_interval: float,
+                 connect_timeout: float = None):
+        self.replicas = [_Replica(host, port, pool_size, connect_timeout) for host, port in endpoints]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next = 0
+        self._checker_pid = None
+
+    def _candidates(self) -> list:
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        rotated = self.replicas[start:] + self.replicas[:start]
+        return sorted(rotated, key=lambda replica: replica.pool.in_use) # 穩定排序保留輪流順序
+
+    def _ensure_checker(self):
+        """啟動目前行程的健康檢查執行緒 (gunicorn fork 出的 worker 不會繼承父行程的執行緒)"""
+        if self._checker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+        threading.Thread(target=self._run_checks, name="replica-health", daemon=True).start()
+
+    def _run_checks(self):
+        while True:
+            for replica in self.replicas:
+                try:
+                    self._check(replica)
+                except Exception as e: # 非 pymysql 的錯誤也不能讓檢查執行緒結束，否則健康狀態會停在最後一次的結果
+                    replica.healthy = False
+                    replica.error = str(e)
+                    log.error(f"唯讀副本 {replica.host}:{replica.port} 健康檢查失敗: {e}")
+            time.sleep(self.check_interval)
+
+    def _check(self, replica: _Replica):
+        """檢查連線與複寫延遲，更新副本的健康狀態"""
+        was_healthy = replica.healthy
+        conn = None
+        try:
+            # 以獨立的連線檢查，不佔用請求的連線池，連線逾時也較短
+            conn = _connect(_load_db_config()['db_name'], replica.host, replica.port, replica.connect_timeout)
+            replica.lag = _replication_lag(conn)
+            replica.checked_pid = os.getpid()
+            replica.healthy = replica.lag is not None and replica.lag <= self.max_lag
+            replica.error = None if replica.healthy else f"replication lag {replica.lag}"
+        except pymysql.Error as e:
+            replica.healthy = False
+            replica.error = str(e)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except pymysql.Error:
+                    pass
+        if was_healthy != replica.healthy:
+            state = "恢復使用" if replica.healthy else f"暫停使用 ({replica.error})"
+            log.info(f"唯讀副本 {replica.host}:{replica.port} {state}")
+
+    def _mark_down(self, replica: _Replica, error: Exception):
+        """請求連線失敗時立即暫停使用副本，由下一次背景檢查決定是否恢復"""
+        with self._lock:
+            replica.healthy = False
+            replica.error = str(error)
+        log.error(f"唯讀副本 {replica.host}:{replica.port} 無法連線，暫停使用: {error}")
+
+    def _healthy_replicas(self):
+        self._ensure_checker()
+        for replica in self._candidates():
+            if replica.healthy and replica.checked_pid == os.getpid():
+                yield replica
+
+    def acquire(self):
+        """從健康的副本取得連線；沒有可用副本時返回 None，由呼叫端改用主庫"""
+        for replica in self._healthy_replicas():
+            try:
+                return _PooledConnection(replica.pool, replica.pool.acquire())
+            except pymysql.Error as e:
+                self._mark_down(replica, e)
+        return None
+
+    def connect(self, database):
+        """連線到一個健康的副本 (不經過連線池)；沒有可用副本時返回 None"""
+        for replica in self._healthy_replicas():
+            try:
+                return _connect(database, replica.host, replica.port, replica.connect_timeout)
+            except pymysql.Error as e:
+                self._mark_down(replica, e)
+        return None
+
+    def warm(self):
+        """先檢查一次各副本 (在預熱執行緒中，不佔用請求)，再預熱健康副本的連線池"""
+        for replica in self.replicas:
+            try:
+                self._check(replica)
+            except Exception as e:
+                replica.healthy = False
+                replica.error = str(e)
+        for replica in self._healthy_replicas():
+            try:
+                replica.pool.warm()
+            except pymysql.Error as e:
+                self._mark_down(replica, e)
+
+    def status(self) -> list[dict]:
+        return [
+            dict(replica.pool.status(), host=f"{replica.host}:{replica.port}", healthy=replica.healthy,
+                 lag_seconds=replica.lag, error=replica.error)
+            for replica in self.replicas
+        ]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_replica_set = None
+_replica_set_loaded = False
+
+def get_pool() -> ConnectionPool:
+    """取得 (必要時建立) 目前行程的連線池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(_load_db_config()['db_pool_size'])
+    return _pool
+
+def get_replica_set():
+    """取得唯讀副本集合；config.ini 沒有設定 DB_REPLICAS 時返回 None"""
+    global _replica_set, _replica_set_loaded
+    if not _replica_set_loaded:
+        with _pool_lock:
+            if not _replica_set_loaded:
+                db_config = _load_db_config()
+                if db_config['db_replicas']:
+                    _replica_set = ReplicaSet(db_config['db_replicas'], db_config['db_pool_size'],
+                                              db_config['replica_max_lag'], db_config['replica_check_interval'],
+                                              db_config['replica_connect_timeout'])
+                _replica_set_loaded = True
+    return _replica_set
+
+def warm_pool(count: int = None):
+    """預熱連線池，供啟動或 worker fork 後呼叫"""
+    get_pool().warm(count)
+    replica_set = get_replica_set()
+    if replica_set is not None:
+        replica_set.warm()
+
+def pool_status() -> dict:
+    """連線池狀態，供 readiness 檢查使用"""
+    if _pool is None:
+        return {"size": 0, "idle": 0, "in_use": 0, "warm": False}
+    status = _pool.status()
+    if _replica_set is not None:
+        status["replicas"] = _replica_set.status()
+    return status
+
+@tracing.traced('db.connect')
+def get_db_connection(target_db_name=None, read_only=False):
     """
     獲取資料庫連接。
     target_db_name:
-        - 如果為 None (預設)，則使用 DB_CONFIG['db_name'] 連接。
-        - 如果為字符串 (例如 'mysql' 或具體資料庫名)，則連接到該名稱的資料庫。
+        - 如果為 None (預設)，則從連線池取得 DB_CONFIG['db_name'] 的連線，close() 時歸還連線池。
+        - 如果為字符串 (例如 'mysql' 或具體資料庫名)，則建立一條連接到該名稱資料庫的獨立連線。
         - **請注意：不建議傳遞空字串 ''，如果需要無資料庫連接，請直接傳遞 None。**
+    read_only:
+        - 為 True 時優先使用唯讀副本 (沒有設定或都不可用時使用主庫)。
+        - 副本可能落後主庫，需要讀到剛寫入資料的查詢不要使用。
     """
-    db_to_connect = target_db_name if target_db_name is not None else DB_CONFIG['db_name']
+    try:
+        if target_db_name is None:
+            if read_only:
+                replica_set = get_replica_set()
+                conn = replica_set.acquire() if replica_set is not None else None
+                if conn is not None:
+                    return conn
+            pool = get_pool()
+            return _PooledConnection(pool, pool.acquire())
+        return _connect(target_db_name)
+    except pymysql.Error as e:
+        log.error(f"Error connecting to MySQL database: {e}")
+        raise
 
+def get_streaming_connection(read_primary: bool = False):
+    """
+    建立一條不經過連線池的獨立連線，供 SSCursor (伺服器端游標) 串流大量資料使用。
+    串流中途停止時直接關閉連線，不會把讀到一半的連線放回連線池。
+    有設定唯讀副本時從副本讀取，避免大量匯出影響主庫的寫入 (read_primary=True 時一律讀主庫)。
+    """
     try:
-        conn = pymysql.connect(
-            host=DB_CONFIG['db_host'],
-            user=DB_CONFIG['db_user'],
-            password=DB_CONFIG['db_password'],
-            database=db_to_connect, # 將 None 傳遞給 database 參數表示不指定數據庫
-            charset='utf8mb4',
-            cursorclass=DictCursor
-        )
-        return conn
+        replica_set = None if read_primary else get_replica_set()
+        conn = replica_set.connect(_load_db_config()['db_name']) if replica_set is not None else None
+        return conn or _connect(_load_db_config()['db_name'])
     except pymysql.Error as e:
-        print(f"Error connecting to MySQL database: {e}")
+        log.error(f"Error connecting to MySQL database: {e}")
         raise
 
 def initialize_database():
@@ -70,6 +449,7 @@ def initialize_database():
         # 第一次連接時，嘗試連接到 MySQL 伺服器的 'mysql' 系統資料庫。
         # 這是最穩健的選擇，因為這個資料庫通常都存在。
         conn = get_db_connection(target_db_name='mysql')
+        db_name = _load_db_config()['db_name']
 
         if not conn:
             print("無法連接到 MySQL 伺服器，請檢查配置和伺服器狀態。")
@@ -77,11 +457,11 @@ def initialize_database():
 
         with conn.cursor() as cursor:
             # 1. 創建目標資料庫 (如果不存在)
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;")
-            print(f"資料庫 '{DB_NAME}' 已創建或已存在。")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;")
+            print(f"資料庫 '{db_name}' 已創建或已存在。")
 
             # 2. 使用新創建的資料庫
-            cursor.execute(f"USE {DB_NAME};")
+            cursor.execute(f"USE {db_name};")
 
             # 3. 讀取並執行 schema.sql 中的表格創建語句
             schema_sql_path = os.path.join(project_root_dir, 'src', 'database', 'schema.sql')
@@ -108,6 +488,13 @@ def initialize_database():
                         print(f"執行 SQL 語句時發生錯誤: {statement[:50]}... - {e}")
                         raise # 重新拋出其他嚴重的錯誤
 
+            # 4. prices 按月分區：舊版的未分區表在這裡轉換，並預先建立未來月份的分區
+            # (retention 模組會 import 本模組，因此在這裡才 import)
+            from src.database import retention
+            retention.ensure_partitions(cursor, app_config.get_option(
+                'RETENTION', 'FUTURE_MONTHS', fallback=retention.DEFAULT_FUTURE_MONTHS, cast=int))
+            print(f"prices 分區已就緒 (共 {len(retention.list_partitions(cursor))} 個)。")
+
             conn.commit()
             print("資料庫結構初始化完成。")
 
@@ -128,30 +515,43 @@ def initialize_database():
 # --- 數據處理函數 (save_product_data, get_products_with_prices_by_keyword, get_comparison_data, _calculate_summary 保持不變) ---
 # ... (這裡放置您之前給出的 save_product_data, get_products_with_prices_by_keyword 等函數)
 
-def save_product_data(products_data: list[dict]):
+@tracing.traced('db.save_product_data')
+def save_product_data(products_data: list):
     """
     保存或更新產品數據到資料庫。
+    products_data 中的每一筆可以是 ProductRecord 或舊格式的商品字典。
     會檢查產品是否存在，如果存在則更新價格並設定 is_available。
     如果產品不存在，則插入新產品及其價格。
     使用 INSERT ... ON DUPLICATE KEY UPDATE 語句來處理重複鍵衝突。
+    回填歷史資料時，每筆資料可帶 observed_at (datetime)，價格會記在該時間點的日期，
+    且不會覆蓋同一天較新的價格。
+    這一批中實際寫入的即時價格會在同一個交易中比對降價通知 (_evaluate_price_alerts)。
+    商品名稱中的品牌 / 型號 / 容量 / 顏色在寫入時擷取 (見 attributes.py)，只寫入 product_attributes；
+    products.brand 與查找商品的條件只使用爬蟲提供的品牌，字典改變不會讓同一個商品被拆成兩筆。
     """
+    extractor = get_attribute_extractor()
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            for product_info in products_data:
-                product_name = product_info['name']
-                platform = product_info['platform']
-                price = product_info['price']
-                product_url = product_info['url']
-                image_url = product_info.get('image', None)
-                brand = product_info.get('brand', None)
-                is_available = product_info.get('is_available', True)
+            changed_prices = [] # (product_id, platform, price, product_url)
+            stale_attributes = {} # product_id -> 需要 (重新) 寫入的屬性
+            for item in products_data:
+                record = ProductRecord.coerce(item)
+                product_name = record.name
+                platform = record.platform
+                price = record.price
+                product_url = record.url
+                image_url = record.image
+                attributes = extractor.extract(product_name)
+                brand = record.brand
+                is_available = record.is_available
+                observed_at = record.observed_at # 回填快照時的擷取時間
 
                 # 1. 查找或創建產品
                 cursor.execute(
-                    "SELECT id FROM products WHERE name = %s AND (brand = %s OR (brand IS NULL AND %s IS NULL))",
-                    (product_name, brand, brand)
+                    "SELECT id, attributes_version FROM products WHERE name = %s AND brand <=> %s LIMIT 1",
+                    (product_name, brand)
                 )
                 product_id_result = cursor.fetchone()
 
@@ -163,6 +563,8 @@ def save_product_data(products_data: list[dict]):
                         "UPDATE products SET image_url = COALESCE(%s, image_url), updated_at = CURRENT_TIMESTAMP WHERE id = %s",
                         (image_url, product_id)
                     )
+                    if product_id_result['attributes_version'] != extractor.version:
+                        stale_attributes[product_id] = dict(attributes, brand=brand or attributes['brand'])
                 else:
                     # 插入新產品
                     cursor.execute(
@@ -170,25 +572,33 @@ def save_product_data(products_data: list[dict]):
                         (product_name, image_url, brand)
                     )
                     product_id = cursor.lastrowid # 獲取新插入的產品ID
+                    stale_attributes[product_id] = dict(attributes, brand=brand or attributes['brand'])
 
                 # 2. 使用 INSERT ... ON DUPLICATE KEY UPDATE 處理價格資訊
                 # 如果 (product_id, platform, product_url) 組合已存在，則更新價格和可用性
                 # 否則，插入新記錄
-                cursor.execute(
+                # 只有較新的觀測值才會覆蓋既有價格 (last_updated 最後更新，前兩個欄位比較的是舊值)
+                affected = cursor.execute(
                     """
-                    INSERT INTO prices (product_id, platform, price, product_url, is_available)
-                    VALUES (%s, %s, %s, %s, %s)
+                    INSERT INTO prices (product_id, platform, price, product_url, is_available, last_updated, record_date)
+                    VALUES (%s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP), COALESCE(DATE(%s), CURRENT_DATE))
                     ON DUPLICATE KEY UPDATE
-                        price = VALUES(price),
-                        is_available = VALUES(is_available),
-                        last_updated = CURRENT_TIMESTAMP;
+                        price = IF(VALUES(last_updated) >= last_updated, VALUES(price), price),
+                        is_available = IF(VALUES(last_updated) >= last_updated, VALUES(is_available), is_available),
+                        last_updated = GREATEST(last_updated, VALUES(last_updated));
                     """,
-                    (product_id, platform, price, product_url, is_available)
+                    (product_id, platform, price, product_url, is_available, observed_at, observed_at)
                 )
+                # 影響列數為 0 表示這筆沒有寫入 (例如較舊的觀測值)；回填的歷史價格不觸發通知
+                if affected and observed_at is None and is_available:
+                    changed_prices.append((product_id, platform, price, product_url))
+
+            _write_product_attributes(cursor, stale_attributes, extractor.version)
+            _evaluate_price_alerts(cursor, changed_prices)
             conn.commit()
-            print(f"Successfully saved/updated {len(products_data)} product entries.")
+            log.info(f"Successfully saved/updated {len(products_data)} product entries.")
     except pymysql.Error as e:
-        print(f"Database error during save_product_data: {e}")
+        log.error(f"Database error during save_product_data: {e}")
         if conn:
             conn.rollback()
         raise
@@ -197,18 +607,244 @@ def save_product_data(products_data: list[dict]):
             conn.close()
 
 
-def get_products_with_prices_by_keyword(keyword: str, freshness_hours: int = 24) -> dict:
+def _write_product_attributes(cursor, attributes_by_product: dict, version: int, chunk_size: int = 500):
+    """以整批的 DELETE / INSERT 寫入商品屬性，並標記擷取時使用的字典版本"""
+    product_ids = list(attributes_by_product)
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"DELETE FROM product_attributes WHERE product_id IN ({placeholders})", chunk)
+        rows = [row for product_id in chunk for row in AttributeExtractor.rows(product_id, attributes_by_product[product_id])]
+        if rows:
+            cursor.executemany("INSERT IGNORE INTO product_attributes (product_id, name, value) VALUES (%s, %s, %s)", rows)
+        cursor.execute(f"UPDATE products SET attributes_version = %s WHERE id IN ({placeholders})", [version, *chunk])
+
+def backfill_product_attributes(extractor=None, batch_size: int = 1000) -> int:
+    """為屬性版本與目前字典不同的既有商品重新擷取屬性 (依 id 分批)，返回更新的商品數"""
+    extractor = extractor or get_attribute_extractor()
+    conn = None
+    updated, last_id = 0, 0
+    try:
+        conn = get_db_connection()
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, name, brand FROM products WHERE id > %s AND attributes_version <> %s ORDER BY id LIMIT %s",
+                    (last_id, extractor.version, batch_size)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                attributes_by_product = {}
+                for row in rows:
+                    attributes = extractor.extract(row['name'])
+                    attributes_by_product[row['id']] = dict(attributes, brand=row['brand'] or attributes['brand'])
+                _write_product_attributes(cursor, attributes_by_product, extractor.version)
+            conn.commit()
+            updated += len(rows)
+            last_id = rows[-1]['id']
+        return updated
+    except pymysql.Error as e:
+        log.error(f"Database error during backfill_product_attributes: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def _facet_conditions(filters: dict) -> tuple[str, list]:
     """
-    根據關鍵字查詢資料庫中在 freshness_hours 內更新的商品數據。
-    返回包含分組產品和統計信息的字典。
+    將 {屬性: 值} 轉成 SQL 條件 (以 product_attributes 的主鍵索引查找，不在 Python 中過濾)。
+    返回 (以 AND 開頭的 SQL 片段, 參數)。
+    """
+    sql, params = [], []
+    for name, value in (filters or {}).items():
+        if name not in FACET_NAMES:
+            raise ValueError(f"Unknown facet: {name}")
+        sql.append("AND EXISTS (SELECT 1 FROM product_attributes fa WHERE fa.product_id = p.id AND fa.name = %s AND fa.value = %s)")
+        params.extend([name, value])
+    return " ".join(sql), params
+
+def _evaluate_price_alerts(cursor, changed_prices: list, chunk_size: int = 500):
     """
+    只針對這一批變動的價格比對降價通知，符合條件的寫入 alert_outbox。
+    以變動價格組成衍生表，經由 price_alerts (product_id, target_price) 索引找出
+    target_price >= 新價格的通知，成本與變動的價格數量 (及實際觸發的通知數) 成正比，與通知總數無關。
+    同一個通知只在價格低於上次通知的價格時再次觸發。
+    """
+    for start in range(0, len(changed_prices), chunk_size):
+        chunk = changed_prices[start:start + chunk_size]
+        change_table = " UNION ALL ".join(
+            ["SELECT %s AS product_id, %s AS platform, %s AS price, %s AS product_url"] * len(chunk))
+        cursor.execute(
+            f"""
+            SELECT a.id AS alert_id, c.product_id, c.platform, c.price, c.product_url
+            FROM ({change_table}) AS c
+            JOIN price_alerts a ON a.product_id = c.product_id AND a.target_price >= c.price
+            WHERE a.is_active = TRUE
+                AND (a.platform IS NULL OR a.platform = c.platform)
+                AND (a.last_notified_price IS NULL OR c.price < a.last_notified_price)
+            """,
+            [value for change in chunk for value in change]
+        )
+
+        # 同一個通知在這一批中被多個平台觸發時，只通知最低價
+        triggered = {}
+        for row in cursor.fetchall():
+            best = triggered.get(row['alert_id'])
+            if best is None or row['price'] < best['price']:
+                triggered[row['alert_id']] = row
+        if not triggered:
+            continue
+
+        cursor.executemany(
+            "INSERT INTO alert_outbox (alert_id, product_id, platform, price, product_url) VALUES (%s, %s, %s, %s, %s)",
+            [(row['alert_id'], row['product_id'], row['platform'], row['price'], row['product_url']) for row in triggered.values()]
+        )
+        cursor.executemany(
+            "UPDATE price_alerts SET last_notified_price = %s, last_notified_at = CURRENT_TIMESTAMP WHERE id = %s",
+            [(row['price'], row['alert_id']) for row in triggered.values()]
+        )
+        log.info(f"Price alerts triggered: {len(triggered)}")
+
+@tracing.traced('db.create_price_alert')
+def create_price_alert(product_id: int, target_price: float, contact: str, platform: str = None) -> int:
+    """建立降價通知，返回通知 id；商品不存在時返回 None"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO price_alerts (product_id, target_price, platform, contact) VALUES (%s, %s, %s, %s)",
+                (product_id, target_price, platform, contact)
+            )
+            alert_id = cursor.lastrowid
+        conn.commit()
+        return alert_id
+    except pymysql.err.IntegrityError as e:
+        conn.rollback()
+        if e.args and e.args[0] == 1452: # 外鍵檢查失敗：product_id 不存在
+            log.info(f"create_price_alert: product {product_id} does not exist.")
+            return None
+        log.error(f"Database error during create_price_alert: {e}")
+        raise
+    except pymysql.Error as e:
+        log.error(f"Database error during create_price_alert: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+@tracing.traced('db.get_price_alerts')
+def get_price_alerts(contact: str) -> list[dict]:
+    """取得指定通知對象的所有通知"""
     conn = None
     try:
         conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT a.id, a.product_id, p.name AS product_name, a.target_price, a.platform,
+                       a.is_active, a.last_notified_price, a.last_notified_at, a.created_at
+                FROM price_alerts a
+                JOIN products p ON p.id = a.product_id
+                WHERE a.contact = %s
+                ORDER BY a.created_at DESC
+                """,
+                (contact,)
+            )
+            return cursor.fetchall()
+    finally:
+        if conn:
+            conn.close()
+
+@tracing.traced('db.delete_price_alert')
+def delete_price_alert(alert_id: int, contact: str) -> bool:
+    """刪除通知 (需符合通知對象)，返回是否有刪除"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            deleted = cursor.execute("DELETE FROM price_alerts WHERE id = %s AND contact = %s", (alert_id, contact))
+        conn.commit()
+        return deleted > 0
+    except pymysql.Error as e:
+        log.error(f"Database error during delete_price_alert: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def fetch_pending_notifications(limit: int = 100) -> list[dict]:
+    """取得尚未發送的通知 (依產生順序)，供通知發送程序使用"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT o.id, o.alert_id, a.contact, o.product_id, p.name AS product_name,
+                       o.platform, o.price, o.product_url, a.target_price, o.created_at
+                FROM alert_outbox o
+                JOIN price_alerts a ON a.id = o.alert_id
+                JOIN products p ON p.id = o.product_id
+                WHERE o.delivered_at IS NULL
+                ORDER BY o.id
+                LIMIT %s
+                """,
+                (limit,)
+            )
+            return cursor.fetchall()
+    finally:
+        if conn:
+            conn.close()
+
+def mark_notifications_delivered(outbox_ids: list[int]):
+    """標記通知已發送"""
+    if not outbox_ids:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(outbox_ids))
+            cursor.execute(
+                f"UPDATE alert_outbox SET delivered_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders}) AND delivered_at IS NULL",
+                list(outbox_ids)
+            )
+        conn.commit()
+    except pymysql.Error as e:
+        log.error(f"Database error during mark_notifications_delivered: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+@tracing.traced('db.get_products_with_prices_by_keyword')
+def get_products_with_prices_by_keyword(keyword: str, freshness_hours: float = 24, filters: dict = None,
+                                        read_primary: bool = False) -> dict:
+    """
+    根據關鍵字查詢資料庫中在 freshness_hours 內更新的商品數據 (可為小數，以分鐘精度比較)。
+    filters 為屬性篩選條件，例如 {"brand": "Sony", "color": "黑色"}。
+    read_primary=True 時從主庫讀取。
+    返回包含分組產品和統計信息的字典。
+    """
+    facet_sql, facet_params = _facet_conditions(filters)
+    conn = None
+    try:
+        conn = get_db_connection(read_only=not read_primary)
         with conn.cursor() as cursor:
             # 查詢符合關鍵字且在 freshness_hours 內更新的產品及其價格
-            # 這裡需要 JOIN 兩個表
-            query = """
+            # 這裡需要 JOIN 兩個表；record_date 的條件讓 MySQL 只掃描最近的分區
+            # (last_updated 不會早於 record_date 當天，因此不會漏掉資料)
+            query = f"""
             SELECT
                 p.id AS product_id,
                 p.name AS product_name,
@@ -225,82 +861,155 @@ def get_products_with_prices_by_keyword(keyword: str, freshness_hours: int = 24)
                 prices pr ON p.id = pr.product_id
             WHERE
                 p.name LIKE %s
-                AND pr.last_updated >= NOW() - INTERVAL %s HOUR
+                AND pr.last_updated >= NOW() - INTERVAL %s MINUTE
+                AND pr.record_date >= DATE(NOW() - INTERVAL %s MINUTE)
+                {facet_sql}
             ORDER BY
                 p.name, pr.platform, pr.price;
             """
-            cursor.execute(query, (f"%{keyword}%", freshness_hours))
+            freshness_minutes = round(freshness_hours * 60)
+            cursor.execute(query, (f"%{keyword}%", freshness_minutes, freshness_minutes, *facet_params))
             raw_results = cursor.fetchall()
 
-            if not raw_results:
-                return {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}}
-
-            # 將扁平化的結果分組
-            grouped_products = {}
-            for row in raw_results:
-                product_id = row['product_id']
-                if product_id not in grouped_products:
-                    grouped_products[product_id] = {
-                        "id": product_id,
-                        "name": row['product_name'],
-                        "image": row['image_url'],
-                        "brand": row['brand'],
-                        "prices": [],
-                        "lowest_price": float('inf'),
-                        "highest_price": 0.0,
-                        "min_price_platform": None
-                    }
-
-                price_entry = {
-                    "platform": row['platform'],
-                    "price": float(row['price']), # 轉換為浮點數
-                    "url": row['product_url'],
-                    "is_available": bool(row['is_available']),
-                    "last_updated": row['last_updated'].isoformat() # 轉換為 ISO 格式字串
-                }
-                grouped_products[product_id]["prices"].append(price_entry)
-
-                # 更新最低/最高價格
-                if price_entry["is_available"] and price_entry["price"] < grouped_products[product_id]["lowest_price"]:
-                    grouped_products[product_id]["lowest_price"] = price_entry["price"]
-                    grouped_products[product_id]["min_price_platform"] = price_entry["platform"]
-                if price_entry["is_available"] and price_entry["price"] > grouped_products[product_id]["highest_price"]:
-                    grouped_products[product_id]["highest_price"] = price_entry["price"]
-
-
-            final_grouped_products_list = list(grouped_products.values())
-
-            # 對每個產品組內的價格進行排序 (最低價優先)
-            for product_group in final_grouped_products_list:
-                # 確保只有可用的價格才參與最低價排序，不可用的價格排在後面
-                product_group["prices"].sort(key=lambda x: (not x["is_available"], x["price"]))
-
-            # 計算總結統計
-            summary = _calculate_summary(final_grouped_products_list)
+            return _group_price_rows(raw_results)
 
-            return {
-                "grouped_products": final_grouped_products_list,
-                "summary": summary
+    except pymysql.Error as e:
+        log.error(f"Database error in get_products_with_prices_by_keyword: {e}")
+        return {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}, "errors": [f"Database error: {e}"]}
+    finally:
+        if conn:
+            conn.close()
+
+@tracing.traced('db.group_price_rows')
+def _group_price_rows(raw_results) -> dict:
+    """
+    將 products JOIN prices 的扁平化查詢結果依商品分組，
+    返回包含分組產品和統計信息的字典。
+    各商品的最低 / 最高價與總結統計以 NumPy 陣列計算 (見 analytics.py)。
+    """
+    if not raw_results:
+        return {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}}
+
+    grouped_products = {}
+    for row in raw_results:
+        product_id = row['product_id']
+        if product_id not in grouped_products:
+            grouped_products[product_id] = {
+                "id": product_id,
+                "name": row['product_name'],
+                "image": row['image_url'],
+                "brand": row['brand'],
+                "prices": [],
+                "lowest_price": float('inf'),
+                "highest_price": 0.0,
+                "min_price_platform": None
             }
 
+        price_entry = {
+            "platform": row['platform'],
+            "price": float(row['price']), # 轉換為浮點數
+            "url": row['product_url'],
+            "is_available": bool(row['is_available']),
+            "last_updated": row['last_updated'].isoformat() # 轉換為 ISO 格式字串
+        }
+        grouped_products[product_id]["prices"].append(price_entry)
+
+    final_grouped_products_list = list(grouped_products.values())
+
+    # 更新最低/最高價格 (只考慮有庫存的價格)；須在排序前建立，同價時以查詢順序中的第一筆為準
+    table = analytics.PriceTable.from_grouped(final_grouped_products_list)
+    for index, lowest, highest, platform in zip(*(column.tolist() for column in analytics.price_ranges(table))):
+        product_group = final_grouped_products_list[index]
+        product_group["lowest_price"] = lowest
+        product_group["highest_price"] = highest
+        product_group["min_price_platform"] = platform
+
+    # 對每個產品組內的價格進行排序 (最低價優先)
+    for product_group in final_grouped_products_list:
+        # 確保只有可用的價格才參與最低價排序，不可用的價格排在後面
+        product_group["prices"].sort(key=lambda x: (not x["is_available"], x["price"]))
+
+    # 計算總結統計
+    summary = analytics.summarize(table)
+
+    return {
+        "grouped_products": final_grouped_products_list,
+        "summary": summary
+    }
+
+@tracing.traced('db.get_products_with_prices_by_keywords')
+def get_products_with_prices_by_keywords(keywords: list[str], freshness_hours=24, read_primary: bool = False) -> dict:
+    """
+    以單一查詢取得多個關鍵字在 freshness_hours 內更新的商品數據。
+    freshness_hours 可以是所有關鍵字共用的時數，或 {關鍵字: 時數} 的字典。
+    read_primary=True 時從主庫讀取。
+    返回 {關鍵字: 分組結果}，只包含有新鮮資料的關鍵字。
+    """
+    if not keywords:
+        return {}
+    if not isinstance(freshness_hours, dict):
+        freshness_hours = dict.fromkeys(keywords, freshness_hours)
+    conn = None
+    try:
+        conn = get_db_connection(read_only=not read_primary)
+        with conn.cursor() as cursor:
+            # 以 UNION ALL 組成 (關鍵字, 新鮮度分鐘數) 的衍生表，與商品表做 LIKE JOIN
+            keyword_table = " UNION ALL ".join(["SELECT %s AS keyword, %s AS freshness_minutes"] * len(keywords))
+            query = f"""
+            SELECT
+                k.keyword,
+                p.id AS product_id,
+                p.name AS product_name,
+                p.image_url,
+                p.brand,
+                pr.platform,
+                pr.price,
+                pr.product_url,
+                pr.is_available,
+                pr.last_updated
+            FROM
+                ({keyword_table}) AS k
+            JOIN
+                products p ON p.name LIKE CONCAT('%%', k.keyword, '%%')
+            JOIN
+                prices pr ON p.id = pr.product_id
+            WHERE
+                pr.last_updated >= NOW() - INTERVAL k.freshness_minutes MINUTE
+                AND pr.record_date >= DATE(NOW() - INTERVAL %s MINUTE)
+            ORDER BY
+                k.keyword, p.name, pr.platform, pr.price;
+            """
+            # 以最長的新鮮度時間限制掃描的分區 (各關鍵字的條件需要逐列比較，無法用來裁剪分區)
+            params = [value for keyword in keywords for value in (keyword, round(freshness_hours[keyword] * 60))]
+            params.append(max(round(freshness_hours[keyword] * 60) for keyword in keywords))
+            cursor.execute(query, params)
+            rows_by_keyword = {}
+            for row in cursor.fetchall():
+                rows_by_keyword.setdefault(row['keyword'], []).append(row)
+
+        return {keyword: _group_price_rows(rows) for keyword, rows in rows_by_keyword.items()}
     except pymysql.Error as e:
-        print(f"Database error in get_products_with_prices_by_keyword: {e}")
-        return {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}, "errors": [f"Database error: {e}"]}
+        log.error(f"Database error in get_products_with_prices_by_keywords: {e}")
+        return {}
     finally:
         if conn:
             conn.close()
 
-def get_comparison_data(keyword: str) -> dict:
+@tracing.traced('db.get_comparison_data')
+def get_comparison_data(keyword: str, read_primary: bool = False, filters: dict = None) -> dict:
     """
     獲取所有與關鍵字相關的產品及其價格，不論新鮮度。
     主要用於當新鮮數據不足或爬蟲後獲取最新全量數據。
+    read_primary=True 時從主庫讀取 (爬蟲剛寫入的資料可能尚未複寫到唯讀副本)。
+    filters 為屬性篩選條件 (同 get_products_with_prices_by_keyword)。
     """
+    facet_sql, facet_params = _facet_conditions(filters)
     conn = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=not read_primary)
         with conn.cursor() as cursor:
             # 查詢所有符合關鍵字的產品及其所有價格
-            query = """
+            query = f"""
             SELECT
                 p.id AS product_id,
                 p.name AS product_name,
@@ -317,105 +1026,215 @@ def get_comparison_data(keyword: str) -> dict:
                 prices pr ON p.id = pr.product_id
             WHERE
                 p.name LIKE %s
+                {facet_sql}
             ORDER BY
                 p.name, pr.platform, pr.price;
             """
-            cursor.execute(query, (f"%{keyword}%",))
+            cursor.execute(query, (f"%{keyword}%", *facet_params))
             raw_results = cursor.fetchall()
 
-            if not raw_results:
-                return {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}}
-
-            grouped_products = {}
-            for row in raw_results:
-                product_id = row['product_id']
-                if product_id not in grouped_products:
-                    grouped_products[product_id] = {
-                        "id": product_id,
-                        "name": row['product_name'],
-                        "image": row['image_url'],
-                        "brand": row['brand'],
-                        "prices": [],
-                        "lowest_price": float('inf'),
-                        "highest_price": 0.0,
-                        "min_price_platform": None
-                    }
-
-                price_entry = {
-                    "platform": row['platform'],
-                    "price": float(row['price']),
-                    "url": row['product_url'],
-                    "is_available": bool(row['is_available']),
-                    "last_updated": row['last_updated'].isoformat()
-                }
-                grouped_products[product_id]["prices"].append(price_entry)
-
-                # 更新最低/最高價格 (只考慮有庫存的價格)
-                if price_entry["is_available"] and price_entry["price"] < grouped_products[product_id]["lowest_price"]:
-                    grouped_products[product_id]["lowest_price"] = price_entry["price"]
-                    grouped_products[product_id]["min_price_platform"] = price_entry["platform"]
-                if price_entry["is_available"] and price_entry["price"] > grouped_products[product_id]["highest_price"]:
-                    grouped_products[product_id]["highest_price"] = price_entry["price"]
-
-            final_grouped_products_list = list(grouped_products.values())
-
-            # 對每個產品組內的價格進行排序 (最低價優先)
-            for product_group in final_grouped_products_list:
-                # 確保只有可用的價格才參與最低價排序，不可用的價格排在後面
-                product_group["prices"].sort(key=lambda x: (not x["is_available"], x["price"]))
-
-            # 計算總結統計
-            summary = _calculate_summary(final_grouped_products_list)
-
-            return {
-                "grouped_products": final_grouped_products_list,
-                "summary": summary
-            }
+            return _group_price_rows(raw_results)
 
     except pymysql.Error as e:
-        print(f"Database error in get_comparison_data: {e}")
+        log.error(f"Database error in get_comparison_data: {e}")
         return {"grouped_products": [], "summary": {"total_products": 0, "avg_savings": 0, "best_platform": "N/A"}, "errors": [f"Database error: {e}"]}
     finally:
         if conn:
             conn.close()
 
-def _calculate_summary(final_grouped_products_list: list) -> dict:
-    """計算產品總結統計數據"""
-    total_products_found = len(final_grouped_products_list)
-    avg_savings = 0.0
-    best_platform = "N/A"
-
-    if total_products_found > 0:
-        total_price_difference = 0
-        total_items_for_avg = 0
-        platform_lowest_count = {}
+@tracing.traced('db.get_facet_counts')
+def get_facet_counts(keyword: str, filters: dict = None, freshness_hours: float = None, read_primary: bool = False,
+                     limit: int = 20) -> dict:
+    """
+    計算關鍵字 (套用 filters 後) 的商品在各屬性值的數量，由資料庫以 GROUP BY 彙總。
+    freshness_hours 不為 None 時只計算在該時間內有價格更新的商品 (與搜尋結果一致)。
+    返回 {屬性: [{"value": 值, "count": 商品數}, ...]}，每個屬性最多 limit 個值 (依數量排序)。
+    """
+    facet_sql, facet_params = _facet_conditions(filters)
+    freshness_sql, freshness_params = "", []
+    if freshness_hours is not None:
+        freshness_sql = ("AND EXISTS (SELECT 1 FROM prices pr WHERE pr.product_id = p.id "
+                         "AND pr.last_updated >= NOW() - INTERVAL %s MINUTE "
+                         "AND pr.record_date >= DATE(NOW() - INTERVAL %s MINUTE))")
+        freshness_params = [round(freshness_hours * 60)] * 2
+    conn = None
+    try:
+        conn = get_db_connection(read_only=not read_primary)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT a.name, a.value, COUNT(*) AS count
+                FROM products p
+                JOIN product_attributes a ON a.product_id = p.id
+                WHERE p.name LIKE %s
+                    {facet_sql}
+                    {freshness_sql}
+                GROUP BY a.name, a.value
+                ORDER BY a.name, count DESC, a.value
+                """,
+                (f"%{keyword}%", *facet_params, *freshness_params)
+            )
+            facets = {name: [] for name in FACET_NAMES}
+            for row in cursor.fetchall():
+                if len(facets[row['name']]) < limit:
+                    facets[row['name']].append({"value": row['value'], "count": row['count']})
+            return facets
+    except pymysql.Error as e:
+        log.error(f"Database error in get_facet_counts: {e}")
+        return {name: [] for name in FACET_NAMES}
+    finally:
+        if conn:
+            conn.close()
 
-        for product_group in final_grouped_products_list:
-            # 確保 product_group["prices"] 中有可用的價格
-            available_prices = [p['price'] for p in product_group["prices"] if p['is_available']]
+@tracing.traced('db.has_fresh_prices')
+def has_fresh_prices(keyword: str, freshness_hours: float, read_primary: bool = False) -> bool:
+    """關鍵字是否有在 freshness_hours 內更新的價格 (不套用屬性篩選)"""
+    conn = None
+    try:
+        conn = get_db_connection(read_only=not read_primary)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT 1 FROM products p
+                JOIN prices pr ON p.id = pr.product_id
+                WHERE p.name LIKE %s AND pr.last_updated >= NOW() - INTERVAL %s MINUTE
+                  AND pr.record_date >= DATE(NOW() - INTERVAL %s MINUTE)
+                LIMIT 1
+                """,
+                (f"%{keyword}%", round(freshness_hours * 60), round(freshness_hours * 60))
+            )
+            return cursor.fetchone() is not None
+    finally:
+        if conn:
+            conn.close()
 
-            if len(available_prices) > 1:
-                min_price = min(available_prices)
-                max_price = max(available_prices)
+@tracing.traced('db.get_price_change_stats')
+def get_price_change_stats(keywords: list[str], history_days: int = 30) -> dict:
+    """
+    統計各關鍵字相關商品最近 history_days 天的價格變動情形。
+    同一商品在同一平台相鄰兩筆每日紀錄之間的價格不同即算一次變動。
+    返回 {關鍵字: {"observed_days": 相鄰紀錄間隔天數總和, "changes": 變動次數}}，沒有歷史的關鍵字不會出現。
+    """
+    if not keywords:
+        return {}
+    conn = None
+    try:
+        conn = get_db_connection(read_only=True)
+        with conn.cursor() as cursor:
+            keyword_table = " UNION ALL ".join(["SELECT %s AS keyword"] * len(keywords))
+            query = f"""
+            SELECT keyword, SUM(days) AS observed_days, SUM(changed) AS changes
+            FROM (
+                SELECT
+                    k.keyword,
+                    DATEDIFF(pr.record_date, LAG(pr.record_date) OVER w) AS days,
+                    pr.price <> LAG(pr.price) OVER w AS changed
+                FROM
+                    ({keyword_table}) AS k
+                JOIN
+                    products p ON p.name LIKE CONCAT('%%', k.keyword, '%%')
+                JOIN
+                    prices pr ON p.id = pr.product_id
+                WHERE
+                    pr.record_date >= CURRENT_DATE - INTERVAL %s DAY
+                WINDOW w AS (PARTITION BY k.keyword, pr.product_id, pr.platform ORDER BY pr.record_date)
+            ) AS history
+            WHERE days IS NOT NULL
+            GROUP BY keyword;
+            """
+            cursor.execute(query, (*keywords, history_days))
+            return {
+                row['keyword']: {"observed_days": int(row['observed_days'] or 0), "changes": int(row['changes'] or 0)}
+                for row in cursor.fetchall()
+            }
+    finally:
+        if conn:
+            conn.close()
 
-                total_price_difference += (max_price - min_price)
-                total_items_for_avg += 1
+@tracing.traced('db.get_price_stats')
+def get_price_stats(keyword: str, history_days: int = 30) -> dict:
+    """
+    關鍵字相關商品的價格統計 (百分位數、各平台最低價比例、價差分布，見 analytics.price_stats)。
+    每個商品 × 平台取最近 history_days 天內最新一天的價格。
+    """
+    conn = None
+    try:
+        conn = get_db_connection(read_only=True)
+        # 使用 tuple 游標，資料列直接轉成 NumPy 欄位，不需要逐列建立 dict
+        with conn.cursor(pymysql.cursors.Cursor) as cursor:
+            cursor.execute(
+                """
+                SELECT pr.product_id, pr.platform, pr.price, pr.is_available, TO_DAYS(pr.record_date)
+                FROM products p
+                JOIN prices pr ON p.id = pr.product_id
+                WHERE p.name LIKE %s
+                  AND pr.record_date >= CURRENT_DATE - INTERVAL %s DAY
+                ORDER BY pr.product_id
+                """,
+                (f"%{keyword}%", history_days)
+            )
+            rows = cursor.fetchall()
+        return analytics.price_stats(analytics.PriceTable.from_rows(rows))
+    finally:
+        if conn:
+            conn.close()
 
-            # 統計最佳平台
-            if product_group["min_price_platform"]: # 確保有找到最低價的平台
-                platform_lowest_count[product_group["min_price_platform"]] = platform_lowest_count.get(product_group["min_price_platform"], 0) + 1
+def _calculate_summary(final_grouped_products_list: list) -> dict:
+    """計算產品總結統計數據 (total_products, avg_savings, best_platform)"""
+    return analytics.summarize(analytics.PriceTable.from_grouped(final_grouped_products_list))
 
-        if total_items_for_avg > 0:
-            avg_savings = total_price_difference / total_items_for_avg
+@tracing.traced('db.record_search_keyword')
+def record_search_keyword(keyword: str, result_count: int):
+    """記錄一次關鍵字搜尋 (搜尋次數 +1，並更新最近一次的結果數量)"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO search_keywords (keyword, search_count, result_count)
+                VALUES (%s, 1, %s)
+                ON DUPLICATE KEY UPDATE search_count = search_count + 1, result_count = VALUES(result_count);
+                """,
+                (keyword[:255], result_count)
+            )
+        conn.commit()
+    except pymysql.Error as e:
+        log.error(f"Database error during record_search_keyword: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
 
-        if platform_lowest_count:
-            best_platform = max(platform_lowest_count, key=platform_lowest_count.get)
+def get_search_keywords(limit: int = 50000) -> list[dict]:
+    """依搜尋次數取得歷史搜尋關鍵字 (keyword, search_count, result_count)"""
+    conn = None
+    try:
+        conn = get_db_connection(read_only=True)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT keyword, search_count, result_count FROM search_keywords "
+                "WHERE result_count > 0 ORDER BY search_count DESC LIMIT %s",
+                (limit,)
+            )
+            return cursor.fetchall()
+    finally:
+        if conn:
+            conn.close()
 
-    return {
-        "total_products": total_products_found,
-        "avg_savings": float(f"{avg_savings:.2f}"), # 四捨五入到小數點後兩位
-        "best_platform": best_platform
-    }
+def get_product_names(limit: int = 200000) -> list[str]:
+    """取得最近更新的商品名稱，供建立搜尋建議索引"""
+    conn = None
+    try:
+        conn = get_db_connection(read_only=True)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT name FROM products ORDER BY updated_at DESC LIMIT %s", (limit,))
+            return [row['name'] for row in cursor.fetchall()]
+    finally:
+        if conn:
+            conn.close()
 
 # --- 測試區塊 ---
 if __name__ == '__main__':
@@ -475,11 +1294,14 @@ if __name__ == '__main__':
         print("No fresh results found.")
 
     print("\nQuerying '測試商品' (get_comparison_data, all data)...\n")
-    all_comparison_results = get_comparison_data("測試商品")
+    all_comparison_results = get_comparison_data("測試商品", read_primary=True) # 剛寫入，從主庫讀取
     if all_comparison_results['grouped_products']:
         print(f"Found {len(all_comparison_results['grouped_products'])} all results:")
         for item in all_comparison_results['grouped_products']:
             print(item)
         print("Summary:", all_comparison_results['summary'])
     else:
-        print("No results found in general.")
\ No newline at end of file
+        print("No results found in general.")
+
+    # 有設定 DB_REPLICAS 時可確認讀取是否分散到各副本
+    print("\nConnection pools:", pool_status())
@@ -0,0 +1,227 @@
+# src/database/export.py
+"""
+以伺服器端游標 (SSCursor) 串流匯出 products × prices，記憶體用量與資料量無關。
+
+用法 (在專案根目錄執行)：
+    python -m src.database.export --since 2026-10-01 --until 2026-11-01 --format csv --gzip -o prices.csv.gz
+    python -m src.database.export --format ndjson --after-id 1200000 > rest.ndjson   # 從上次中斷處繼續
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import pymysql
+from pymysql.cursors import SSCursor
+
+from src.database import db_connector
+
+# pyarrow 為選用套件，有安裝才提供 Arrow IPC 串流 (欄式) 格式
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover - 視部署環境而定
+    pyarrow = None
+
+COLUMNS = ('price_id', 'product_id', 'product_name', 'brand', 'platform', 'price',
+           'product_url', 'is_available', 'last_updated', 'record_date')
+DEFAULT_CHUNK_ROWS = 1000 # 每個輸出區塊包含的列數
+
+FORMATS = {
+    # 格式 -> (Content-Type, 副檔名)
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+def available_formats() -> list[str]:
+    return [fmt for fmt in FORMATS if fmt != 'arrow' or pyarrow is not None]
+
+
+def iter_price_rows(since: date = None, until: date = None, after_id: int = 0, fetch_size: int = DEFAULT_CHUNK_ROWS,
+                    read_primary: bool = False):
+    """
+    依 prices.id 遞增逐列產出 (price_id, product_id, ..., record_date)。
+    since / until 篩選 record_date (until 不含)；after_id 為續傳的 keyset 位置。
+    使用獨立連線與 SSCursor，資料列由 MySQL 逐批送出而不是一次載入記憶體。
+    read_primary=True 時從主庫讀取 (例如封存即將刪除的分區)。
+    """
+    conditions, params = ["pr.id > %s"], [after_id or 0]
+    if since:
+        conditions.append("pr.record_date >= %s")
+        params.append(since)
+    if until:
+        conditions.append("pr.record_date < %s")
+        params.append(until)
+
+    conn = db_connector.get_streaming_connection(read_primary=read_primary)
+    try:
+        cursor = conn.cursor(SSCursor)
+        cursor.execute(
+            f"""
+            SELECT pr.id, p.id, p.name, p.brand, pr.platform, pr.price,
+                   pr.product_url, pr.is_available, pr.last_updated, pr.record_date
+            FROM prices pr
+            JOIN products p ON p.id = pr.product_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY pr.id
+            """,
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        # 直接關閉連線：SSCursor.close() 會先讀完剩下的資料列，中途停止時代價很高
+        try:
+            conn.close()
+        except pymysql.Error:
+            pass
+
+
+def _plain_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows, chunk_rows: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow([_plain_value(value) for value in row])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _encode_ndjson(rows, chunk_rows: int):
+    lines = []
+    for row in rows:
+        record = dict(zip(COLUMNS, (_plain_value(value) for value in row)))
+        record['is_available'] = bool(record['is_available'])
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) >= chunk_rows:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """只累積尚未送出的 bytes 的可寫檔案物件，供 pyarrow 逐批寫入後取出"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _encode_arrow(rows, chunk_rows: int):
+    schema = pyarrow.schema([
+        ('price_id', pyarrow.int64()), ('product_id', pyarrow.int64()),
+        ('product_name', pyarrow.string()), ('brand', pyarrow.string()),
+        ('platform', pyarrow.string()), ('price', pyarrow.float64()),
+        ('product_url', pyarrow.string()), ('is_available', pyarrow.bool_()),
+        ('last_updated', pyarrow.timestamp('s')), ('record_date', pyarrow.date32()),
+    ])
+    sink = _ChunkSink()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+
+    def write_batch(batch):
+        columns = [list(column) for column in zip(*batch)]
+        columns[5] = [float(value) for value in columns[5]]
+        columns[7] = [bool(value) for value in columns[7]]
+        writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_rows:
+            write_batch(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_batch(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def _gzip_chunks(chunks, level: int = 6):
+    """逐塊 gzip 壓縮 (單一 gzip 串流)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(fmt: str = 'csv', since: date = None, until: date = None, after_id: int = 0,
+                  compress: bool = False, chunk_rows: int = DEFAULT_CHUNK_ROWS, read_primary: bool = False):
+    """產出匯出檔的 bytes 區塊 (可直接寫入檔案或作為 HTTP 串流回應)"""
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported export format: {fmt}")
+    rows = iter_price_rows(since=since, until=until, after_id=after_id, fetch_size=chunk_rows, read_primary=read_primary)
+    encoder = {'csv': _encode_csv, 'ndjson': _encode_ndjson, 'arrow': _encode_arrow}[fmt]
+    chunks = encoder(rows, chunk_rows)
+    return _gzip_chunks(chunks) if compress else chunks
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="串流匯出商品價格 (products × prices)")
+    parser.add_argument('--since', type=parse_date, help="起始日期 YYYY-MM-DD (含)")
+    parser.add_argument('--until', type=parse_date, help="結束日期 YYYY-MM-DD (不含)")
+    parser.add_argument('--after-id', type=int, default=0, help="從 price_id 大於此值的資料列開始 (續傳)")
+    parser.add_argument('--format', choices=available_formats(), default='csv')
+    parser.add_argument('--gzip', action='store_true', help="以 gzip 壓縮輸出")
+    parser.add_argument('-o', '--output', default='-', help="輸出檔案路徑 (預設為標準輸出)")
+    args = parser.parse_args(argv)
+
+    chunks = export_chunks(args.format, since=args.since, until=args.until, after_id=args.after_id, compress=args.gzip)
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# src/database/ingest.py
+
+import os
+import queue
+import threading
+import time
+
+from src import config as app_config
+from src.database import db_connector
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 1.0 # 秒
+
+
+class _Barrier:
+    """寫入屏障：writer 處理到這裡時，之前放入佇列的紀錄都已提交"""
+
+    __slots__ = ('event',)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class IngestSession:
+    """
+    一次爬取放入寫入器的紀錄 (可直接作為 orchestrator 的 sink)。
+    寫入失敗的批次只把錯誤記在批次中有紀錄的 session 上，並行的請求不會拿到彼此的錯誤。
+    """
+
+    __slots__ = ('writer', 'errors')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.errors = [] # 只會附加；由 writer 執行緒寫入，屏障之後由請求執行緒讀取
+
+    def put(self, record, timeout: float = None):
+        self.writer.put(record, timeout, session=self)
+
+    __call__ = put
+
+    def flush(self, timeout: float = None) -> list[str]:
+        """
+        等待目前為止放入的紀錄全部提交，返回這個 session 的所有寫入錯誤訊息。
+        不會清除錯誤，共用同一次爬取的多個請求各自 flush 都會拿到相同的錯誤。
+        """
+        if not self.writer.wait(timeout):
+            return self.errors + [f"Timed out waiting for database writes after {timeout}s"]
+        return list(self.errors)
+
+
+class IngestWriter:
+    """
+    爬蟲 -> 資料庫的串流寫入器。
+
+    爬蟲執行緒把 ProductRecord 放進有界佇列 (佇列滿時阻塞，形成背壓)，
+    背景 writer 執行緒每累積 batch_size 筆或每 flush_interval 秒提交一批，
+    因此商品在爬取仍在進行時就能被查詢到。
+    """
+
+    def __init__(self, max_queue: int = DEFAULT_QUEUE_SIZE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, save=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._save = save or db_connector.save_product_data
+        self._default_session = IngestSession(self) # 沒有指定 session 的 put / flush
+        self._listeners = [] # 每批成功寫入後呼叫，例如更新搜尋建議索引
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # fork 後的子行程需要自己的 writer 執行緒
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def add_listener(self, callback):
+        """註冊 callback(batch)，每批紀錄成功寫入資料庫後在 writer 執行緒中呼叫"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def session(self) -> IngestSession:
+        """建立一個 session；每個請求 (或每次爬取) 各用一個，flush 時只取得自己的寫入錯誤"""
+        return IngestSession(self)
+
+    def put(self, record, timeout: float = None, session: IngestSession = None):
+        """放入一筆紀錄；佇列已滿時最多等待 timeout 秒 (None 表示一直等待)"""
+        self._ensure_started()
+        self._queue.put((session or self._default_session, record), timeout=timeout)
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待目前為止放入的紀錄全部提交；逾時返回 False"""
+        self._ensure_started()
+        barrier = _Barrier()
+        self._queue.put(barrier)
+        return barrier.event.wait(timeout)
+
+    def flush(self, timeout: float = None) -> list[str]:
+        """等待提交，返回沒有指定 session 放入的紀錄的寫入錯誤 (並清除)"""
+        errors = self._default_session.flush(timeout)
+        del self._default_session.errors[:len(errors)]
+        return errors
+
+    def _commit(self, batch: list):
+        if not batch:
+            return
+        records = [record for _, record in batch]
+        try:
+            self._save(records)
+        except Exception as e:
+            message = f"Error saving {len(records)} scraped items: {e}"
+            log.error(message)
+            for session in {id(session): session for session, _ in batch}.values():
+                session.errors.append(message)
+            return
+        for callback in self._listeners:
+            try:
+                callback(records)
+            except Exception as e:
+                log.error(f"Ingest listener {callback} failed: {e}")
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, _Barrier):
+                self._commit(batch)
+                batch = []
+                item.event.set()
+            elif item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._commit(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_ingest_writer() -> IngestWriter:
+    """取得 (必要時建立) 目前行程共用的 IngestWriter"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = IngestWriter(
+                    max_queue=app_config.get_option('INGEST', 'QUEUE_SIZE', fallback=DEFAULT_QUEUE_SIZE, cast=int),
+                    batch_size=app_config.get_option('INGEST', 'BATCH_SIZE', fallback=DEFAULT_BATCH_SIZE, cast=int),
+                    flush_interval=app_config.get_option('INGEST', 'FLUSH_INTERVAL', fallback=DEFAULT_FLUSH_INTERVAL, cast=float),
+                )
+    return _writer
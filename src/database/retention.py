@@ -0,0 +1,270 @@
+# src/database/retention.py
+"""
+prices 依 record_date 按月分區 (RANGE COLUMNS)，並依保留期限整個刪除 (或先封存) 過期月份的分區。
+
+查詢與寫入只會碰到最近幾個月的分區，歷史資料再多，索引深度與寫入成本都不會跟著成長；
+刪除過期資料是 DROP PARTITION (只刪檔案)，不需要逐列 DELETE。
+
+分區名稱為 pYYYYMM (VALUES LESS THAN 下個月一號)，最後一個分區 pfuture 收容尚未建立分區的日期。
+initialize_database 會把舊版 (未分區) 的 prices 轉換為分區表，並預先建立未來幾個月的分區。
+
+排程執行 (在專案根目錄，例如每天一次的 cron)：
+    python -m src.database.retention                         # 建立未來的分區並刪除過期的分區
+    python -m src.database.retention --archive-dir archive/  # 刪除前先匯出為 archive/prices-YYYYMM.csv.gz
+    python -m src.database.retention --status                # 列出各分區與估計列數
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+import pymysql
+
+from src import config as app_config
+from src.database import db_connector, export
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_KEEP_MONTHS = 12 # 除了本月之外保留的完整月份數
+DEFAULT_FUTURE_MONTHS = 3 # 預先建立的未來月份分區數
+DEFAULT_ARCHIVE_FORMAT = 'csv'
+FUTURE_PARTITION = 'pfuture'
+TABLE = 'prices'
+_LOCK_NAME = 'smartcompare.prices_retention' # 避免多個排程同時修改分區
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def _partition_definitions(first_month: date, end: date) -> list[str]:
+    """first_month 到 end (不含) 之間每個月一個分區的定義"""
+    definitions = []
+    month = first_month
+    while month < end:
+        upper = _add_months(month, 1)
+        definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ('{upper.isoformat()}')")
+        month = upper
+    return definitions
+
+
+def list_partitions(cursor) -> list[dict]:
+    """
+    prices 的分區 [{"name", "upper" (date，pfuture 為 None), "rows" (估計值)}]，依順序排列。
+    未分區的表返回空列表。
+    """
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS description, TABLE_ROWS AS table_rows
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (TABLE,)
+    )
+    partitions = []
+    for row in cursor.fetchall():
+        description = (row['description'] or '').strip("'")
+        upper = None if description.upper() == 'MAXVALUE' else date.fromisoformat(description)
+        partitions.append({"name": row['name'], "upper": upper, "rows": int(row['table_rows'] or 0)})
+    return partitions
+
+
+def _convert_table(cursor, future_end: date):
+    """
+    將舊版的 prices 轉換為分區表 (整個表重建一次，資料量大時需要一段時間)。
+    分區表不支援外鍵，且每個唯一鍵都必須包含 record_date：移除外鍵、主鍵改為 (id, record_date)，
+    只供外鍵使用的 idx_prices_product_id 也一併移除 (唯一鍵與 idx_prices_product_updated 已以 product_id 開頭)。
+    """
+    cursor.execute(
+        "SELECT CONSTRAINT_NAME AS name FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (TABLE,)
+    )
+    for row in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {TABLE} DROP FOREIGN KEY `{row['name']}`")
+
+    # last_updated 有 ON UPDATE CURRENT_TIMESTAMP，需明確保留原值，否則所有舊價格都會變成「剛更新」
+    cursor.execute(f"UPDATE {TABLE} SET record_date = DATE(last_updated), last_updated = last_updated "
+                   "WHERE record_date IS NULL")
+    cursor.execute(f"SELECT MIN(record_date) AS first_date FROM {TABLE}")
+    first_date = cursor.fetchone()['first_date']
+    first_month = _month_start(first_date) if first_date else _month_start(date.today())
+
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = 'idx_prices_product_id' LIMIT 1",
+        (TABLE,)
+    )
+    drop_index = ", DROP INDEX idx_prices_product_id" if cursor.fetchone() else ""
+
+    definitions = _partition_definitions(first_month, future_end)
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    log.info(f"正在將 {TABLE} 轉換為按月分區 ({first_month:%Y-%m} 起，共 {len(definitions)} 個分區)...")
+    cursor.execute(
+        f"""
+        ALTER TABLE {TABLE}
+            MODIFY record_date DATE NOT NULL,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, record_date){drop_index}
+        PARTITION BY RANGE COLUMNS (record_date) ({', '.join(definitions)})
+        """
+    )
+
+
+def ensure_partitions(cursor, future_months: int = DEFAULT_FUTURE_MONTHS, today: date = None) -> list[str]:
+    """
+    確保 prices 已分區，且本月到未來 future_months 個月都有各自的分區 (從 pfuture 切出)。
+    返回新建立的分區名稱。
+    """
+    today = today or date.today()
+    future_end = _add_months(_month_start(today), future_months + 1)
+    partitions = list_partitions(cursor)
+    if not partitions:
+        _convert_table(cursor, future_end)
+        return [partition['name'] for partition in list_partitions(cursor)]
+
+    bounded = [partition for partition in partitions if partition['upper'] is not None]
+    first_month = bounded[-1]['upper'] if bounded else _month_start(today)
+    definitions = _partition_definitions(first_month, future_end)
+    if not definitions:
+        return []
+    if partitions[-1]['upper'] is None:
+        # pfuture 平常是空的；有資料時 (排程中斷太久) 也會一併移到新的分區
+        cursor.execute(
+            f"ALTER TABLE {TABLE} REORGANIZE PARTITION {partitions[-1]['name']} INTO "
+            f"({', '.join(definitions)}, PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))"
+        )
+    else:
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PARTITION ({', '.join(definitions)})")
+    created = [definition.split()[1] for definition in definitions]
+    log.info(f"已建立 {TABLE} 分區: {', '.join(created)}")
+    return created
+
+
+def expired_partitions(partitions: list[dict], keep_months: int, today: date = None) -> list[dict]:
+    """
+    整個月份都早於保留期限的分區 (本月之前 keep_months 個完整月份之前)，
+    每一項另外附上 "lower" (該分區的起始日期，第一個分區為 None)。
+    """
+    cutoff = _add_months(_month_start(today or date.today()), -keep_months)
+    expired, lower = [], None
+    for partition in partitions:
+        if partition['upper'] is None or partition['upper'] > cutoff:
+            break
+        expired.append(dict(partition, lower=lower))
+        lower = partition['upper']
+    return expired
+
+
+def archive_partition(partition: dict, archive_dir: str, fmt: str = DEFAULT_ARCHIVE_FORMAT) -> str:
+    """
+    以 export 模組串流匯出分區內的價格 (gzip 壓縮)，返回檔案路徑。
+    先寫暫存檔再改名，匯出中斷時不會留下不完整的封存檔。
+    """
+    extension = export.FORMATS[fmt][1]
+    path = os.path.join(archive_dir, f"prices-{partition['name'][1:]}.{extension}.gz")
+    tmp_path = f"{path}.tmp"
+    os.makedirs(archive_dir, exist_ok=True)
+    chunks = export.export_chunks(fmt, since=partition['lower'], until=partition['upper'], compress=True, read_primary=True)
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_maintenance(keep_months: int = None, future_months: int = None, archive_dir: str = None,
+                    archive_format: str = None, dry_run: bool = False, today: date = None) -> dict:
+    """
+    建立未來的分區並刪除過期的分區；未指定的參數由 config.ini [RETENTION] 讀取。
+    設定 archive_dir 時，每個過期分區先封存成檔案，封存成功後才刪除。
+    返回 {"created": [...], "dropped": [...], "archived": [...]}。
+    """
+    option = app_config.get_option
+    keep_months = keep_months if keep_months is not None else option('RETENTION', 'KEEP_MONTHS', fallback=DEFAULT_KEEP_MONTHS, cast=int)
+    future_months = future_months if future_months is not None else option('RETENTION', 'FUTURE_MONTHS', fallback=DEFAULT_FUTURE_MONTHS, cast=int)
+    archive_dir = archive_dir or option('RETENTION', 'ARCHIVE_DIR')
+    archive_format = archive_format or option('RETENTION', 'ARCHIVE_FORMAT', fallback=DEFAULT_ARCHIVE_FORMAT)
+    if keep_months < 1:
+        raise ValueError("KEEP_MONTHS must be at least 1")
+
+    result = {"created": [], "dropped": [], "archived": []}
+    conn = db_connector.get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (_LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                log.warning("另一個分區維護工作正在執行，略過這次。")
+                return result
+            try:
+                if not dry_run:
+                    result["created"] = ensure_partitions(cursor, future_months, today)
+                for partition in expired_partitions(list_partitions(cursor), keep_months, today):
+                    if dry_run:
+                        result["dropped"].append(partition['name'])
+                        continue
+                    if archive_dir:
+                        result["archived"].append(archive_partition(partition, archive_dir, archive_format))
+                    cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {partition['name']}")
+                    result["dropped"].append(partition['name'])
+                    log.info(f"已刪除過期的 {TABLE} 分區 {partition['name']} (約 {partition['rows']} 列)。")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+    finally:
+        conn.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="prices 按月分區的建立與過期資料刪除 / 封存")
+    parser.add_argument('--keep-months', type=int, help=f"本月之外保留的完整月份數 (預設 [RETENTION] KEEP_MONTHS 或 {DEFAULT_KEEP_MONTHS})")
+    parser.add_argument('--future-months', type=int, help=f"預先建立的未來月份分區數 (預設 {DEFAULT_FUTURE_MONTHS})")
+    parser.add_argument('--archive-dir', help="刪除前先把分區匯出到這個目錄 (預設 [RETENTION] ARCHIVE_DIR，未設定則直接刪除)")
+    parser.add_argument('--format', choices=export.available_formats(), help="封存檔格式 (預設 csv)")
+    parser.add_argument('--dry-run', action='store_true', help="只列出會被刪除的分區，不修改資料表")
+    parser.add_argument('--status', action='store_true', help="只列出目前的分區")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        conn = db_connector.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                partitions = list_partitions(cursor)
+        finally:
+            conn.close()
+        if not partitions:
+            print(f"{TABLE} 尚未分區 (執行 initialize_database 或不帶參數執行本命令以轉換)。")
+        for partition in partitions:
+            upper = partition['upper'].isoformat() if partition['upper'] else 'MAXVALUE'
+            print(f"{partition['name']:<10} < {upper:<12} 約 {partition['rows']} 列")
+        return 0
+
+    try:
+        result = run_maintenance(args.keep_months, args.future_months, args.archive_dir, args.format, args.dry_run)
+    except (pymysql.Error, OSError, ValueError) as e:
+        print(f"分區維護失敗: {e}")
+        return 1
+    if args.dry_run:
+        print(f"將刪除的分區: {', '.join(result['dropped']) or '(無)'}")
+    else:
+        print(f"新建分區: {', '.join(result['created']) or '(無)'}；"
+              f"刪除分區: {', '.join(result['dropped']) or '(無)'}")
+        for path in result['archived']:
+            print(f"已封存: {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,20 +11,78 @@ CREATE TABLE IF NOT EXISTS products (
 ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
 
 -- 價格表 (記錄每個商品在不同平台的價格歷史)
+-- 依 record_date 按月分區，過期的月份整個分區刪除 (見 retention.py)。這裡只建立 pfuture，
+-- 各月份的分區由 initialize_database / 分區維護排程從 pfuture 切出。
+-- 分區表不支援外鍵，且每個唯一鍵都必須包含 record_date，因此主鍵為 (id, record_date)。
 CREATE TABLE IF NOT EXISTS prices (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     product_id INT NOT NULL,
     platform VARCHAR(50) NOT NULL,
     price DECIMAL(10, 2) NOT NULL,
     product_url VARCHAR(1000) NOT NULL,
     is_available BOOLEAN DEFAULT TRUE,
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    record_date DATE DEFAULT (CURRENT_DATE), -- ✅ 加這個，改成每天唯一
-    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    record_date DATE NOT NULL, -- 每個商品 × 平台每天一筆 (寫入時指定)
+    PRIMARY KEY (id, record_date),
     UNIQUE (product_id, platform, record_date)
+)
+PARTITION BY RANGE COLUMNS (record_date) (
+    PARTITION pfuture VALUES LESS THAN (MAXVALUE)
 );
 
+-- 搜尋關鍵字統計 (供搜尋建議依熱門程度排序)
+CREATE TABLE IF NOT EXISTS search_keywords (
+    keyword VARCHAR(255) NOT NULL PRIMARY KEY,
+    search_count INT NOT NULL DEFAULT 0,
+    result_count INT NOT NULL DEFAULT 0, -- 最近一次搜尋的商品數
+    last_searched TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+-- 降價通知：商品任一平台 (或指定平台) 價格低於 target_price 時通知
+CREATE TABLE IF NOT EXISTS price_alerts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    target_price DECIMAL(10, 2) NOT NULL,
+    platform VARCHAR(50),        -- NULL 表示任一平台
+    contact VARCHAR(255) NOT NULL, -- 通知對象 (例如 email)
+    is_active BOOLEAN DEFAULT TRUE,
+    last_notified_price DECIMAL(10, 2), -- 已通知過的最低價，之後只在出現更低價時再通知
+    last_notified_at TIMESTAMP NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    INDEX idx_price_alerts_product_target (product_id, target_price),
+    INDEX idx_price_alerts_contact (contact)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+-- 待發送的通知 (outbox)，由寫入價格的同一個交易產生
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    alert_id INT NOT NULL,
+    product_id INT NOT NULL,
+    platform VARCHAR(50) NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    product_url VARCHAR(1000) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    delivered_at TIMESTAMP NULL,
+    FOREIGN KEY (alert_id) REFERENCES price_alerts(id) ON DELETE CASCADE,
+    INDEX idx_alert_outbox_pending (delivered_at, id)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+-- 由商品名稱擷取的屬性 (brand / model / capacity / color)，供搜尋的屬性篩選與 facet 統計
+CREATE TABLE IF NOT EXISTS product_attributes (
+    product_id INT NOT NULL,
+    name VARCHAR(20) NOT NULL,
+    value VARCHAR(100) NOT NULL,
+    PRIMARY KEY (product_id, name, value),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    INDEX idx_product_attributes_facet (name, value, product_id)
+) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+-- 擷取屬性時使用的字典版本 (0 表示尚未擷取)；既有資料庫重複執行時的 Duplicate column 錯誤會被忽略
+ALTER TABLE products ADD COLUMN attributes_version SMALLINT NOT NULL DEFAULT 0;
+
  -- 對商品名稱建立索引，加速搜尋
 CREATE INDEX idx_products_name ON products(name(255));
-CREATE INDEX idx_prices_product_id ON prices(product_id);
+-- 依新鮮度查詢 (pr.product_id = p.id AND pr.last_updated >= ...) 時直接在索引內篩選時間
+CREATE INDEX idx_prices_product_updated ON prices(product_id, last_updated);
 CREATE INDEX idx_prices_platform ON prices(platform);
\ No newline at end of file
@@ -0,0 +1,34 @@
+# src/filelock.py
+"""
+多個 gunicorn worker 共用同一個檔案 (索引、快照、trace 檔) 時的跨行程互斥鎖。
+
+    from src.filelock import file_lock
+    with file_lock(path):
+        ...  # 讀取 -> 修改 -> 寫入
+"""
+
+import contextlib
+import os
+
+# fcntl 只在 Linux / macOS 上提供；沒有時不加鎖 (單一行程的開發伺服器不受影響)
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - 視部署環境而定
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """以 path + '.lock' 取得排他鎖 (flock)；同一行程的其他執行緒開啟的是不同的檔案描述，同樣會互斥"""
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,111 @@
+# src/logger.py
+"""
+非阻塞的 log。
+
+呼叫端 (請求 / 爬蟲執行緒) 只把紀錄放進有界佇列，由背景執行緒寫到標準輸出 (或 [LOGGING] FILE)，
+終端機或磁碟變慢時不會拖住請求；佇列已滿時直接丟棄紀錄並計數。
+每筆紀錄附上目前請求的 trace ID (見 tracing.py)，方便對照 traces.jsonl。
+
+用法：
+    from src.logger import get_logger
+    log = get_logger(__name__)
+    log.info(f"Scraped {count} items")
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+from src import config as app_config
+from src import tracing
+
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_QUEUE_SIZE = 10000
+ROOT_LOGGER = 'src'
+_FORMAT = '%(asctime)s %(levelname)s [%(threadName)s]%(trace_id)s %(message)s'
+
+
+class _TraceIdFilter(logging.Filter):
+    """在呼叫端的執行緒中取得目前的 trace ID (輸出執行緒看不到請求的 context)"""
+
+    def filter(self, record) -> bool:
+        trace_id = tracing.current_trace_id()
+        record.trace_id = f" [{trace_id}]" if trace_id else ""
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """放入佇列時不阻塞的 QueueHandler；輸出執行緒在第一筆紀錄時啟動 (fork 後的子行程各自啟動)"""
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                level = app_config.get_option('LOGGING', 'LEVEL', fallback=DEFAULT_LEVEL).upper()
+                logging.getLogger(ROOT_LOGGER).setLevel(level)
+                path = app_config.get_option('LOGGING', 'FILE')
+                output = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler(sys.stdout)
+                output.setFormatter(logging.Formatter(_FORMAT))
+                self.queue = queue.Queue(maxsize=self.maxsize)
+                self._listener = logging.handlers.QueueListener(self.queue, output)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """送出佇列中剩餘的紀錄 (行程結束時呼叫)"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def _configure():
+    global _handler
+    if _handler is not None:
+        return
+    with _handler_lock:
+        if _handler is None:
+            handler = _QueueHandler()
+            handler.addFilter(_TraceIdFilter())
+            root = logging.getLogger(ROOT_LOGGER)
+            root.addHandler(handler)
+            root.setLevel(DEFAULT_LEVEL)
+            root.propagate = False
+            atexit.register(handler.stop)
+            _handler = handler
+
+
+def get_logger(name: str) -> logging.Logger:
+    """取得 src.* 底下的 logger (以 python -m 執行時 __name__ 為 '__main__'，同樣歸在 src 底下)"""
+    _configure()
+    if name != ROOT_LOGGER and not name.startswith(ROOT_LOGGER + '.'):
+        name = f"{ROOT_LOGGER}.{name}"
+    return logging.getLogger(name)
+
+
+def dropped_log_records() -> int:
+    """因佇列已滿而丟棄的紀錄數"""
+    return _handler.dropped if _handler is not None else 0
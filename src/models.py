@@ -0,0 +1,51 @@
+# src/models.py
+
+
+class ProductRecord:
+    """
+    爬蟲與資料庫之間傳遞的單筆商品價格紀錄。
+    使用 __slots__，大量紀錄在佇列中傳遞時比 dict 省記憶體。
+    """
+
+    __slots__ = ('name', 'price', 'url', 'image', 'platform', 'is_available', 'brand', 'observed_at')
+
+    def __init__(self, name: str, price: float, url: str, platform: str, image: str = '',
+                 is_available: bool = True, brand: str = None, observed_at=None):
+        self.name = name
+        self.price = price
+        self.url = url
+        self.platform = platform
+        self.image = image
+        self.is_available = is_available
+        self.brand = brand
+        self.observed_at = observed_at # 回填歷史資料時的擷取時間 (datetime)，即時爬取為 None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ProductRecord':
+        """由舊格式的商品字典 ('name', 'price', 'url', 'image', 'platform' ...) 建立紀錄"""
+        return cls(
+            name=data['name'],
+            price=data['price'],
+            url=data['url'],
+            platform=data['platform'],
+            image=data.get('image', ''),
+            is_available=data.get('is_available', True),
+            brand=data.get('brand', None),
+            observed_at=data.get('observed_at', None),
+        )
+
+    @classmethod
+    def coerce(cls, item) -> 'ProductRecord':
+        """接受 ProductRecord 或 dict，一律返回 ProductRecord"""
+        return item if isinstance(item, cls) else cls.from_dict(item)
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, ProductRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return f"ProductRecord(platform={self.platform!r}, name={self.name!r}, price={self.price!r}, url={self.url!r})"
@@ -1,7 +1,26 @@
 import abc # 導入抽象基底類別模組
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import base64
+import json
+import re
+from time import sleep, monotonic
+from typing import Iterator
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src import config as app_config
+from src import tracing
+from src.logger import get_logger
+from src.models import ProductRecord
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from .driver_pool import get_driver_pool
+from .snapshot_store import get_snapshot_store
+
+log = get_logger(__name__)
+
+# JSONP 回應 (callback({...});) 的外層包裝
+_JSONP_PATTERN = re.compile(r'^[\w$.]+\((.*)\)\s*;?\s*$', re.S)
+# 價格字串中的第一個數字 (可含千分位逗號與小數)，例如 "$1,290~1,590" -> "1,290"
+_PRICE_PATTERN = re.compile(r'\d[\d,]*(?:\.\d+)?')
 
 class BaseScraper(abc.ABC):
     """
@@ -9,45 +28,377 @@ class BaseScraper(abc.ABC):
     定義了所有具體爬蟲必須實現的方法。
     """
 
+    # 網路擷取：子類別宣告要擷取的搜尋 API 網址 (正規表示式)。
+    # 頁面載入時瀏覽器本身發出的 XHR/JSON 回應會透過 Chrome DevTools Protocol 的
+    # performance log 取得，再由 _parse_captured 直接解析，省去 DOM 走訪與大部分的捲動。
+    capture_url_patterns = ()
+    # 符合 capture_url_patterns 但不是搜尋結果的 API (例如推薦、廣告)，不擷取
+    capture_url_excludes = ()
+
+    # _parse 等待商品元素出現的秒數；離線重新解析快照時設為 0
+    parse_wait_timeout = 10
+
+    # 「查無商品」頁面的標示 (CSS selector / 頁面文字)，出現時視為沒有結果而不是載入失敗
+    empty_result_selectors = ()
+    empty_result_texts = ()
+
+    # 為 True 時 close_driver 不歸還 driver，讓同一個 Chrome 依序執行多次搜尋 (批次搜尋)
+    hold_driver = False
+
     def __init__(self, platform_name: str):
         self.platform_name = platform_name
-        self.driver = None # Selenium driver instance
-
-        # 設定 ChromeOptions
-        self.chrome_options = webdriver.ChromeOptions()
-        # self.chrome_options.add_argument("--headless") # 不開啟實體瀏覽器背景執行，除錯時建議關閉
-        self.chrome_options.add_argument("--start-maximized") # 最大化視窗
-        self.chrome_options.add_argument("--incognito") # 開啟無痕模式
-        self.chrome_options.add_argument("--disable-popup-blocking") # 禁用彈出攔截
-        self.chrome_options.add_argument("--disable-notifications") # 取消通知
-        self.chrome_options.add_argument("--lang=zh-TW") # 設定為正體中文
-        self.chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        self.chrome_options.add_experimental_option('useAutomationExtension', False)
-        self.chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
+        self.driver = None # Selenium driver instance (ChromeOptions 見 driver_pool.build_chrome_options)
+        self.aborted = False
+        self.failures = 0 # 本次爬取中搜尋框 / 商品列表等候逾時的次數，供平台管制器判斷是否被封鎖
+        self.captured_payloads = None # 最近一次 _parse_network 解析出商品的 API 回應
 
     def _initialize_driver(self):
-        """初始化 Selenium WebDriver"""
+        """從 driver 池取得 Selenium WebDriver"""
+        if self.aborted:
+            raise RuntimeError(f"{self.platform_name} 爬取已被中止")
         if self.driver is None:
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=self.chrome_options)
+            with tracing.span('chrome.acquire', platform=self.platform_name): # 池中沒有閒置的 Chrome 時包含啟動時間
+                self.driver = get_driver_pool().acquire()
+
+    def _phase(self, name: str):
+        """將爬取的一個階段 (搜尋、捲動...) 記錄為 trace 中的 span"""
+        return tracing.span(f"{self.platform_name}.{name}")
+
+    def _is_empty_result_page(self) -> bool:
+        """目前頁面是否為平台的「查無商品」頁面"""
+        for selector in self.empty_result_selectors:
+            if self.driver.find_elements(By.CSS_SELECTOR, selector):
+                return True
+        if self.empty_result_texts:
+            body = self.driver.find_elements(By.TAG_NAME, 'body')
+            text = body[0].text if body else ''
+            return any(marker in text for marker in self.empty_result_texts)
+        return False
+
+    def _wait_for_results(self, item_selector: str) -> bool:
+        """
+        等待商品元素或「查無商品」標示出現 (最多 parse_wait_timeout 秒)。
+        有商品時返回 True，查無商品時返回 False；兩者都沒有出現時拋出 TimeoutException (計入平台失敗)。
+        """
+        def ready(driver):
+            if driver.find_elements(By.CSS_SELECTOR, item_selector):
+                return 'items'
+            return 'empty' if self._is_empty_result_page() else False
+
+        outcome = WebDriverWait(self.driver, self.parse_wait_timeout).until(ready)
+        if outcome == 'empty':
+            log.info(f"{self.platform_name} 查無商品。")
+        return outcome == 'items'
+
+    def _timed_parse(self) -> Iterator[ProductRecord]:
+        """DOM 解析 (_parse) 的 generator，解析所花的時間記錄為 span"""
+        return tracing.timed_iter(f"{self.platform_name}.parse", self._parse())
+
+    def _save_snapshot(self, keyword: str, payloads: list = None):
+        """
+        啟用快照儲存時，保存目前渲染完成的搜尋頁 HTML，供日後離線重新解析。
+        第一頁由 API 回應解析時 (頁面沒有捲動，HTML 只有第一屏的商品) 一併保存 payloads，重新解析時以 _parse_captured 為準。
+        """
+        store = get_snapshot_store()
+        if store is None:
+            return
+        try:
+            with self._phase('snapshot'):
+                store.save(self.platform_name, keyword, self.driver.page_source, self.driver.current_url, payloads=payloads)
+        except Exception as e:
+            log.error(f"{self.platform_name} 儲存頁面快照失敗: {e}")
+
+    # --- 多頁結果：在同一個 Chrome 的多個分頁中同時載入 ---
+
+    def _page_url(self, keyword: str, page: int, base_url: str = None):
+        """
+        返回第 page 頁 (從 1 開始) 搜尋結果的網址，子類別覆寫此方法以支援分頁。
+        base_url 為第一頁 (已套用熱銷 / 熱門排序) 目前的網址，後續頁面沿用其中的排序參數。
+        返回 None 表示不支援分頁。
+        """
+        return None
+
+    @staticmethod
+    def _with_query(url: str, **params) -> str:
+        """設定 (或取代) 網址中的查詢參數，其他參數 (例如排序) 保持不變"""
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        query.update({key: str(value) for key, value in params.items()})
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def _pagination_settings(self) -> tuple[int, int]:
+        """
+        讀取分頁深度與商品數上限。
+        優先使用 [SCRAPER_<平台>] 區段，其次是 [SCRAPER] 區段；MAX_ITEMS 為 0 表示不限制。
+        """
+        section = f"SCRAPER_{self.platform_name}"
+        depth = app_config.get_option(section, 'PAGE_DEPTH', cast=int,
+                                      fallback=app_config.get_option('SCRAPER', 'PAGE_DEPTH', fallback=1, cast=int))
+        max_items = app_config.get_option(section, 'MAX_ITEMS', cast=int,
+                                          fallback=app_config.get_option('SCRAPER', 'MAX_ITEMS', fallback=0, cast=int))
+        return max(1, depth), max(0, max_items)
+
+    def _collect_pages(self, keyword: str, first_page) -> Iterator[ProductRecord]:
+        """
+        逐筆產出第一頁的結果，接著依 PAGE_DEPTH 在新分頁中同時開啟第 2..N 頁 (瀏覽器並行載入) 並逐頁產出。
+        所有頁面的結果依商品網址去除重複，並套用 MAX_ITEMS 上限。
+        """
+        depth, max_items = self._pagination_settings()
+        seen = set()
+
+        def unique(records):
+            for record in records:
+                key = record.url.split('#')[0]
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield record
+                if max_items and len(seen) >= max_items:
+                    return
+
+        yield from unique(first_page)
+        if depth < 2 or (max_items and len(seen) >= max_items):
+            return
+        base_url = self.driver.current_url
+        urls = [self._page_url(keyword, page, base_url) for page in range(2, depth + 1)]
+        urls = [url for url in urls if url]
+        if not urls:
+            return
+
+        main_handle = self.driver.current_window_handle
+        existing_handles = set(self.driver.window_handles)
+        if hasattr(self, '_network_events'):
+            self._drain_network_events()
+            self._network_events = [] # 只保留新分頁載入期間的 API 回應
+        with self._phase('open_pages'):
+            for url in urls:
+                self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+        page_handles = [h for h in self.driver.window_handles if h not in existing_handles]
+
+        try:
+            # 等到每個分頁都擷取到 API 回應 (或逾時)；沒有擷取到的分頁各自改用 DOM 解析
+            if hasattr(self, '_network_events'):
+                with self._phase('network_wait'):
+                    self._wait_for_captures(page_handles)
+            for handle in page_handles:
+                if max_items and len(seen) >= max_items:
+                    break
+                self.driver.switch_to.window(handle) # getResponseBody 需要在發出請求的分頁中執行
+                records = self._parse_network(webview=handle, timeout=0) if hasattr(self, '_network_events') else []
+                if not records:
+                    with self._phase('scroll'):
+                        self._scroll(limit=0)
+                    records = self._timed_parse()
+                yield from unique(records)
+        finally:
+            # 被中止 (abort) 時 driver 已經丟棄 (為 None)，不要以 AttributeError 蓋掉原本的例外
+            if self.driver is not None:
+                for handle in page_handles:
+                    try:
+                        self.driver.switch_to.window(handle)
+                        self.driver.close()
+                    except Exception:
+                        pass
+                try:
+                    self.driver.switch_to.window(main_handle)
+                except Exception as e:
+                    log.warning(f"{self.platform_name} 無法切換回主分頁: {e}")
+
+    # --- Chrome DevTools Protocol 網路擷取 ---
+
+    def _enable_network_capture(self):
+        """開啟 CDP Network domain，並清除 driver 先前累積的 performance log"""
+        self._network_events = []
+        if not self.capture_url_patterns:
+            return
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.get_log('performance') # 丟棄池中 driver 先前留下的紀錄
+        except Exception as e:
+            log.warning(f"{self.platform_name} 無法開啟網路擷取: {e}")
+
+    def _drain_network_events(self):
+        """讀取 performance log 中新增的 Network 事件"""
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return
+        for entry in entries:
+            try:
+                envelope = json.loads(entry['message'])
+                message = envelope['message']
+            except (KeyError, ValueError):
+                continue
+            if message.get('method', '').startswith('Network.'):
+                message['webview'] = envelope.get('webview') # 發出請求的分頁 (target ID)
+                self._network_events.append(message)
+
+    @staticmethod
+    def _same_target(webview, handle: str) -> bool:
+        """performance log 的 webview 與 window handle 都是 target ID (舊版 chromedriver 的 handle 帶 CDwindow- 前綴)"""
+        return bool(webview) and webview.upper() == handle.replace('CDwindow-', '').upper()
+
+    def _matching_request_ids(self, webview: str = None) -> list[str]:
+        """符合 capture_url_patterns 且已載入完成的請求 ID (依回應順序)；指定 webview 時只取該分頁的請求"""
+        patterns = [re.compile(p) for p in self.capture_url_patterns]
+        excludes = [re.compile(p) for p in self.capture_url_excludes]
+        matched, finished = [], set()
+        for message in self._network_events:
+            if webview is not None and not self._same_target(message.get('webview'), webview):
+                continue
+            params = message.get('params', {})
+            if message['method'] == 'Network.responseReceived':
+                url = params.get('response', {}).get('url', '')
+                if any(p.search(url) for p in patterns) and not any(p.search(url) for p in excludes):
+                    matched.append(params.get('requestId'))
+            elif message['method'] == 'Network.loadingFinished':
+                finished.add(params.get('requestId'))
+        return [request_id for request_id in matched if request_id in finished]
+
+    def _wait_for_captures(self, webviews: list, timeout: float = 5.0):
+        """最多等待 timeout 秒，直到每個 webview (None 表示任一分頁) 都有至少一個符合的請求完成"""
+        if not self.capture_url_patterns:
+            return
+        deadline = monotonic() + timeout
+        self._drain_network_events()
+        while (any(not self._matching_request_ids(webview) for webview in webviews)
+               and monotonic() < deadline):
+            sleep(0.5)
+            self._drain_network_events()
+
+    def _captured_json_responses(self, timeout: float = 5.0, webview: str = None) -> list:
+        """
+        取得頁面載入期間擷取到的 JSON 回應內容 (指定 webview 時只取該分頁，且 driver 須已切換到該分頁)。
+        最多等待 timeout 秒讓符合的請求完成。
+        """
+        if not self.capture_url_patterns or not hasattr(self, '_network_events'):
+            return []
+
+        self._wait_for_captures([webview], timeout)
+        payloads = []
+        for request_id in dict.fromkeys(self._matching_request_ids(webview)):
+            try:
+                response = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            except Exception:
+                continue # 內容可能已被瀏覽器釋放
+            body = response.get('body', '')
+            if response.get('base64Encoded'):
+                body = base64.b64decode(body).decode('utf-8', errors='replace')
+            body = body.strip()
+            jsonp = _JSONP_PATTERN.match(body)
+            if jsonp and not body.startswith(('{', '[')):
+                body = jsonp.group(1)
+            try:
+                payloads.append(json.loads(body))
+            except ValueError:
+                continue
+        return payloads
+
+    def _parse_captured(self, payloads: list) -> Iterator[ProductRecord]:
+        """
+        從擷取到的 JSON 回應解析商品，子類別覆寫此方法並逐筆 yield ProductRecord。
+        沒有產出任何商品時改用 DOM 解析。
+        """
+        return iter(())
+
+    def _parse_network(self, webview: str = None, timeout: float = 5.0) -> list[ProductRecord]:
+        """
+        解析擷取到的 API 回應 (webview 見 _captured_json_responses) 並依商品網址去除重複。
+        解析出商品時，所用的回應內容保留在 captured_payloads (供快照保存)，否則為 None。
+        """
+        self.captured_payloads = None
+        try:
+            with self._phase('network') as span:
+                payloads = self._captured_json_responses(timeout, webview)
+                products = list(self._parse_captured(payloads))
+                span.set(items=len(products))
+        except Exception as e:
+            log.error(f"{self.platform_name} 解析網路回應時發生錯誤: {e}")
+            return []
+        if products:
+            self.captured_payloads = payloads
+        unique = {}
+        for product in products:
+            unique.setdefault(product.url, product)
+        return list(unique.values())
+
+    @staticmethod
+    def _find_item_lists(payload, item_keys: tuple, exclude_keys=None) -> list[dict]:
+        """
+        在巢狀 JSON 中找出元素為商品字典 (包含 item_keys 其中之一) 的列表，並攤平返回。
+        exclude_keys (正規表示式) 符合的欄位整個略過，例如同一個回應中的推薦、廣告區塊。
+        """
+        items = []
+        stack = [payload]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                stack.extend(value for key, value in node.items()
+                             if exclude_keys is None or not exclude_keys.search(str(key)))
+            elif isinstance(node, list):
+                dict_items = [x for x in node if isinstance(x, dict)]
+                if dict_items and any(key in dict_items[0] for key in item_keys):
+                    items.extend(dict_items)
+                else:
+                    stack.extend(node)
+        return items
+
+    @staticmethod
+    def _first_value(item: dict, *keys):
+        """依序返回第一個存在且非空的欄位值"""
+        for key in keys:
+            value = item.get(key)
+            if value not in (None, ''):
+                return value
+        return None
+
+    @staticmethod
+    def _to_price(value):
+        """
+        將 API 的價格欄位 (數字或 '$1,290' 之類的字串) 轉為 float，無法轉換時返回 None。
+        價格區間 (例如 '1,290~1,590') 取第一個數字 (最低價)。
+        """
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            match = _PRICE_PATTERN.search(value)
+            return float(match.group().replace(',', '')) if match else None
+        return None
 
     @abc.abstractmethod
-    def search_product(self, keyword: str) -> list[dict]:
+    def iter_products(self, keyword: str) -> Iterator[ProductRecord]:
         """
-        抽象方法：根據關鍵字搜尋商品。
+        抽象方法：根據關鍵字搜尋商品，邊解析邊逐筆產出。
         所有繼承此基底類別的子類別都必須實作此方法。
 
         Args:
             keyword (str): 要搜尋的商品關鍵字。
 
-        Returns:
-            list[dict]: 包含多個商品資訊的列表，每個商品是一個字典。
-                        字典應包含 'name', 'price', 'url', 'image', 'platform' 等標準鍵。
+        Yields:
+            ProductRecord: 標準化的商品價格紀錄 (name, price, url, image, platform, is_available)。
         """
         pass # 抽象方法沒有具體實現
 
+    def search_product(self, keyword: str) -> list[ProductRecord]:
+        """搜尋商品並一次返回所有結果 (iter_products 的列表版本)"""
+        return list(self.iter_products(keyword))
+
+    def abort(self):
+        """
+        中止進行中的爬取 (可從其他執行緒呼叫)。
+        直接關閉 Chrome，讓卡在 Selenium 呼叫中的執行緒盡快出錯返回；該 driver 不會放回池中。
+        """
+        self.aborted = True
+        self.discard_driver()
+
+    def discard_driver(self):
+        """關閉目前的 driver 且不放回池中 (例如發生錯誤、狀態不明時)"""
+        driver, self.driver = self.driver, None
+        if driver:
+            get_driver_pool().discard(driver)
+
     def close_driver(self):
-        """關閉 WebDriver"""
-        if self.driver:
-            self.driver.quit()
+        """將 WebDriver 歸還 driver 池 (hold_driver 為 True 時保留)"""
+        if self.driver and not self.hold_driver:
+            get_driver_pool().release(self.driver)
             self.driver = None # 重置 driver 實例
\ No newline at end of file
@@ -0,0 +1,220 @@
+# src/scraper/driver_pool.py
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from src import config as app_config
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+# ChromeDriverManager().install() 的結果快取在磁碟上，避免每次建立 driver 都重新解析 / 下載
+DRIVER_PATH_CACHE = os.path.join(app_config.project_root_dir, '.cache', 'chromedriver.json')
+
+DEFAULT_POOL_SIZE = 3
+DEFAULT_WARM_DRIVERS = 1
+DEFAULT_MAX_USES = 50 # 每個 Chrome 最多重複使用的次數，超過後重開以釋放記憶體
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_chromedriver_path() -> str:
+    """
+    取得 chromedriver 執行檔路徑。
+    依序使用：行程內快取 -> 磁碟快取 (.cache/chromedriver.json) -> ChromeDriverManager().install()。
+    """
+    global _driver_path
+    if _driver_path and os.path.exists(_driver_path):
+        return _driver_path
+
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+
+        try:
+            with open(DRIVER_PATH_CACHE, 'r', encoding='utf-8') as f:
+                cached_path = json.load(f).get('path')
+            if cached_path and os.path.exists(cached_path):
+                _driver_path = cached_path
+                return _driver_path
+        except (OSError, ValueError):
+            pass
+
+        from webdriver_manager.chrome import ChromeDriverManager
+        _driver_path = ChromeDriverManager().install()
+        try:
+            os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+            with open(DRIVER_PATH_CACHE, 'w', encoding='utf-8') as f:
+                json.dump({"path": _driver_path, "resolved_at": time.time()}, f)
+        except OSError as e:
+            log.warning(f"無法寫入 chromedriver 路徑快取: {e}")
+        return _driver_path
+
+
+def build_chrome_options():
+    """建立所有爬蟲共用的 ChromeOptions"""
+    from selenium import webdriver
+
+    chrome_options = webdriver.ChromeOptions()
+    if app_config.get_option('SCRAPER', 'HEADLESS', fallback=False, cast=bool):
+        chrome_options.add_argument("--headless=new") # 不開啟實體瀏覽器背景執行，除錯時建議關閉
+    chrome_options.add_argument("--start-maximized") # 最大化視窗
+    chrome_options.add_argument("--incognito") # 開啟無痕模式
+    chrome_options.add_argument("--disable-popup-blocking") # 禁用彈出攔截
+    chrome_options.add_argument("--disable-notifications") # 取消通知
+    chrome_options.add_argument("--lang=zh-TW") # 設定為正體中文
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
+    if app_config.get_option('SCRAPER', 'NETWORK_CAPTURE', fallback=True, cast=bool):
+        # 開啟 performance log，讓爬蟲可以透過 CDP 取得搜尋 API 的 JSON 回應
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return chrome_options
+
+
+class DriverPool:
+    """
+    Chrome WebDriver 連線池。
+    歸還的 driver 會被重設 (關閉多餘分頁、清除 cookies) 後留給下一次爬取使用，
+    省下每次啟動 Chrome 的時間。
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_uses: int = DEFAULT_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.warmed = False
+
+    def _check_fork(self):
+        # fork 後的子行程不能使用父行程啟動的 Chrome
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = queue.LifoQueue()
+                    self._uses = {}
+                    self.warmed = False
+                    self._pid = os.getpid()
+
+    def _create_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        service = Service(resolve_chromedriver_path())
+        driver = webdriver.Chrome(service=service, options=build_chrome_options())
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def acquire(self):
+        """取得一個可用的 driver，池中沒有閒置 driver 時啟動新的 Chrome"""
+        self._check_fork()
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create_driver()
+            try:
+                driver.current_url # 確認 Chrome 仍然存活
+                return driver
+            except Exception:
+                self._quit(driver)
+
+    def release(self, driver):
+        """歸還 driver；損壞、使用次數過多或池已滿時直接關閉"""
+        self._check_fork()
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+
+        if uses >= self.max_uses or self._idle.qsize() >= self.size:
+            self._quit(driver)
+            return
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.delete_all_cookies()
+            driver.get("about:blank")
+        except Exception:
+            self._quit(driver)
+            return
+        self._idle.put(driver)
+
+    def discard(self, driver):
+        """直接關閉 driver，不放回池中 (例如爬取被中止時)"""
+        self._quit(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def warm(self, count: int = None):
+        """預先啟動 Chrome 放入池中"""
+        self._check_fork()
+        count = self.size if count is None else min(count, self.size)
+        drivers = []
+        try:
+            for _ in range(max(0, count - self._idle.qsize())):
+                drivers.append(self._create_driver())
+        finally:
+            for driver in drivers:
+                self._idle.put(driver)
+        self.warmed = True
+
+    def shutdown(self):
+        """關閉池中所有閒置的 Chrome"""
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def status(self) -> dict:
+        self._check_fork()
+        return {"size": self.size, "idle": self._idle.qsize(), "warm": self.warmed}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """取得 (必要時建立) 目前行程的 driver 池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DriverPool(
+                    size=app_config.get_option('SCRAPER', 'DRIVER_POOL_SIZE', fallback=DEFAULT_POOL_SIZE, cast=int),
+                    max_uses=app_config.get_option('SCRAPER', 'DRIVER_MAX_USES', fallback=DEFAULT_MAX_USES, cast=int),
+                )
+                atexit.register(_pool.shutdown) # 行程結束時關閉閒置的 Chrome
+    return _pool
+
+
+def warm_pool(count: int = None):
+    """預熱 driver 池，數量預設取自 [SCRAPER] WARM_DRIVERS"""
+    if count is None:
+        count = app_config.get_option('SCRAPER', 'WARM_DRIVERS', fallback=DEFAULT_WARM_DRIVERS, cast=int)
+    get_driver_pool().warm(count)
+
+
+def pool_status() -> dict:
+    """driver 池狀態，供 readiness 檢查使用"""
+    if _pool is None:
+        return {"size": 0, "idle": 0, "warm": False}
+    return _pool.status()
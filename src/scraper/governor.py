@@ -0,0 +1,282 @@
+# src/scraper/governor.py
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from src import config as app_config
+from src.filelock import file_lock
+
+DEFAULT_RATE_PER_MINUTE = 12
+DEFAULT_BURST = 3
+DEFAULT_TOKEN_WAIT = 10.0 # 秒，等不到令牌就略過該平台
+DEFAULT_BREAKER_WINDOW = 10
+DEFAULT_BREAKER_MIN_CALLS = 4
+DEFAULT_BREAKER_FAILURE_RATE = 0.5
+DEFAULT_BREAKER_COOLDOWN = 300 # 秒
+# 各平台的令牌與斷路器狀態檔，同一台主機的 worker 共用 (速率限制與斷路器是整台主機的，不是每個 worker 各自的)
+DEFAULT_STATE_DIR = os.path.join(app_config.project_root_dir, '.cache', 'governor')
+
+
+class PlatformUnavailable(RuntimeError):
+    """平台目前被斷路器停用或超過請求速率，本次不爬取"""
+
+
+class _MemoryState:
+    """只在目前行程中的狀態 (單獨使用 TokenBucket / CircuitBreaker 時的預設)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def update(self):
+        with self._lock:
+            yield self._data
+
+
+class _FileState:
+    """
+    存在 JSON 檔中的狀態，讀取 -> 修改 -> 寫回都在檔案鎖內進行，
+    同一台主機的所有 gunicorn worker 共用同一份令牌與斷路器狀態。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock() # 沒有 fcntl 時 file_lock 不加鎖，至少保護同一行程的執行緒
+
+    @contextlib.contextmanager
+    def update(self):
+        with self._lock, file_lock(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = {}
+            yield data
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+
+class TokenBucket:
+    """令牌桶：平均每分鐘 rate_per_minute 次，最多累積 burst 次的突發量"""
+
+    def __init__(self, rate_per_minute: float, burst: int, state=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._state = state or _MemoryState()
+
+    def _bucket(self, data: dict, now: float) -> dict:
+        """取出令牌桶的狀態並依經過的時間補充令牌"""
+        bucket = data.setdefault('bucket', {'tokens': float(self.capacity), 'updated': now})
+        elapsed = max(0.0, now - bucket['updated'])
+        bucket['tokens'] = min(self.capacity, bucket['tokens'] + elapsed * self.rate)
+        bucket['updated'] = now
+        return bucket
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """取得一個令牌；最多等待 timeout 秒，取不到時返回 False"""
+        deadline = time.time() + timeout
+        while True:
+            with self._state.update() as data:
+                now = time.time()
+                bucket = self._bucket(data, now)
+                if bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    return True
+                wait = (1 - bucket['tokens']) / self.rate if self.rate > 0 else float('inf')
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def available(self) -> float:
+        with self._state.update() as data:
+            return self._bucket(data, time.time())['tokens']
+
+
+class CircuitBreaker:
+    """
+    依最近 window 次爬取的失敗率決定是否停用平台。
+    - closed：正常爬取；至少 min_calls 次且失敗率達 failure_rate 時轉為 open
+    - open：cooldown 秒內直接略過該平台
+    - half_open：冷卻結束後只放行一次試探，成功則恢復 closed，失敗則重新 open
+      (試探的 worker 超過 cooldown 秒都沒有回報時，視為已結束，重新放行試探)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int, min_calls: int, failure_rate: float, cooldown: float, state=None):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._state = state or _MemoryState()
+
+    def _breaker(self, data: dict) -> dict:
+        """取出斷路器的狀態並處理冷卻結束 / 試探逾時"""
+        breaker = data.setdefault('breaker', {'state': self.CLOSED, 'outcomes': [], 'opened_at': None, 'probe_started': None})
+        now = time.time()
+        if breaker['state'] == self.OPEN and now - breaker['opened_at'] >= self.cooldown:
+            breaker['state'] = self.HALF_OPEN
+            breaker['probe_started'] = None
+        elif (breaker['state'] == self.HALF_OPEN and breaker['probe_started'] is not None
+              and now - breaker['probe_started'] >= self.cooldown):
+            breaker['probe_started'] = None
+        return breaker
+
+    @property
+    def state(self) -> str:
+        with self._state.update() as data:
+            return self._breaker(data)['state']
+
+    def allow(self) -> bool:
+        """是否允許本次爬取 (half_open 時只允許一個試探請求)"""
+        with self._state.update() as data:
+            breaker = self._breaker(data)
+            if breaker['state'] == self.CLOSED:
+                return True
+            if breaker['state'] == self.HALF_OPEN and breaker['probe_started'] is None:
+                breaker['probe_started'] = time.time()
+                return True
+            return False
+
+    def cancel_probe(self):
+        """
+        放行的爬取沒有結果就結束 (被中止、客戶端斷線) 時呼叫：釋放 half_open 的試探名額，
+        讓下一個請求可以重新試探，而不是永遠停在 half_open。
+        """
+        with self._state.update() as data:
+            breaker = self._breaker(data)
+            if breaker['state'] == self.HALF_OPEN:
+                breaker['probe_started'] = None
+
+    def record(self, success: bool):
+        """記錄一次爬取結果"""
+        with self._state.update() as data:
+            breaker = self._breaker(data)
+            if breaker['state'] == self.HALF_OPEN:
+                if success:
+                    breaker.update(state=self.CLOSED, outcomes=[], probe_started=None)
+                else:
+                    self._open(breaker)
+                return
+
+            outcomes = (breaker['outcomes'] + [success])[-self.window:]
+            breaker['outcomes'] = outcomes
+            failures = outcomes.count(False)
+            if (breaker['state'] == self.CLOSED and len(outcomes) >= self.min_calls
+                    and failures / len(outcomes) >= self.failure_rate):
+                self._open(breaker)
+
+    @staticmethod
+    def _open(breaker: dict):
+        breaker.update(state=CircuitBreaker.OPEN, opened_at=time.time(), probe_started=None)
+
+    def status(self) -> dict:
+        with self._state.update() as data:
+            breaker = self._breaker(data)
+            outcomes = breaker['outcomes']
+            retry_in = None
+            if breaker['state'] == self.OPEN:
+                retry_in = max(0.0, round(self.cooldown - (time.time() - breaker['opened_at']), 1))
+            return {
+                "state": breaker['state'],
+                "recent_calls": len(outcomes),
+                "recent_failures": outcomes.count(False),
+                "retry_in_seconds": retry_in,
+            }
+
+
+class PlatformGovernor:
+    """單一平台的請求速率與斷路器"""
+
+    def __init__(self, platform: str, bucket: TokenBucket, breaker: CircuitBreaker, token_wait: float = DEFAULT_TOKEN_WAIT):
+        self.platform = platform
+        self.bucket = bucket
+        self.breaker = breaker
+        self.token_wait = token_wait
+        self.skipped = 0 # 目前 worker 略過的次數
+
+    def admit(self):
+        """
+        爬取前呼叫：斷路器 open 或等不到令牌時拋出 PlatformUnavailable。
+        會阻塞最多 token_wait 秒，應在爬蟲執行緒中呼叫。
+        """
+        if self.breaker.state == CircuitBreaker.OPEN:
+            self.skipped += 1
+            raise PlatformUnavailable(f"{self.platform} circuit breaker is open")
+        if not self.bucket.acquire(self.token_wait):
+            self.skipped += 1
+            raise PlatformUnavailable(f"{self.platform} rate limit exceeded")
+        # 取得令牌後才佔用 half_open 的試探名額，避免等待期間卡住試探
+        if not self.breaker.allow():
+            self.skipped += 1
+            raise PlatformUnavailable(f"{self.platform} circuit breaker is half-open, probe in progress")
+
+    def record(self, success: bool):
+        self.breaker.record(success)
+
+    def cancel(self):
+        """admit 之後的爬取被中止、沒有結果可以記錄"""
+        self.breaker.cancel_probe()
+
+    def status(self) -> dict:
+        status = self.breaker.status()
+        status["tokens_available"] = round(self.bucket.available(), 2)
+        status["skipped"] = self.skipped
+        return status
+
+
+_governors = {}
+_governors_pid = None
+_governors_lock = threading.Lock()
+
+
+def _platform_option(platform: str, key: str, fallback, cast):
+    """優先使用 [SCRAPER_<平台>] 區段，其次是 [SCRAPER] 區段"""
+    return app_config.get_option(f"SCRAPER_{platform}", key, cast=cast,
+                                 fallback=app_config.get_option('SCRAPER', key, fallback=fallback, cast=cast))
+
+
+def get_governor(platform: str) -> PlatformGovernor:
+    """取得 (必要時建立) 目前行程中指定平台的管制器；狀態存在 [SCRAPER] GOVERNOR_STATE_DIR 中，所有 worker 共用"""
+    global _governors_pid
+    with _governors_lock:
+        if _governors_pid != os.getpid(): # fork 後的子行程重新計數
+            _governors.clear()
+            _governors_pid = os.getpid()
+        governor = _governors.get(platform)
+        if governor is None:
+            state_dir = app_config.get_option('SCRAPER', 'GOVERNOR_STATE_DIR', fallback=DEFAULT_STATE_DIR)
+            state = _FileState(os.path.join(state_dir, f"{platform}.json"))
+            governor = PlatformGovernor(
+                platform,
+                TokenBucket(_platform_option(platform, 'RATE_PER_MINUTE', DEFAULT_RATE_PER_MINUTE, float),
+                            _platform_option(platform, 'RATE_BURST', DEFAULT_BURST, int), state=state),
+                CircuitBreaker(_platform_option(platform, 'BREAKER_WINDOW', DEFAULT_BREAKER_WINDOW, int),
+                               _platform_option(platform, 'BREAKER_MIN_CALLS', DEFAULT_BREAKER_MIN_CALLS, int),
+                               _platform_option(platform, 'BREAKER_FAILURE_RATE', DEFAULT_BREAKER_FAILURE_RATE, float),
+                               _platform_option(platform, 'BREAKER_COOLDOWN', DEFAULT_BREAKER_COOLDOWN, float), state=state),
+                token_wait=_platform_option(platform, 'RATE_WAIT', DEFAULT_TOKEN_WAIT, float),
+            )
+            _governors[platform] = governor
+        return governor
+
+
+def governor_status() -> dict:
+    """各平台管制器的狀態 (供監控使用)；包含其他 worker 已建立狀態檔的平台"""
+    state_dir = app_config.get_option('SCRAPER', 'GOVERNOR_STATE_DIR', fallback=DEFAULT_STATE_DIR)
+    try:
+        platforms = {name[:-len('.json')] for name in os.listdir(state_dir) if name.endswith('.json')}
+    except FileNotFoundError:
+        platforms = set()
+    with _governors_lock:
+        if _governors_pid == os.getpid():
+            platforms.update(_governors)
+    return {platform: get_governor(platform).status() for platform in sorted(platforms)}
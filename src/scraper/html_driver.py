@@ -0,0 +1,69 @@
+# src/scraper/html_driver.py
+
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+# Selenium 會把這些屬性解析成絕對網址，離線版本也照做
+_URL_ATTRIBUTES = ('href', 'src')
+
+# 可以改寫成 CSS selector 的定位方式 (XPath、連結文字等不支援)
+_CSS_LOCATORS = {
+    By.CSS_SELECTOR: lambda value: value,
+    By.ID: lambda value: f'[id="{value}"]',
+    By.NAME: lambda value: f'[name="{value}"]',
+    By.CLASS_NAME: lambda value: f'.{value}',
+    By.TAG_NAME: lambda value: value,
+}
+
+
+def _css_selector(by, value: str) -> str:
+    """將 Selenium 的定位方式轉為 CSS selector；無法轉換時拋出 ValueError"""
+    try:
+        return _CSS_LOCATORS[by](value)
+    except KeyError:
+        raise ValueError(f"HtmlSnapshotDriver does not support locator strategy {by!r}; "
+                         f"use one of: {', '.join(_CSS_LOCATORS)}") from None
+
+
+class HtmlElement:
+    """以 BeautifulSoup 節點模擬 Selenium WebElement 中爬蟲用到的介面"""
+
+    def __init__(self, node, base_url: str):
+        self._node = node
+        self._base_url = base_url
+
+    @property
+    def text(self) -> str:
+        return ' '.join(self._node.get_text().split())
+
+    def get_attribute(self, name: str):
+        value = self._node.get(name)
+        if isinstance(value, list): # class 等多值屬性
+            value = ' '.join(value)
+        if value is not None and name in _URL_ATTRIBUTES:
+            value = urljoin(self._base_url, value)
+        return value
+
+    def find_elements(self, by=By.CSS_SELECTOR, value: str = None) -> list:
+        return [HtmlElement(node, self._base_url) for node in self._node.select(_css_selector(by, value))]
+
+    def find_element(self, by=By.CSS_SELECTOR, value: str = None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"Unable to locate element: {value}")
+        return elements[0]
+
+
+class HtmlSnapshotDriver(HtmlElement):
+    """
+    以儲存的頁面 HTML 模擬 Selenium WebDriver，不需要瀏覽器。
+    爬蟲的 _parse 方法可以直接在快照上執行 (搭配 parse_wait_timeout = 0)。
+    """
+
+    def __init__(self, html: str, url: str = ''):
+        super().__init__(BeautifulSoup(html, 'html.parser'), url)
+        self.current_url = url
+        self.page_source = html
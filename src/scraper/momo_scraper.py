@@ -1,16 +1,33 @@
 import os, json
 from time import sleep
+from typing import Iterator
+from urllib.parse import quote
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+from src.logger import get_logger
+from src.models import ProductRecord
 from .base_scraper import BaseScraper # 導入 BaseScraper
 
+log = get_logger(__name__)
+
 class MomoScraper(BaseScraper):
+    platform_name = "momo" # 平台名稱 (也是寫入價格時的 platform 值)，不需要建立實例即可取得
+
+    # momo 搜尋頁透過搜尋雲 API 載入商品列表
+    capture_url_patterns = (
+        r'apisearch\.momoshop\.com\.tw/.*[Ss]earch',
+        r'momoshop\.com\.tw/ajax/.*[Ss]earch',
+    )
+
+    # 查無商品時的提示文字
+    empty_result_texts = ('查無相關商品', '找不到符合', '沒有符合')
+
     def __init__(self):
-        super().__init__("momo") # 調用父類別的初始化方法，設定平台名稱
+        super().__init__(self.platform_name) # 調用父類別的初始化方法，設定平台名稱
         # self.driver = None # 驅動器在父類別中初始化
         # self.folderPath = 'momo_product' # 儲存到 json 可改為在 api 端處理
         # if not os.path.exists(self.folderPath):
@@ -36,9 +53,11 @@ class MomoScraper(BaseScraper):
             ).click()
             sleep(2) # 等待搜尋結果頁面載入
         except TimeoutException:
-            print("momo 搜尋框或提交按鈕等候逾時")
+            log.warning("momo 搜尋框或提交按鈕等候逾時")
+            self.failures += 1 # 計入平台失敗 (可能被限流或出現驗證頁)
         except NoSuchElementException:
-            print("momo 搜尋框或提交按鈕未找到")
+            log.warning("momo 搜尋框或提交按鈕未找到")
+            self.failures += 1
 
 
     def _filter_popular(self):
@@ -57,9 +76,9 @@ class MomoScraper(BaseScraper):
             ).click()
             sleep(2) # 等待篩選結果載入
         except TimeoutException:
-            print("momo 熱銷篩選按鈕等候逾時")
+            log.warning("momo 熱銷篩選按鈕等候逾時")
         except NoSuchElementException:
-            print("momo 熱銷篩選按鈕未找到")
+            log.warning("momo 熱銷篩選按鈕未找到")
 
     def _scroll(self, limit: int = 3):
         """滾動頁面載入更多內容"""
@@ -85,14 +104,12 @@ class MomoScraper(BaseScraper):
             else: # 如果有新內容載入，重置計數
                 count = 0
 
-    def _parse(self) -> list[dict]:
-        """解析頁面並提取商品資訊"""
-        products = []
+    def _parse(self) -> Iterator[ProductRecord]:
+        """解析頁面並逐筆產出商品資訊"""
         try:
-            # 確保商品元素已經載入
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.goodsUrl"))
-            )
+            # 確保商品元素已經載入；查無商品的頁面直接結束 (不計入平台失敗)
+            if not self._wait_for_results("div.goodsUrl"):
+                return
             elements = self.driver.find_elements(
                 By.CSS_SELECTOR,
                 "div.goodsUrl"
@@ -120,38 +137,70 @@ class MomoScraper(BaseScraper):
                     ).text.replace(',', '') # 移除價格中的逗號以便轉換為數字
                     price = float(price_element) # 轉換為浮點數
 
-                    products.append({
-                        "name": a_title,
-                        "price": price,
-                        "url": link,
-                        "image": img_src,
-                        "platform": self.platform_name,
-                        "is_available": True # 預設有庫存，如果momo有明確的缺貨標示，需要額外判斷
-                    })
+                    yield ProductRecord(
+                        name=a_title,
+                        price=price,
+                        url=link,
+                        image=img_src,
+                        platform=self.platform_name,
+                        is_available=True # 預設有庫存，如果momo有明確的缺貨標示，需要額外判斷
+                    )
                 except NoSuchElementException as e:
-                    print(f"解析 momo 單一商品時部分元素未找到: {e}")
+                    log.warning(f"解析 momo 單一商品時部分元素未找到: {e}")
                     continue # 跳過當前商品，繼續解析下一個
                 except ValueError as e:
-                    print(f"解析 momo 價格時出錯: {e}")
+                    log.error(f"解析 momo 價格時出錯: {e}")
                     continue
         except TimeoutException:
-            print("momo 商品列表載入逾時，可能沒有結果。")
+            log.warning("momo 商品列表載入逾時，可能沒有結果。")
+            self.failures += 1
         except Exception as e:
-            print(f"momo 解析時發生未知錯誤: {e}")
-        return products
+            log.error(f"momo 解析時發生未知錯誤: {e}")
+
+    def _page_url(self, keyword: str, page: int, base_url: str = None) -> str:
+        """第 page 頁搜尋結果的網址 (沿用第一頁網址中的排序參數)"""
+        if base_url and '/search/searchShop.jsp' in base_url: # 第一頁停在搜尋結果頁 (而不是驗證頁之類)
+            return self._with_query(base_url, curPage=page)
+        return f"https://www.momoshop.com.tw/search/searchShop.jsp?keyword={quote(keyword)}&searchType=1&curPage={page}"
+
+    def _parse_captured(self, payloads: list) -> Iterator[ProductRecord]:
+        """解析 momo 搜尋 API 回應 (rtnSearchData.goodsInfoList)"""
+        for payload in payloads:
+            for item in self._find_item_lists(payload, ('goodsCode', 'goodsName')):
+                goods_code = self._first_value(item, 'goodsCode', 'GOODS_CODE')
+                name = self._first_value(item, 'goodsName', 'GOODS_NAME')
+                price = self._to_price(self._first_value(item, 'SALE_PRICE', 'goodsPrice', 'salePrice'))
+                if not goods_code or not name or price is None:
+                    continue
+                sold_out = self._first_value(item, 'isSoldOut', 'soldOut', 'goodsStockStatus')
+                yield ProductRecord(
+                    name=name,
+                    price=price,
+                    url=f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={goods_code}",
+                    image=self._first_value(item, 'imgUrl', 'imgBigUrl', 'goodsImgUrl') or "",
+                    platform=self.platform_name,
+                    is_available=sold_out not in (True, 1, '1', 'Y', 'true')
+                )
 
-    def search_product(self, keyword: str) -> list[dict]:
+    def iter_products(self, keyword: str) -> Iterator[ProductRecord]:
         """
-        從 momo 搜尋商品並返回標準化結果。
-        這是供外部調用的主要方法。
+        從 momo 搜尋商品並逐筆產出標準化結果。
+        這是供外部調用的主要方法 (search_product 為其列表版本)。
         """
-        self._visit()
-        self._search_input(keyword)
-        self._filter_popular() # 可選，根據需求決定是否每次都篩選
-        self._scroll() # 滾動頁面載入更多
-        results = self._parse()
+        with self._phase('visit'):
+            self._visit()
+            self._enable_network_capture() # 擷取搜尋 API 回應
+        with self._phase('search'):
+            self._search_input(keyword)
+            self._filter_popular() # 可選，根據需求決定是否每次都篩選
+        first_page = self._parse_network()
+        if not first_page: # 沒有擷取到 API 回應時，退回捲動 + DOM 解析
+            with self._phase('scroll'):
+                self._scroll() # 滾動頁面載入更多
+            first_page = self._timed_parse()
+        self._save_snapshot(keyword, payloads=self.captured_payloads) # 依設定保存搜尋頁 (與解析所用的 API 回應)
+        yield from self._collect_pages(keyword, first_page) # 依設定在多個分頁中同時載入後續頁面
         self.close_driver() # 完成後關閉 driver
-        return results
 
 # --- 測試區塊 ---
 if __name__ == '__main__':
@@ -163,12 +212,12 @@ if __name__ == '__main__':
         print(f"\n從 {scraper.platform_name} 找到 {len(results)} 項 '{search_keyword}' 的結果:")
         for i, item in enumerate(results[:5]): # 只印前5個
             print(f"--- 商品 {i+1} ---")
-            print(f"名稱: {item['name']}")
-            print(f"價格: {item['price']}")
-            print(f"連結: {item['url']}")
-            print(f"圖片: {item['image']}")
-            print(f"平台: {item['platform']}")
-            print(f"是否有庫存: {item['is_available']}")
+            print(f"名稱: {item.name}")
+            print(f"價格: {item.price}")
+            print(f"連結: {item.url}")
+            print(f"圖片: {item.image}")
+            print(f"平台: {item.platform}")
+            print(f"是否有庫存: {item.is_available}")
             print("-" * 20)
     else:
         print(f"\n在 {scraper.platform_name} 未找到 '{search_keyword}' 的結果。")
\ No newline at end of file
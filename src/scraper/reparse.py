@@ -0,0 +1,112 @@
+# src/scraper/reparse.py
+"""
+離線重新解析頁面快照，不需要瀏覽器。
+
+用法 (在專案根目錄執行)：
+    python -m src.scraper.reparse --platform momo --keyword 耳機 --since 2026-10-01 --workers 4
+    python -m src.scraper.reparse --dry-run     # 只解析並顯示統計，不寫入資料庫
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .snapshot_store import SnapshotStore, get_snapshot_store
+
+
+def _scraper_classes() -> dict:
+    """平台名稱 -> 爬蟲類別"""
+    from .momo_scraper import MomoScraper
+    from .pchome_scraper import PChomeScraper
+    from .coupang_scraper import CoupangScraper
+    return {scraper_class.platform_name: scraper_class for scraper_class in (MomoScraper, PChomeScraper, CoupangScraper)}
+
+
+def reparse_entry(store_root: str, entry: dict) -> list:
+    """
+    以對應平台的解析方法解析一份快照 (在子行程中執行)：
+    有保存 API 回應時以 _parse_captured 解析 (與當時爬取的結果相同)，否則以 _parse 解析 HTML。
+    """
+    scraper_class = _scraper_classes().get(entry['platform'])
+    if scraper_class is None:
+        return []
+
+    scraper = scraper_class()
+    store = SnapshotStore(store_root)
+    observed_at = datetime.fromtimestamp(entry['timestamp'])
+    unique = {}
+    for product in scraper._parse_captured(store.load_payloads(entry) or []):
+        unique.setdefault(product.url, product) # 與 _parse_network 相同，依商品網址去除重複
+    products = list(unique.values())
+    if not products:
+        scraper.parse_wait_timeout = 0 # 快照內容是靜態的，不需要等待元素出現
+        scraper.driver = store.open_driver(entry)
+        products = list(scraper._parse())
+    for product in products:
+        product.observed_at = observed_at
+    return products
+
+
+def reparse(store: SnapshotStore, platform: str = None, keyword: str = None, since: float = None,
+            until: float = None, workers: int = None, batch_size: int = 500, dry_run: bool = False) -> dict:
+    """以行程池解析符合條件的快照，並分批寫入資料庫；返回統計資訊"""
+    entries = list(store.iter_entries(platform=platform, keyword=keyword, since=since, until=until))
+    stats = {"snapshots": len(entries), "products": 0, "empty_snapshots": 0}
+    if not entries:
+        return stats
+
+    if not dry_run:
+        from src.database import db_connector
+
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for entry, products in zip(entries, executor.map(reparse_entry, [store.root] * len(entries), entries, chunksize=4)):
+            if not products:
+                stats["empty_snapshots"] += 1
+                print(f"快照 {entry['digest'][:12]} ({entry['platform']} / {entry['keyword']}) 沒有解析出商品")
+                continue
+            stats["products"] += len(products)
+            if dry_run:
+                continue
+            batch.extend(products)
+            if len(batch) >= batch_size:
+                db_connector.save_product_data(batch)
+                batch = []
+
+    if batch and not dry_run:
+        db_connector.save_product_data(batch)
+    return stats
+
+
+def _parse_date(value: str) -> float:
+    return datetime.strptime(value, '%Y-%m-%d').timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="離線重新解析儲存的搜尋頁快照並寫入資料庫")
+    parser.add_argument('--store', help="快照目錄 (預設取自 config.ini 的 [SNAPSHOTS] PATH)")
+    parser.add_argument('--platform', help="只處理指定平台 (momo / PChome / coupang)")
+    parser.add_argument('--keyword', help="只處理指定關鍵字")
+    parser.add_argument('--since', type=_parse_date, help="起始日期 YYYY-MM-DD (含)")
+    parser.add_argument('--until', type=_parse_date, help="結束日期 YYYY-MM-DD (不含)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="解析行程數")
+    parser.add_argument('--batch-size', type=int, default=500, help="每次寫入資料庫的筆數")
+    parser.add_argument('--dry-run', action='store_true', help="只解析，不寫入資料庫")
+    args = parser.parse_args(argv)
+
+    if args.store:
+        store = SnapshotStore(args.store)
+    else:
+        store = get_snapshot_store() or SnapshotStore()
+
+    stats = reparse(store, platform=args.platform, keyword=args.keyword, since=args.since, until=args.until,
+                    workers=args.workers, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"處理 {stats['snapshots']} 份快照，解析出 {stats['products']} 筆商品，"
+          f"{stats['empty_snapshots']} 份快照沒有結果。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# src/scraper/snapshot_store.py
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from src import config as app_config
+from src.filelock import file_lock
+from src.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(app_config.project_root_dir, 'snapshots')
+DEFAULT_MAX_MB = 512
+
+
+class SnapshotStore:
+    """
+    搜尋結果頁面快照的磁碟儲存。
+
+    - 頁面 HTML 以內容雜湊 (sha256) 定址，gzip 壓縮後存放在 objects/<前兩碼>/<雜湊>.html.gz，
+      相同內容只會存一份；解析所用的 API 回應 (JSON) 同樣存放為 <雜湊>.json.gz
+    - index.jsonl 每行記錄一次擷取：平台、關鍵字、時間戳記、網址與雜湊 (有 API 回應時另有 payloads 雜湊)
+    - 物件總大小超過 max_bytes 時，依最後一次被引用的時間淘汰最舊的快照
+    - 多個 worker 共用同一個目錄：附加索引與淘汰都在 index.jsonl 的檔案鎖內進行，
+      總大小也在鎖內重新統計 (其他 worker 寫入的物件同樣計入)
+    """
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest: str, kind: str = 'html') -> str:
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.{kind}.gz")
+
+    def _write_object(self, digest: str, kind: str, data: bytes):
+        """寫入一個內容定址的物件 (已存在時不重複寫入；呼叫端須持有檔案鎖)"""
+        path = self._object_path(digest, kind)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, platform: str, keyword: str, html: str, url: str = '', timestamp: float = None,
+             payloads: list = None) -> dict:
+        """儲存一份頁面快照 (與解析所用的 API 回應 payloads) 並返回其索引紀錄"""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        entry = {
+            "digest": digest,
+            "platform": platform,
+            "keyword": keyword,
+            "url": url,
+            "timestamp": timestamp if timestamp is not None else time.time(),
+        }
+        payload_data = None
+        if payloads:
+            payload_data = json.dumps(payloads, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            entry["payloads"] = hashlib.sha256(payload_data).hexdigest()
+
+        with self._lock, file_lock(self.index_path):
+            self._write_object(digest, 'html', data)
+            if payload_data is not None:
+                self._write_object(entry["payloads"], 'json', payload_data)
+
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+            total_bytes = self._current_size()
+            if total_bytes > self.max_bytes:
+                self._evict(total_bytes)
+        return entry
+
+    def iter_entries(self, platform: str = None, keyword: str = None, since: float = None, until: float = None):
+        """依條件列出索引紀錄 (依寫入順序)"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if platform and entry['platform'] != platform:
+                    continue
+                if keyword and entry['keyword'] != keyword:
+                    continue
+                if since is not None and entry['timestamp'] < since:
+                    continue
+                if until is not None and entry['timestamp'] >= until:
+                    continue
+                yield entry
+
+    def load(self, digest: str) -> str:
+        """讀取快照 HTML"""
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def load_payloads(self, entry: dict):
+        """讀取快照保存的 API 回應；沒有保存 (或已被淘汰) 時返回 None"""
+        if not entry.get('payloads'):
+            return None
+        try:
+            with gzip.open(self._object_path(entry['payloads'], 'json'), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except FileNotFoundError:
+            return None
+
+    def open_driver(self, entry: dict):
+        """以快照建立可供爬蟲 _parse 使用的離線 driver (也可作為測試 fixture)"""
+        from .html_driver import HtmlSnapshotDriver
+        return HtmlSnapshotDriver(self.load(entry['digest']), entry.get('url', ''))
+
+    def _current_size(self) -> int:
+        """所有物件的總大小 (呼叫端須持有檔案鎖)"""
+        total = 0
+        objects_dir = os.path.join(self.root, 'objects')
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError: # 其他 worker 的暫存檔已被改名
+                    pass
+        return total
+
+    def _evict(self, total_bytes: int):
+        """淘汰最久未被引用的快照，直到總大小降到 max_bytes 的 90% 以下 (呼叫端須持有檔案鎖)"""
+        last_seen = {} # (雜湊, 種類) -> 最後一次被引用的時間
+        entries = list(self.iter_entries())
+        for entry in entries:
+            for key in ((entry['digest'], 'html'), (entry.get('payloads'), 'json')):
+                if key[0]:
+                    last_seen[key] = max(entry['timestamp'], last_seen.get(key, 0))
+
+        target = int(self.max_bytes * 0.9)
+        evicted = set()
+        for key in sorted(last_seen, key=last_seen.get):
+            if total_bytes <= target:
+                break
+            path = self._object_path(*key)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                total_bytes -= size
+            except OSError:
+                pass
+            evicted.add(key)
+
+        if evicted:
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    if (entry['digest'], 'html') not in evicted:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.index_path)
+            log.info(f"快照儲存空間超過上限，已淘汰 {len(evicted)} 份快照。")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """
+    取得設定中啟用的快照儲存 ([SNAPSHOTS] ENABLED=true)；未啟用時返回 None。
+    """
+    global _store
+    if not app_config.get_option('SNAPSHOTS', 'ENABLED', fallback=False, cast=bool):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore(
+                    root=app_config.get_option('SNAPSHOTS', 'PATH', fallback=DEFAULT_SNAPSHOT_DIR),
+                    max_bytes=app_config.get_option('SNAPSHOTS', 'MAX_MB', fallback=DEFAULT_MAX_MB, cast=int) * 1024 * 1024,
+                )
+    return _store
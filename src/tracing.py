@@ -0,0 +1,497 @@
+# src/tracing.py
+"""
+輕量的請求追蹤。
+
+每個請求是一個 trace (以請求 ID 識別)，其中包含巢狀的 span：資料庫查詢、爬蟲各階段 (取得 Chrome、
+搜尋、捲動、解析、儲存快照...)、序列化等。目前的 span 存在 contextvars 中；交給其他執行緒
+(例如爬蟲執行緒池) 的工作以 attach(parent) 接續同一個 trace。
+
+trace 依 SAMPLE_RATE 取樣，耗時超過 SLOW_MS 的 trace 一律保留，由背景執行緒寫入 JSONL 檔，不阻塞請求。
+
+檢視最慢的 trace 瀑布圖與各階段耗時統計 (在專案根目錄執行)：
+    python -m src.tracing --slowest 5 --name "GET /search"
+    python -m src.tracing --trace 3f2a9c0d12ab4e56
+"""
+
+import argparse
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from src import config as app_config
+from src.filelock import file_lock
+
+DEFAULT_TRACE_FILE = os.path.join(app_config.project_root_dir, 'traces', 'traces.jsonl')
+DEFAULT_SAMPLE_RATE = 0.05
+DEFAULT_SLOW_MS = 3000 # 超過此耗時的 trace 不論取樣結果都寫入
+DEFAULT_MAX_MB = 64 # 檔案超過此大小時輪替為 traces.jsonl.1
+DEFAULT_QUEUE_SIZE = 1000
+MAX_SPANS = 1000 # 單一 trace 最多記錄的 span 數
+
+_current = contextvars.ContextVar('trace_span', default=None)
+
+
+class Span:
+    """trace 中的一段工作；start / end 為 time.perf_counter() 的值"""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'end', 'thread', 'attrs')
+
+    def __init__(self, trace, name: str, parent_id: int = None, attrs: dict = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = next(trace.span_ids)
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.thread = threading.current_thread().name
+        self.attrs = attrs or {}
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+            self.trace.add(self)
+
+    def to_dict(self) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        record = {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.origin) * 1000, 2),
+            "duration_ms": round((end - self.start) * 1000, 2),
+            "thread": self.thread,
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        return record
+
+
+class _NullSpan:
+    """沒有進行中的 trace 時使用，所有操作都不做事"""
+
+    trace = None
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, name: str, trace_id: str = None, sampled: bool = True, max_spans: int = MAX_SPANS):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.sampled = sampled
+        self.max_spans = max_spans
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.span_ids = itertools.count(1)
+        self.spans = [] # 已結束的 span
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.root = Span(self, name)
+
+    def add(self, span: Span):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return (end - self.origin) * 1000
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": round(self.duration_ms, 2),
+            "attrs": self.root.attrs,
+            "spans": [span.to_dict() for span in spans],
+            "dropped_spans": self.dropped,
+        }
+
+
+# --- 建立 span ---
+
+def current_span():
+    """目前執行緒 / context 中進行中的 span (沒有時為 None)"""
+    return _current.get()
+
+
+def current_trace_id():
+    span = _current.get()
+    return span.trace.trace_id if span is not None else None
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """在目前的 trace 中建立子 span；沒有進行中的 trace 時不做事"""
+    parent = _current.get()
+    if parent is None:
+        yield _NULL_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.attrs['error'] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        child.finish()
+
+
+def traced(name: str = None):
+    """將函數的每次呼叫記錄為一個 span 的 decorator (預設以函數名稱命名)"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(name: str, iterable, **attrs):
+    """
+    逐筆轉交 iterable 的內容，並把「產生下一筆」所花的時間累計為一個 span (例如邊解析邊產出的 generator)。
+    消費端處理每筆資料的時間不計入；span 記錄筆數 (items)。
+    """
+    parent = _current.get()
+    if parent is None:
+        yield from iterable
+        return
+    child = Span(parent.trace, name, parent.span_id, attrs)
+    iterator = iter(iterable)
+    busy, count = 0.0, 0
+    try:
+        while True:
+            started = time.perf_counter()
+            token = _current.set(child)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                _current.reset(token)
+                busy += time.perf_counter() - started
+            count += 1
+            yield item
+    finally:
+        child.set(items=count, busy_ms=round(busy * 1000, 2))
+        child.finish()
+
+
+def annotate(**attrs):
+    """在目前 trace 的 root span 加上屬性 (例如搜尋結果的來源)"""
+    span = _current.get()
+    if span is not None:
+        span.trace.root.set(**attrs)
+
+
+@contextlib.contextmanager
+def attach(parent):
+    """在其他執行緒中接續 parent 所屬的 trace (parent 為 None 時不做事)"""
+    if parent is None or parent is _NULL_SPAN:
+        yield
+        return
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+# --- trace 的開始 / 結束 ---
+
+def begin_trace(name: str, trace_id: str = None, **attrs):
+    """
+    開始一個 trace 並設為目前的 span，返回 (root span, token)；結束時呼叫 end_trace(root, token)。
+    是否取樣在開始時決定，但較慢的 trace 在結束時仍會被保留。
+    """
+    writer = get_trace_writer()
+    trace = Trace(name, trace_id, sampled=writer.sample())
+    trace.root.attrs.update(attrs)
+    return trace.root, _current.set(trace.root)
+
+
+def end_trace(root: Span, token, **attrs):
+    root.set(**attrs)
+    try:
+        _current.reset(token)
+    except ValueError: # 在不同的 context 中結束 (例如串流回應)
+        _current.set(None)
+    root.finish()
+    get_trace_writer().submit(root.trace)
+
+
+@contextlib.contextmanager
+def trace(name: str, trace_id: str = None, **attrs):
+    """以 with 區塊包住一個 trace (例如命令列工具或背景工作)"""
+    root, token = begin_trace(name, trace_id, **attrs)
+    error = {}
+    try:
+        yield root
+    except Exception as e:
+        error['error'] = type(e).__name__
+        raise
+    finally:
+        end_trace(root, token, **error)
+
+
+# --- 寫入 JSONL ---
+
+class TraceWriter:
+    """
+    以背景執行緒把 trace 寫入 JSONL 檔。
+    submit 只把 trace 放入有界佇列 (已滿時丟棄)，序列化與磁碟 I/O 都在背景執行緒中進行。
+    多個 worker 共用同一個檔案：寫入與輪替都在檔案鎖內進行，
+    其他 worker 已輪替時先重新開啟，避免各自以舊的檔案大小判斷而重複輪替。
+    """
+
+    def __init__(self, path: str = DEFAULT_TRACE_FILE, sample_rate: float = DEFAULT_SAMPLE_RATE,
+                 slow_ms: float = DEFAULT_SLOW_MS, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 max_queue: int = DEFAULT_QUEUE_SIZE, enabled: bool = True):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def _ensure_started(self):
+        # fork 後的子行程需要自己的寫入執行緒
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, trace: Trace):
+        if not self.enabled or not (trace.sampled or trace.duration_ms >= self.slow_ms):
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _reopen_if_rotated(self, f):
+        """檔案已被 (其他 worker) 輪替或刪除時，關閉舊的檔案並開啟新的 (須在檔案鎖內呼叫)"""
+        if f is not None and not f.closed:
+            try:
+                if os.stat(self.path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _rotate(self, f):
+        f.close()
+        os.replace(self.path, self.path + '.1')
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _write(self, f, lines: list[str]):
+        """在檔案鎖內寫入一批 trace，超過 max_bytes 時輪替；返回目前的檔案"""
+        with file_lock(self.path):
+            f = self._reopen_if_rotated(f)
+            f.write(''.join(lines))
+            f.flush()
+            self.written += len(lines)
+            if os.fstat(f.fileno()).st_size > self.max_bytes:
+                f = self._rotate(f)
+        return f
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = None
+        try:
+            while True:
+                traces = [self._queue.get()]
+                while True: # 佇列中已有的 trace 一起寫入，每批只取一次檔案鎖
+                    try:
+                        traces.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                lines = []
+                for trace in traces:
+                    try:
+                        lines.append(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + '\n')
+                    except Exception as e:
+                        print(f"序列化 trace 失敗: {e}", file=sys.stderr)
+                try:
+                    f = self._write(f, lines)
+                except Exception as e:
+                    print(f"寫入 trace 失敗: {e}", file=sys.stderr)
+        finally:
+            if f is not None:
+                f.close()
+
+    def status(self) -> dict:
+        return {"enabled": self.enabled, "sample_rate": self.sample_rate, "slow_ms": self.slow_ms,
+                "written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_trace_writer() -> TraceWriter:
+    """取得以 config.ini [TRACING] 區段設定的 TraceWriter"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                option = app_config.get_option
+                _writer = TraceWriter(
+                    path=option('TRACING', 'FILE', fallback=DEFAULT_TRACE_FILE),
+                    sample_rate=option('TRACING', 'SAMPLE_RATE', fallback=DEFAULT_SAMPLE_RATE, cast=float),
+                    slow_ms=option('TRACING', 'SLOW_MS', fallback=DEFAULT_SLOW_MS, cast=float),
+                    max_bytes=option('TRACING', 'MAX_MB', fallback=DEFAULT_MAX_MB, cast=int) * 1024 * 1024,
+                    enabled=option('TRACING', 'ENABLED', fallback=True, cast=bool),
+                )
+    return _writer
+
+
+# --- 命令列：瀑布圖與各階段統計 ---
+
+BAR_WIDTH = 40
+
+
+def iter_traces(path: str, name: str = None):
+    """讀取 JSONL 檔中的 trace (包含已輪替的 .1 檔)，name 不為 None 時只取該名稱的 trace"""
+    for file_path in (path + '.1', path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if name is None or record.get('name') == name:
+                    yield record
+
+
+def format_waterfall(record: dict, width: int = BAR_WIDTH) -> str:
+    """將一個 trace 排成瀑布圖：每個 span 一行，顯示開始時間、耗時與時間軸上的位置"""
+    total = max(record['duration_ms'], 0.001)
+    started = datetime.fromtimestamp(record['started_at']).strftime('%Y-%m-%d %H:%M:%S')
+    attrs = ' '.join(f"{key}={value}" for key, value in record.get('attrs', {}).items())
+    lines = [f"{record['trace_id']}  {record['name']}  {record['duration_ms']:.1f} ms  {started}  {attrs}".rstrip(),
+             f"{'start':>10} {'duration':>10}  span"]
+
+    depth = {}
+    children = {}
+    for span in record['spans']:
+        children.setdefault(span['parent'], []).append(span)
+
+    def walk(parent_id, level):
+        for span in children.get(parent_id, []):
+            depth[span['id']] = level
+            offset = min(width - 1, int(span['start_ms'] / total * width))
+            length = max(1, min(width - offset, round(span['duration_ms'] / total * width)))
+            bar = ' ' * offset + '█' * length + ' ' * (width - offset - length)
+            label = '  ' * level + span['name']
+            extra = ' '.join(f"{key}={value}" for key, value in span.get('attrs', {}).items())
+            lines.append(f"{span['start_ms']:>10.1f} {span['duration_ms']:>10.1f}  |{bar}| {label} {extra}".rstrip())
+            walk(span['id'], level + 1)
+
+    walk(None, 0)
+    if record.get('dropped_spans'):
+        lines.append(f"({record['dropped_spans']} spans not recorded)")
+    return '\n'.join(lines)
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def stage_summary(records) -> str:
+    """各 span 名稱的次數、p50 / p95 / 最大耗時，以及佔所有 trace 總耗時的比例"""
+    durations = {}
+    total_ms = 0.0
+    for record in records:
+        total_ms += record['duration_ms']
+        for span in record['spans']:
+            if span['parent'] is None:
+                continue
+            durations.setdefault(span['name'], []).append(span['duration_ms'])
+    lines = [f"{'span':<44} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'share':>7}"]
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        values.sort()
+        share = sum(values) / total_ms * 100 if total_ms else 0
+        lines.append(f"{name:<44} {len(values):>7} {_percentile(values, 0.5):>10.1f} "
+                     f"{_percentile(values, 0.95):>10.1f} {values[-1]:>10.1f} {share:>6.1f}%")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="檢視請求 trace 的瀑布圖與各階段耗時")
+    parser.add_argument('--file', default=None, help="trace 檔案 (預設為 config.ini [TRACING] FILE)")
+    parser.add_argument('--name', help="只看此名稱的 trace，例如 'GET /search'")
+    parser.add_argument('--trace', help="只顯示此 trace ID (請求 ID)")
+    parser.add_argument('--slowest', type=int, default=5, help="顯示最慢的幾個 trace 的瀑布圖")
+    parser.add_argument('--no-summary', action='store_true', help="不顯示各階段統計")
+    args = parser.parse_args(argv)
+
+    path = args.file or app_config.get_option('TRACING', 'FILE', fallback=DEFAULT_TRACE_FILE)
+    records = list(iter_traces(path, args.name))
+    if args.trace:
+        records = [record for record in records if record['trace_id'] == args.trace]
+        if not records:
+            print(f"找不到 trace {args.trace}")
+            return 1
+        args.slowest, args.no_summary = len(records), True
+    if not records:
+        print(f"{path} 中沒有 trace")
+        return 0
+
+    for record in heapq.nlargest(args.slowest, records, key=lambda r: r['duration_ms']):
+        print(format_waterfall(record))
+        print()
+    if not args.no_summary:
+        print(f"{len(records)} traces")
+        print(stage_summary(records))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,11 @@ class PriceComparison {
         this.currentSort = 'relevance';
         this.isSearching = false;
         this.animationQueue = [];
+        // 虛擬化渲染：只保留可視範圍 (加上前後緩衝列) 的商品卡片
+        this.virtual = { start: 0, end: 0, columns: 1, rowHeight: 0, gap: 25, overscanRows: 2 };
+        this.renderedCards = new Map(); // 商品索引 -> 卡片 DOM
+        this.scrollFrame = null;
+        this.clearGridTimer = null;
         this.searchHistory = JSON.parse(localStorage.getItem('searchHistory') || '[]');
         
         this.initializeElements();
@@ -67,8 +72,11 @@ class PriceComparison {
         // 鍵盤快捷鍵
         document.addEventListener('keydown', (e) => this.handleKeyboardShortcuts(e));
 
-        // 滾動動畫
-        window.addEventListener('scroll', this.throttle(() => this.handleScrollAnimations(), 16));
+        // 滾動：每個畫面最多處理一次 (更新可視範圍的卡片與標題欄)
+        window.addEventListener('scroll', () => this.scheduleScrollUpdate(), { passive: true });
+
+        // 商品卡片的事件統一委派給商品列表容器處理
+        this.bindGridEvents();
 
         // 視窗大小變化
         window.addEventListener('resize', this.debounce(() => this.handleResize(), 250));
@@ -81,6 +89,12 @@ class PriceComparison {
             { threshold: 0.1, rootMargin: '50px' }
         );
 
+        // 圖片進入可視範圍附近時才開始載入
+        this.imageObserver = new IntersectionObserver(
+            (entries) => this.handleImageIntersection(entries),
+            { rootMargin: '300px 0px' }
+        );
+
         // 初始化動畫隊列處理器
         this.processAnimationQueue();
     }
@@ -147,7 +161,7 @@ class PriceComparison {
 
     // 輸入框變化處理
     handleInputChange(value) {
-        if (value.length > 2) {
+        if (value.trim().length > 0) {
             this.showSearchSuggestions(value);
         } else {
             this.hideSearchSuggestions();
@@ -250,18 +264,20 @@ class PriceComparison {
         this.statsBar.classList.add('hidden');
         this.hideSearchSuggestions();
 
-        // 清空產品卡片動畫
+        // 清空產品卡片動畫 (只有可視範圍內的卡片在 DOM 中)
         const existingCards = this.productGrid.querySelectorAll('.product-card');
         existingCards.forEach((card, index) => {
             setTimeout(() => {
                 card.style.transform = 'translateY(-20px)';
                 card.style.opacity = '0';
-            }, index * 50);
+            }, Math.min(index, 12) * 30);
         });
 
-        setTimeout(() => {
-            this.productGrid.innerHTML = '';
-        }, existingCards.length * 50 + 200);
+        clearTimeout(this.clearGridTimer);
+        this.clearGridTimer = setTimeout(() => {
+            this.clearGridTimer = null;
+            this.resetVirtualGrid();
+        }, Math.min(existingCards.length, 12) * 30 + 200);
     }
 
     // 搜尋開始動畫
@@ -405,9 +421,12 @@ class PriceComparison {
         });
     }
 
-    // 帶動畫的產品渲染
+    // 帶動畫的產品渲染 (虛擬化：只建立可視範圍內的卡片)
     renderProductsWithAnimation() {
-        this.productGrid.innerHTML = '';
+        // 新結果已經到達，取消上一次搜尋排程的清空動作
+        clearTimeout(this.clearGridTimer);
+        this.clearGridTimer = null;
+        this.resetVirtualGrid();
 
         if (this.filteredProducts.length === 0) {
             this.showNoResults('🔍 沒有符合條件的商品', '試著調整篩選條件看看');
@@ -416,27 +435,178 @@ class PriceComparison {
 
         this.hideNoResults();
 
-        this.filteredProducts.forEach((product, index) => {
-            setTimeout(() => {
-                const productCard = this.createProductCard(product);
-                this.productGrid.appendChild(productCard);
+        this.productGrid.classList.add('virtualized');
+        this.measureLayout();
+        this.updateVirtualWindow(true);
+
+        // 第一屏的卡片錯開進入動畫
+        this.productGrid.querySelectorAll('.product-card').forEach((card, index) => {
+            card.style.animationDelay = `${Math.min(index, 12) * 0.05}s`;
+        });
+    }
+
+    // 清空虛擬化列表
+    resetVirtualGrid() {
+        this.renderedCards.forEach(card => this.releaseCard(card));
+        this.renderedCards.clear();
+        this.virtual.start = 0;
+        this.virtual.end = 0;
+        this.productGrid.innerHTML = '';
+        this.productGrid.style.paddingTop = '';
+        this.productGrid.style.paddingBottom = '';
+        this.productGrid.classList.remove('virtualized');
+    }
+
+    // 計算欄數與每列高度 (與 CSS 的 repeat(auto-fill, minmax(320px, 1fr)) 一致)
+    measureLayout() {
+        const style = getComputedStyle(this.productGrid);
+        const gap = parseFloat(style.rowGap) || 0;
+        const width = this.productGrid.clientWidth
+            - (parseFloat(style.paddingLeft) || 0) - (parseFloat(style.paddingRight) || 0);
+        const minColumnWidth = window.innerWidth <= 768 ? width : 320;
+
+        this.virtual.gap = gap;
+        this.virtual.columns = Math.max(1, Math.floor((width + gap) / (minColumnWidth + gap)));
+
+        // 以價格列表最長的商品量測卡片高度，所有列使用相同高度
+        const sample = this.filteredProducts.reduce(
+            (longest, product) => (product.prices.length > longest.prices.length ? product : longest),
+            this.filteredProducts[0]
+        );
+        const probe = this.createProductCard(sample);
+        probe.style.visibility = 'hidden';
+        probe.style.animation = 'none';
+        this.productGrid.style.removeProperty('--card-row-height');
+        this.productGrid.appendChild(probe);
+        this.virtual.rowHeight = probe.offsetHeight;
+        probe.remove();
+        this.releaseCard(probe);
+        this.productGrid.style.setProperty('--card-row-height', `${this.virtual.rowHeight}px`);
+    }
+
+    // 排程滾動處理，每個畫面只執行一次
+    scheduleScrollUpdate() {
+        if (this.scrollFrame !== null) return;
+        this.scrollFrame = requestAnimationFrame(() => {
+            this.scrollFrame = null;
+            this.handleScrollAnimations();
+        });
+    }
 
-                // 設置初始動畫狀態
-                productCard.style.opacity = '0';
-                productCard.style.transform = 'translateY(30px) scale(0.9)';
+    // 依捲動位置更新 DOM 中的卡片
+    updateVirtualWindow(force = false) {
+        const total = this.filteredProducts.length;
+        const { columns, rowHeight, gap, overscanRows } = this.virtual;
+        if (total === 0 || rowHeight === 0) return;
 
-                // 觸發進入動畫
-                requestAnimationFrame(() => {
-                    productCard.style.transition = 'all 0.4s cubic-bezier(0.4, 0, 0.2, 1)';
-                    productCard.style.opacity = '1';
-                    productCard.style.transform = 'translateY(0) scale(1)';
-                });
+        const stride = rowHeight + gap;
+        const totalRows = Math.ceil(total / columns);
+        const gridTop = this.productGrid.getBoundingClientRect().top + window.pageYOffset;
+        const viewTop = window.pageYOffset - gridTop;
+        const viewBottom = viewTop + window.innerHeight;
 
-                // 添加到觀察器
-                this.intersectionObserver.observe(productCard);
+        const firstRow = Math.max(0, Math.floor(viewTop / stride) - overscanRows);
+        const lastRow = Math.min(totalRows, Math.ceil(viewBottom / stride) + overscanRows);
+        const start = Math.min(total, firstRow * columns);
+        const end = Math.min(total, Math.max(lastRow, firstRow + 1) * columns);
 
-            }, index * 100); // 錯開動畫時間
+        if (!force && start === this.virtual.start && end === this.virtual.end) return;
+
+        // 移出範圍的卡片
+        this.renderedCards.forEach((card, index) => {
+            if (index < start || index >= end) {
+                this.releaseCard(card);
+                card.remove();
+                this.renderedCards.delete(index);
+            }
         });
+
+        const cardAt = (index) => {
+            let card = this.renderedCards.get(index);
+            if (!card) {
+                card = this.createProductCard(this.filteredProducts[index]);
+                card.dataset.index = index;
+                this.renderedCards.set(index, card);
+                this.intersectionObserver.observe(card);
+            }
+            return card;
+        };
+
+        // 以上下 padding 保留未渲染列的高度，讓捲軸長度保持正確
+        const renderedRows = Math.ceil((end - start) / columns);
+        this.productGrid.style.paddingTop = `${20 + firstRow * stride}px`;
+        this.productGrid.style.paddingBottom = `${20 + Math.max(0, totalRows - firstRow - renderedRows) * stride}px`;
+
+        const keptStart = Math.max(start, this.virtual.start);
+        const keptEnd = Math.min(end, this.virtual.end);
+        if (force || keptStart >= keptEnd) {
+            // 新的結果或跳到不相鄰的位置：整批替換 (新卡片播放進場動畫)
+            const cards = [];
+            for (let index = start; index < end; index++) cards.push(cardAt(index));
+            this.productGrid.replaceChildren(...cards);
+        } else {
+            // 只在頭尾插入進入範圍的卡片；保留的卡片不離開 DOM，進場動畫不會重新播放
+            const before = document.createDocumentFragment();
+            for (let index = start; index < keptStart; index++) before.appendChild(cardAt(index));
+            this.productGrid.insertBefore(before, this.productGrid.firstChild);
+            const after = document.createDocumentFragment();
+            for (let index = keptEnd; index < end; index++) after.appendChild(cardAt(index));
+            this.productGrid.appendChild(after);
+        }
+
+        this.virtual.start = start;
+        this.virtual.end = end;
+    }
+
+    // 卡片離開 DOM 時停止觀察
+    releaseCard(card) {
+        this.intersectionObserver.unobserve(card);
+        const img = card.querySelector('img[data-src]');
+        if (img) this.imageObserver.unobserve(img);
+    }
+
+    // 商品卡片的委派事件：懸停、觸控、購買點擊與圖片載入
+    bindGridEvents() {
+        this.productGrid.addEventListener('mouseover', (e) => {
+            const card = e.target.closest('.product-card');
+            if (card && !card.contains(e.relatedTarget)) {
+                this.triggerCardHoverIn(card);
+            }
+        });
+
+        this.productGrid.addEventListener('mouseout', (e) => {
+            const card = e.target.closest('.product-card');
+            if (card && !card.contains(e.relatedTarget)) {
+                this.triggerCardHoverOut(card);
+            }
+        });
+
+        // 觸摸設備支持
+        this.productGrid.addEventListener('touchstart', (e) => {
+            const card = e.target.closest('.product-card');
+            if (card) this.triggerCardHoverIn(card);
+        }, { passive: true });
+
+        // 添加購買連結點擊動畫
+        this.productGrid.addEventListener('click', (e) => {
+            const buyLink = e.target.closest('.buy-link');
+            if (buyLink && !buyLink.classList.contains('disabled')) {
+                this.triggerBuyClickAnimation(buyLink);
+            }
+        });
+
+        // 圖片的 load / error 事件不會冒泡，在捕獲階段處理
+        this.productGrid.addEventListener('load', (e) => {
+            if (e.target.tagName === 'IMG') e.target.classList.add('loaded');
+        }, true);
+
+        this.productGrid.addEventListener('error', (e) => {
+            const img = e.target;
+            if (img.tagName === 'IMG' && !img.classList.contains('error')) {
+                img.classList.add('error');
+                img.src = '/static/images/placeholder.png';
+            }
+        }, true);
     }
 
     // 創建產品卡片
@@ -445,9 +615,6 @@ class PriceComparison {
         productCard.classList.add('product-card');
         productCard.setAttribute('data-aos', 'fade-up');
 
-        // 添加懸停效果事件
-        this.addCardHoverEffects(productCard);
-
         // 圖片容器
         const imageContainer = this.createImageContainer(product);
         productCard.appendChild(imageContainer);
@@ -465,19 +632,12 @@ class PriceComparison {
         container.classList.add('product-image-container');
 
         const img = document.createElement('img');
-        img.src = product.image;
+        img.dataset.src = product.image || '/static/images/placeholder.png';
         img.alt = product.name;
-        img.loading = 'lazy'; // 懶載入
+        img.decoding = 'async';
 
-        // 圖片載入處理
-        img.addEventListener('load', () => {
-            img.classList.add('loaded');
-        });
-
-        img.addEventListener('error', () => {
-            img.src = '/static/images/placeholder.png';
-            img.classList.add('error');
-        });
+        // 圖片接近可視範圍時才設定 src (load / error 由 bindGridEvents 委派處理)
+        this.imageObserver.observe(img);
 
         container.appendChild(img);
         return container;
@@ -534,14 +694,6 @@ class PriceComparison {
                 </a>
             `;
 
-            // 添加購買連結點擊動畫
-            const buyLink = item.querySelector('.buy-link');
-            if (priceEntry.is_available) {
-                buyLink.addEventListener('click', (e) => {
-                    this.triggerBuyClickAnimation(buyLink);
-                });
-            }
-
             list.appendChild(item);
         });
 
@@ -559,22 +711,7 @@ class PriceComparison {
         return icons[platform.toLowerCase()] || icons.default;
     }
 
-    // 卡片懸停效果
-    addCardHoverEffects(card) {
-        card.addEventListener('mouseenter', () => {
-            this.triggerCardHoverIn(card);
-        });
-
-        card.addEventListener('mouseleave', () => {
-            this.triggerCardHoverOut(card);
-        });
-
-        // 觸摸設備支持
-        card.addEventListener('touchstart', () => {
-            this.triggerCardHoverIn(card);
-        });
-    }
-
+    // 卡片懸停效果 (事件由 bindGridEvents 委派)
     triggerCardHoverIn(card) {
         card.style.transform = 'translateY(-8px) scale(1.02)';
         card.style.boxShadow = '0 20px 60px rgba(0, 0, 0, 0.25)';
@@ -810,6 +947,18 @@ class PriceComparison {
         }, 100);
     }
 
+    // 圖片懶載入
+    handleImageIntersection(entries) {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                const img = entry.target;
+                this.imageObserver.unobserve(img);
+                img.src = img.dataset.src;
+                delete img.dataset.src;
+            }
+        });
+    }
+
     // 交集觀察器處理
     handleIntersection(entries) {
         entries.forEach(entry => {
@@ -820,22 +969,12 @@ class PriceComparison {
         });
     }
 
-    // 滾動動畫處理
+    // 滾動動畫處理 (卡片進場動畫由 IntersectionObserver 觸發，這裡不逐一讀取卡片位置)
     handleScrollAnimations() {
         const scrollTop = window.pageYOffset;
-        const cards = this.productGrid.querySelectorAll('.product-card');
 
-        cards.forEach((card, index) => {
-            const cardTop = card.offsetTop;
-            const cardHeight = card.offsetHeight;
-            const windowHeight = window.innerHeight;
-
-            // 視差效果
-            if (cardTop < scrollTop + windowHeight && cardTop + cardHeight > scrollTop) {
-                const parallaxValue = (scrollTop - cardTop) * 0.1;
-                card.style.transform = `translateY(${parallaxValue}px)`;
-            }
-        });
+        // 更新可視範圍內的卡片
+        this.updateVirtualWindow();
 
         // 更新標題欄透明度
         const header = document.querySelector('.search-card');
@@ -861,12 +1000,23 @@ class PriceComparison {
             card.style.transform = '';
             card.style.transition = 'all 0.3s ease';
         });
+
+        // 欄數可能改變，重新量測並更新可視範圍
+        if (this.filteredProducts.length > 0 && this.productGrid.classList.contains('virtualized')) {
+            this.measureLayout();
+            this.updateVirtualWindow(true);
+        }
     }
 
     // 搜尋建議功能
-    showSearchSuggestions(query) {
-        const suggestions = this.generateSuggestions(query);
-        if (suggestions.length === 0) return;
+    async showSearchSuggestions(query) {
+        const suggestions = await this.fetchSuggestions(query);
+        // 等待期間輸入已經改變，忽略過期的結果
+        if (query !== this.keywordInput.value) return;
+        if (suggestions.length === 0) {
+            this.hideSearchSuggestions();
+            return;
+        }
 
         let suggestionsContainer = document.getElementById('search-suggestions');
         if (!suggestionsContainer) {
@@ -903,6 +1053,31 @@ class PriceComparison {
         return container;
     }
 
+    // 向伺服器取得建議 (歷史搜尋優先)，失敗時退回本機建議
+    async fetchSuggestions(query) {
+        if (this.suggestController) {
+            this.suggestController.abort(); // 取消上一個尚未完成的請求
+        }
+        this.suggestController = new AbortController();
+
+        try {
+            const response = await fetch('/suggest?q=' + encodeURIComponent(query.trim()), {
+                signal: this.suggestController.signal
+            });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+
+            const historySuggestions = this.searchHistory.filter(item =>
+                item.toLowerCase().startsWith(query.trim().toLowerCase())
+            );
+            const serverSuggestions = data.suggestions.map(item => item.keyword);
+            return [...new Set([...historySuggestions, ...serverSuggestions])].slice(0, 8);
+        } catch (e) {
+            if (e.name === 'AbortError') return [];
+            return this.generateSuggestions(query);
+        }
+    }
+
     // 生成搜尋建議
     generateSuggestions(query) {
         const commonSuggestions = [
@@ -977,6 +1152,7 @@ class PriceComparison {
     // 顯示/隱藏結果區域
     showResults() {
         this.resultsSection.classList.remove('hidden');
+        this.recalculateLayout(); // 區塊顯示後才能量測卡片尺寸
         this.resultsSection.style.opacity = '0';
 
         setTimeout(() => {
@@ -1022,6 +1198,12 @@ class PriceComparison {
         if (this.intersectionObserver) {
             this.intersectionObserver.disconnect();
         }
+        if (this.imageObserver) {
+            this.imageObserver.disconnect();
+        }
+        if (this.scrollFrame !== null) {
+            cancelAnimationFrame(this.scrollFrame);
+        }
 
         // 清理動畫定時器
         if (this.loadingInterval) {
@@ -1098,6 +1280,15 @@ const additionalStyles = `
     animation: fadeInUp 0.6s ease forwards;
 }
 
+/* 虛擬化列表：所有列等高，卡片的進場延遲由 JS 設定 */
+.product-grid.virtualized {
+    grid-auto-rows: var(--card-row-height, auto);
+}
+
+.product-grid.virtualized .product-card {
+    animation-delay: 0s;
+}
+
 .search-suggestions {
     position: absolute;
     background: white;